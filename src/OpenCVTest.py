@@ -1,15 +1,11 @@
 import cv2
 import time
 
-prototxt_path = '../models/MobileNetSSD_deploy.prototxt'
-model_path = '../models/MobileNetSSD_deploy.caffemodel'
+from detections import DOG_CLASS_ID, postprocess
+from frame_buffers import FrameBufferPool
+from inference_backends import create_backend
 
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-           "sofa", "train", "tvmonitor"]
-
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+backend = create_backend()
 
 camera_id = 0
 frame_width = 640
@@ -19,6 +15,7 @@ fps_limit = 10
 cap = cv2.VideoCapture(camera_id)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
+buffers = FrameBufferPool(frame_width, frame_height, backend.input_size)
 
 frame_time = 1 / fps_limit
 prev_time = 0
@@ -28,10 +25,12 @@ MAX_SPEED = 127
 TURN_SPEED = 80  # скорость при повороте
 
 while True:
-    current_time = time.time()
-    if current_time - prev_time < frame_time:
-        continue
-    prev_time = current_time
+    # Ограничение FPS сном, а не активным ожиданием
+    current_time = time.monotonic()
+    wait = frame_time - (current_time - prev_time)
+    if wait > 0:
+        time.sleep(wait)
+    prev_time = time.monotonic()
 
     ret, frame = cap.read()
     if not ret:
@@ -39,23 +38,13 @@ while True:
         break
 
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)),
-                                 0.007843, (300, 300), 127.5)
-    net.setInput(blob)
-    detections = net.forward()
+    detections = backend.forward(buffers.prepare_blob(frame))
 
+    # Только собаки, боксы уже после NMS и отсортированы по уверенности
+    dogs = postprocess(detections, w, h, 0.5, class_ids=[DOG_CLASS_ID])
     dog_center_x = None
-    highest_confidence = 0
-
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > 0.5:
-            idx = int(detections[0, 0, i, 1])
-            if CLASSES[idx] == "dog" and confidence > highest_confidence:
-                highest_confidence = confidence
-                box = detections[0, 0, i, 3:7] * [w, h, w, h]
-                (startX, startY, endX, endY) = box.astype("int")
-                dog_center_x = (startX + endX) // 2
+    if len(dogs):
+        dog_center_x = (int(dogs[0]['x1']) + int(dogs[0]['x2'])) // 2
 
     if dog_center_x is not None:
         center_frame = w // 2
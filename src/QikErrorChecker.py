@@ -1,37 +1,44 @@
-import serial
+import logging
 from typing import Dict, List
 
+from serial_mux import SerialMux, PRIORITY_QUERY
+from qik_link import frame
+
+logger = logging.getLogger('rover.qik')
+
 class QikErrorChecker:
-    # ... (карты ошибок без изменений) ...
-    ERROR_BITS_2S12V10 = {0: "...", 1: "...", 2: "...", 3: "...", 4: "...", 7: "Timeout"}
-    ERROR_BITS_2S9V1 = {3: "...", 4: "...", 5: "..."}
+    ERROR_BITS_2S12V10 = {0: "Motor 0 Fault", 1: "Motor 1 Fault", 2: "Motor 0 Over Current",
+                          3: "Motor 1 Over Current", 4: "Serial Hardware Error", 5: "CRC Error",
+                          6: "Format Error", 7: "Timeout"}
+    ERROR_BITS_2S9V1 = {3: "Data Overrun Error", 4: "Frame Error", 5: "CRC Error",
+                        6: "Format Error", 7: "Timeout"}
 
-    def __init__(self, serial_port: serial.Serial, model: str = "2s12v10"):
+    def __init__(self, mux: SerialMux, model: str = "2s12v10", crc: bool = False,
+                 device_id: int = None):
         """
-        Принимает УЖЕ открытый serial.Serial объект.
+        Клиент мультиплексора порта (MotorController.mux): свой порт не открывает
+        и буферы не сбрасывает, поэтому не мешает циклу управления.
+        device_id — адресный (Pololu) запрос одному Qik из цепочки; на компактный
+        запрос ответили бы все устройства на линии разом.
         """
-        if not (serial_port and serial_port.is_open):
-            raise ValueError("Необходимо передать открытый serial порт")
-        self.ser = serial_port  # Используем переданный порт
+        if mux is None:
+            raise ValueError("Необходимо передать мультиплексор порта Qik")
+        self.mux = mux
         self.model = model.lower()
+        self.crc = crc
+        self.device_id = device_id
         # Убрали все, что связано с use_pololu_protocol, для простоты
 
     def _build_get_error_cmd(self) -> bytes:
-        # Пока используем только компактный протокол
-        return bytes([0x82])
-
-    def get_error_byte(self) -> int:
-        cmd = self._build_get_error_cmd()
-        try:
-            # Очистка буферов важна
-            self.ser.reset_input_buffer()
-            self.ser.reset_output_buffer()
-            self.ser.write(cmd)
-            resp = self.ser.read(1)
-            if len(resp) == 1:
-                return resp[0]
-        except serial.SerialException as e:
-            print(f"Ошибка порта при чтении ошибки: {e}")
+        if self.device_id is not None:
+            return frame([0xAA, self.device_id, 0x02], self.crc)
+        return frame([0x82], self.crc)
+
+    def get_error_byte(self, priority: int = PRIORITY_QUERY) -> int:
+        resp = self.mux.request(self._build_get_error_cmd(), 1, priority,
+                                retries=2 if self.crc else 0, tag=self.device_id)
+        if resp is not None and len(resp) == 1:
+            return resp[0]
         return -1 # Возвращаем -1 в случае ошибки чтения
 
     def decode_errors(self, err: int) -> List[str]:
@@ -52,9 +59,9 @@ class QikErrorChecker:
     def check_and_print(self):
         err = self.get_error_byte()
         if err != -1:
-            print(f"Qik error byte: 0x{err:02X} ({err})")
+            logger.info("Qik error byte: 0x%02X (%d)", err, err)
             for line in self.decode_errors(err):
-                print(f"- {line}")
+                logger.info("- %s", line)
         else:
-            print("Не удалось выполнить проверку ошибок Qik.")
+            logger.error("Не удалось выполнить проверку ошибок Qik.")
 
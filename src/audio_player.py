@@ -1,11 +1,14 @@
 import pygame
 import time
+import logging
+
+logger = logging.getLogger('rover.audio')
 
 class AudioPlayer:
     def __init__(self):
         """Инициализирует pygame.mixer."""
         pygame.mixer.init()
-        print("AudioPlayer инициализирован.")
+        logger.info("AudioPlayer инициализирован.")
 
     def play(self, file_path):
         """
@@ -19,17 +22,36 @@ class AudioPlayer:
         try:
             pygame.mixer.music.load(file_path)
             pygame.mixer.music.play()
-            print(f"Воспроизведение файла: {file_path}")
+            logger.info("Воспроизведение файла: %s", file_path)
         except pygame.error as e:
-            print(f"Ошибка при загрузке или воспроизведении файла: {e}")
+            logger.error("Ошибка при загрузке или воспроизведении файла: %s", e)
 
     def stop(self):
         """Останавливает воспроизведение музыки."""
         if pygame.mixer.music.get_busy():
             pygame.mixer.music.stop()
             # pygame.mixer.music.unload() # Можно раскомментировать, если нужно освобождать файл
-            print("Воспроизведение остановлено.")
+            logger.info("Воспроизведение остановлено.")
 
     def is_playing(self):
         """Проверяет, проигрывается ли что-то в данный момент."""
         return pygame.mixer.music.get_busy()
+
+
+class SilentAudioPlayer:
+    """Тот же интерфейс без звуковой карты (режим симуляции): только журнал вызовов."""
+
+    def __init__(self):
+        self.played = []
+        self._playing_until = 0.0
+
+    def play(self, file_path, duration=1.0):
+        self.played.append(file_path)
+        self._playing_until = time.monotonic() + duration
+        logger.info("Воспроизведение файла (без звука): %s", file_path)
+
+    def stop(self):
+        self._playing_until = 0.0
+
+    def is_playing(self):
+        return time.monotonic() < self._playing_until
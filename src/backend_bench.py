@@ -0,0 +1,134 @@
+"""
+Бенчмарк бэкендов инференса на CPU.
+
+Прогоняет один и тот же набор записанных кадров через каждый бэкенд и
+сообщает задержку, пропускную способность и согласие детекций с эталоном
+(первым бэкендом в списке).
+
+    python backend_bench.py --frames ../recordings/room --config backends.json
+
+backends.json — список описаний для inference_backends.create_backend, например:
+    [{"name": "caffe-default"},
+     {"name": "caffe-4t", "threads": 4},
+     {"name": "caffe-240", "input_size": [240, 240]},
+     {"name": "ort-int8", "type": "onnxruntime", "model": "mobilenet_ssd_int8.onnx", "threads": 4}]
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+
+from detections import postprocess
+from frame_buffers import FrameBufferPool
+from frame_sources import load_frames
+from inference_backends import create_backend
+
+DEFAULT_SPECS = [
+    {"name": "opencv-default"},
+    {"name": "opencv-1t", "backend": "opencv", "threads": 1},
+    {"name": "opencv-4t", "backend": "opencv", "threads": 4},
+    {"name": "opencv-240", "backend": "opencv", "input_size": [240, 240]},
+]
+
+
+def _iou_matrix(a, b):
+    ax1, ay1, ax2, ay2 = (a[k][:, None].astype(np.float32) for k in ('x1', 'y1', 'x2', 'y2'))
+    bx1, by1, bx2, by2 = (b[k][None, :].astype(np.float32) for k in ('x1', 'y1', 'x2', 'y2'))
+    inter = (np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None) *
+             np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None))
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def count_matches(reference, candidate, iou_threshold=0.5):
+    """Число пар (эталон, кандидат) одного класса с IoU >= порога (жадно)."""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+    iou = _iou_matrix(reference, candidate)
+    iou *= reference['class_id'][:, None] == candidate['class_id'][None, :]
+    matches = 0
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            return matches
+        matches += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+
+
+def run_backend(backend, frames, warmup=3):
+    pool = FrameBufferPool(frames[0].shape[1], frames[0].shape[0], backend.input_size)
+    for frame in frames[:warmup]:
+        backend.forward(pool.prepare_blob(frame))
+
+    latencies = []
+    results = []
+    t_total = time.perf_counter()
+    for frame in frames:
+        h, w = frame.shape[:2]
+        t0 = time.perf_counter()
+        raw = backend.forward(pool.prepare_blob(frame))
+        latencies.append(time.perf_counter() - t0)
+        results.append(postprocess(raw, w, h))
+    elapsed = time.perf_counter() - t_total
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        "latency_ms_mean": round(float(latencies.mean()), 2),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "throughput_fps": round(len(frames) / elapsed, 2),
+    }, results
+
+
+def agreement(reference, candidate):
+    matched = sum(count_matches(r, c) for r, c in zip(reference, candidate))
+    n_ref = sum(len(r) for r in reference)
+    n_cand = sum(len(c) for c in candidate)
+    precision = matched / n_cand if n_cand else 1.0
+    recall = matched / n_ref if n_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU-бенчмарк бэкендов инференса")
+    parser.add_argument('--frames', required=True, help="каталог изображений или видеофайл")
+    parser.add_argument('--limit', type=int, default=200, help="максимум кадров")
+    parser.add_argument('--config', help="JSON со списком описаний бэкендов")
+    parser.add_argument('--output', help="куда сохранить результат (JSON)")
+    args = parser.parse_args()
+
+    specs = DEFAULT_SPECS
+    if args.config:
+        with open(args.config) as f:
+            specs = json.load(f)
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        raise SystemExit(f"No frames in {args.frames}")
+
+    report = {"frames": len(frames), "backends": []}
+    reference = None
+    for index, spec in enumerate(specs):
+        backend = create_backend(dict(spec))
+        stats, results = run_backend(backend, frames)
+        if reference is None:
+            reference = results
+        stats["name"] = spec.get("name", backend.name)
+        stats["input_size"] = list(backend.input_size)
+        stats["agreement"] = agreement(reference, results)
+        report["backends"].append(stats)
+        print(f"[{index + 1}/{len(specs)}] {stats['name']}: {stats['latency_ms_mean']} ms, "
+              f"{stats['throughput_fps']} FPS, F1 {stats['agreement']['f1']}")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
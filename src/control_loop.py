@@ -0,0 +1,47 @@
+"""
+Выбор команды моторам на одном тике цикла управления.
+
+Вынесено из main.motor_control_loop, чтобы тот же код выполнялся
+при воспроизведении записанных сессий (input_session.py).
+"""
+from evdev.ecodes import ABS_X, ABS_Y
+
+import utils
+
+
+def select_speeds(pad, web_commands_instance, follow_controller=None, dead_zone=10, maneuvers=None):
+    """
+    Возвращает (left, right, source) по приоритету: геймпад, маневр из очереди,
+    веб, режим следования. Пока идет маневр, геймпад перехватывает управление
+    только отклонением стика (и сбрасывает очередь).
+    """
+    # Приоритет №1: Геймпад
+    if pad and pad.is_connected():
+        # Снимок состояния от потока чтения геймпада, без ожидания устройства
+        active_keys = pad.snapshot().axes
+        if ABS_X in active_keys and ABS_Y in active_keys:
+            ls, rs = utils.joystick_to_diff_control(
+                active_keys[ABS_X], active_keys[ABS_Y], dead_zone
+            )
+        else:
+            ls, rs = 0, 0
+        if maneuvers is not None and maneuvers.active():
+            if ls == 0 and rs == 0:
+                targets = maneuvers.targets()
+                if targets is not None:
+                    return targets[0], targets[1], "maneuver"
+            else:
+                maneuvers.clear()
+        return ls, rs, "pad"
+    if maneuvers is not None:
+        targets = maneuvers.targets()
+        if targets is not None:
+            return targets[0], targets[1], "maneuver"
+    if (web_commands_instance.is_active() or follow_controller is None
+            or not follow_controller.enabled):
+        # Приоритет №2: Веб-интерфейс
+        web_ls, web_rs = web_commands_instance.get_speed()
+        return web_ls, web_rs, "web"
+    # Приоритет №3: Режим следования за целью по детекциям камеры
+    follow_ls, follow_rs = follow_controller.compute()
+    return follow_ls, follow_rs, "follow"
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
+           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
+           "sofa", "train", "tvmonitor"]
+
+DOG_CLASS_ID = CLASSES.index("dog")
+
+# Компактный результат пост-обработки: одна запись на бокс в пикселях кадра
+DETECTION_DTYPE = np.dtype([
+    ('class_id', np.int16),
+    ('confidence', np.float32),
+    ('x1', np.int32),
+    ('y1', np.int32),
+    ('x2', np.int32),
+    ('y2', np.int32),
+])
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def postprocess(raw, width, height, conf_threshold=0.5, class_ids=None, nms_threshold=0.45):
+    """
+    Векторная пост-обработка выхода SSD (форма 1x1xNx7:
+    [image_id, class_id, confidence, x1, y1, x2, y2] в долях кадра).
+    Фильтрует по порогу и набору классов, применяет NMS внутри каждого
+    класса и возвращает массив DETECTION_DTYPE, отсортированный по убыванию
+    уверенности. Цикла по детекциям на Python нет.
+    """
+    rows = raw.reshape(-1, 7)
+    keep = rows[:, 2] > conf_threshold
+    if class_ids is not None:
+        keep &= np.isin(rows[:, 1].astype(np.int16), class_ids)
+    rows = rows[keep]
+    if rows.shape[0] == 0:
+        return empty_detections()
+
+    order = np.argsort(-rows[:, 2], kind='stable')
+    rows = rows[order]
+    class_id = rows[:, 1].astype(np.int16)
+    boxes = rows[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+    np.clip(boxes, 0, [width - 1, height - 1, width - 1, height - 1], out=boxes)
+
+    if nms_threshold is not None and rows.shape[0] > 1:
+        survivors = _fast_nms(boxes, class_id, nms_threshold)
+        rows, class_id, boxes = rows[survivors], class_id[survivors], boxes[survivors]
+
+    out = np.empty(rows.shape[0], dtype=DETECTION_DTYPE)
+    out['class_id'] = class_id
+    out['confidence'] = rows[:, 2]
+    coords = boxes.astype(np.int32)
+    out['x1'] = coords[:, 0]
+    out['y1'] = coords[:, 1]
+    out['x2'] = coords[:, 2]
+    out['y2'] = coords[:, 3]
+    return out
+
+
+def _fast_nms(boxes, class_id, iou_threshold):
+    """
+    Матричный NMS (Fast NMS): боксы уже отсортированы по уверенности,
+    бокс подавляется, если он пересекается с более уверенным боксом
+    того же класса сильнее iou_threshold. Возвращает маску выживших.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = (x2 - x1) * (y2 - y1)
+
+    ix1 = np.maximum(x1[:, None], x1[None, :])
+    iy1 = np.maximum(y1[:, None], y1[None, :])
+    ix2 = np.minimum(x2[:, None], x2[None, :])
+    iy2 = np.minimum(y2[:, None], y2[None, :])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    union = area[:, None] + area[None, :] - inter
+    iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    # Учитываем только пары одного класса, где строка уверенней столбца
+    iou *= class_id[:, None] == class_id[None, :]
+    iou = np.triu(iou, k=1)
+    return iou.max(axis=0) <= iou_threshold
+
+
+def contains_class(detections, class_id):
+    return bool(np.any(detections['class_id'] == class_id))
+
+
+def draw_detections(frame, detections, classes=CLASSES, color=(0, 255, 0)):
+    """Рисует боксы и подписи (цикл только по уже отфильтрованным боксам)."""
+    for det in detections:
+        x1, y1, x2, y2 = int(det['x1']), int(det['y1']), int(det['x2']), int(det['y2'])
+        label = f"{classes[det['class_id']]}: {det['confidence']:.2f}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
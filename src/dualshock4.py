@@ -1,19 +1,29 @@
 from __future__ import print_function
 
-from select import select
+import time
+import fcntl
+import select
+import struct
 import logging
 import evdev
+import pyudev
 import requests 
 import threading  
+from collections import deque, namedtuple
 from evdev import InputDevice
 from evdev.ecodes import ABS_RX, ABS_RY, ABS_X, ABS_Y
-from evdev.ecodes import BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST
+from evdev.ecodes import BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST, BTN_MODE
+
+import numpy as np
+
+# ioctl EVIOCSCLOCKID = _IOW('E', 0xa0, int): метки времени событий по CLOCK_MONOTONIC
+EVIOCSCLOCKID = 0x400445a0
+CLOCK_MONOTONIC = 1
+
+# Опубликованное состояние стиков: axes не меняется после публикации,
+# timestamp — время ядра для последнего SYN_REPORT, seq растет с каждым отчетом
+PadState = namedtuple('PadState', ['axes', 'timestamp', 'seq', 'connected'])
 
-logging.basicConfig(
-	level=logging.DEBUG,
-	format="[%(asctime)s] %(threadName)s %(message)s",
-	datefmt="%H:%M:%S"
-)
 j_logger = logging.getLogger("rover.pad")
 
 class DualShock:
@@ -41,7 +51,36 @@ class DualShock:
 			BTN_WEST: "Я здесь, чтобы помогать."
 		}
 
+		# Аварийная остановка: on_estop(timestamp) вызывается прямо из потока чтения,
+		# не дожидаясь тика цикла управления (см. emergency_stop.py)
+		self.estop_button = BTN_MODE
+		self.on_estop = None
+
 		self.known_devices = ["Wireless Controller", "8Bitdo"]
+		# (vendor, product) из input_id; product None — любой продукт производителя
+		self.known_ids = [(0x054c, None), (0x2dc8, None)]  # Sony, 8BitDo
+
+		# --- Горячее подключение через udev вместо перебора устройств ---
+		self._attach_lock = threading.Lock()
+		self._observer = None
+		self.connect_latencies = deque(maxlen=50)
+		self.disconnect_latencies = deque(maxlen=50)
+		self.last_disconnect_source = None
+
+		# Запись сессии (InputRecorder) и виртуальный режим для воспроизведения
+		self.recorder = None
+		self._virtual = False
+
+		# --- Поток чтения: epoll на fd устройства, публикация целого снимка ---
+		self._monotonic = False  # удалось ли переключить часы событий на CLOCK_MONOTONIC
+		self._state = PadState(dict(self.active_keys), 0.0, 0, False)
+		self._pending_axes = dict(self.active_keys)
+		self._pending_time = 0.0
+		self._stop = threading.Event()
+		self._thread = None
+		self._last_used_seq = 0
+		self.input_ages = deque(maxlen=600)
+		self.reports = 0
 
 	def speak_async(self, text):
 		"""Отправляет запрос на TTS сервер асинхронно."""
@@ -65,61 +104,258 @@ class DualShock:
 	def connect(self):
 		"""
 		Ищет и подключается к геймпаду. Возвращает True в случае успеха.
+		Неподходящие устройства сразу закрываются.
 		"""
 		if self.is_connected():
 			return True
 			
 		try:
-			devices = [InputDevice(path) for path in evdev.list_devices()]
-			for device in devices:
-				if any(name in device.name for name in self.known_devices):
-					self.dev = device
-					print(f"Геймпад найден и подключен: {self.dev.name}")
+			for path in evdev.list_devices():
+				device = InputDevice(path)
+				if self._matches(device) and self._attach(device):
 					return True
+				device.close()
 		except Exception as e:
-			print(f"Ошибка при поиске устройств: {e}")
-			self.dev = None
-			return False
-			
-		self.dev = None
+			j_logger.error("Ошибка при поиске устройств: %s", e)
 		return False
 
+	def _matches(self, device):
+		"""Геймпад узнается по имени или по vendor/product."""
+		if any(name in device.name for name in self.known_devices):
+			return True
+		info = device.info
+		return any(info.vendor == vendor and (product is None or info.product == product)
+		           for vendor, product in self.known_ids)
+
+	def _attach(self, device):
+		with self._attach_lock:
+			if self.dev is not None:
+				return False
+			self._set_monotonic_clock(device)
+			self._pending_axes = {k: 0 for k in self.active_keys}
+			self.dev = device
+		j_logger.info("Геймпад найден и подключен: %s", device.name)
+		return True
+
+	def _detach(self, device, source):
+		"""Отключает device (если он еще текущий) и публикует нулевое состояние."""
+		with self._attach_lock:
+			if self.dev is not device or device is None:
+				return False
+			self.dev = None
+			self._pending_axes = {k: 0 for k in self.active_keys}
+			self._pending_time = 0.0
+			self._state = PadState(dict(self._pending_axes), self._now(), self._state.seq + 1, False)
+			self.button_states = {k: False for k in self.button_states}
+			self.last_disconnect_source = source
+		try:
+			device.close()
+		except OSError:
+			pass
+		return True
+
+	def _start_hotplug(self):
+		"""Подписывается на события add/remove подсистемы input через udev."""
+		try:
+			context = pyudev.Context()
+			monitor = pyudev.Monitor.from_netlink(context)
+			monitor.filter_by(subsystem='input')
+			self._observer = pyudev.MonitorObserver(monitor, callback=self._on_udev_event,
+			                                        name="PadHotplugThread", daemon=True)
+			self._observer.start()
+		except Exception as e:
+			j_logger.warning(f"udev недоступен, геймпад ищется опросом: {e}")
+			self._observer = None
+
+	def _on_udev_event(self, udev_device):
+		node = udev_device.device_node
+		if not node or not node.startswith('/dev/input/event'):
+			return
+		start = time.monotonic()
+		if udev_device.action == 'add' and self.dev is None:
+			try:
+				device = InputDevice(node)
+			except OSError as e:
+				j_logger.warning(f"Не удалось открыть {node}: {e}")
+				return
+			if not (self._matches(device) and self._attach(device)):
+				device.close()
+				return
+			# От инициализации устройства в udev до готовности к чтению
+			try:
+				latency = udev_device.time_since_initialized.total_seconds()
+			except Exception:
+				latency = time.monotonic() - start
+			self.connect_latencies.append(latency)
+			j_logger.info(f"Геймпад подключен за {latency * 1000:.1f} мс: {device.name}")
+		elif udev_device.action == 'remove':
+			dev = self.dev
+			if dev is not None and dev.path == node and self._detach(dev, "udev"):
+				self.disconnect_latencies.append(time.monotonic() - start)
+				j_logger.info(f"Геймпад отключен (udev): {node}")
+
 	def is_connected(self):
 		"""
 		Проверяет, активно ли подключение к геймпаду.
 		"""
-		return self.dev is not None
+		return self.dev is not None or self._virtual
 
-	def read_events(self):
+	def _set_monotonic_clock(self, device):
 		"""
-		Читает события. Защищено от падений при отключении геймпада.
+		Переключает метки времени событий на CLOCK_MONOTONIC,
+		чтобы сравнивать их с time.monotonic().
 		"""
-		if not self.is_connected():
-			return self.active_keys
+		try:
+			fcntl.ioctl(device.fd, EVIOCSCLOCKID, struct.pack('i', CLOCK_MONOTONIC))
+			self._monotonic = True
+		except OSError as e:
+			j_logger.warning(f"EVIOCSCLOCKID не поддерживается, метки времени по CLOCK_REALTIME: {e}")
+			self._monotonic = False
+
+	def _now(self):
+		"""Текущее время в тех же часах, что и метки событий."""
+		return time.monotonic() if self._monotonic else time.time()
 
+	def start(self):
+		"""Подключается к геймпаду, если он уже есть, и запускает потоки чтения и hotplug."""
+		if self._thread is None:
+			self.connect()
+			self._start_hotplug()
+			self._thread = threading.Thread(target=self._reader_loop, daemon=True, name="PadReaderThread")
+			self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		if self._observer is not None:
+			self._observer.send_stop()
+
+	def _reader_loop(self):
+		"""
+		Блокируется на epoll по fd геймпада, читает все готовые события и
+		публикует состояние стиков целиком на каждый SYN_REPORT.
+		"""
+		poller = select.epoll()
+		registered = None
 		try:
-			r_list, _, _ = select([self.dev.fd], [], [], 0.01)
-			if r_list:
-				for event in self.dev.read():
-					if event.type == evdev.ecodes.EV_ABS:
-						value = int(max(min(event.value, 254), 0)) - 127.5
-						
-						self.active_keys[event.code] = value
-
-					elif event.type == evdev.ecodes.EV_KEY:
-						if event.code in self.button_phrases:
-							if event.value == 1 and not self.button_states[event.code]:
-								self.button_states[event.code] = True
-								phrase = self.button_phrases[event.code]
-								j_logger.info(f"Кнопка {event.code} нажата, озвучиваем: '{phrase}'")
-								self.speak_async(phrase)
-							elif event.value == 0:
-								self.button_states[event.code] = False
-
-		except (IOError, OSError) as e:
-			print(f"Геймпад отключен. Ошибка: {e}")
-			self.dev = None
-			self.active_keys = {k: 0 for k in self.active_keys}
-			self.button_states = {k: False for k in self.button_states}
-		
-		return self.active_keys
+			while not self._stop.is_set():
+				dev = self.dev
+				if dev is None:
+					if registered is not None:
+						self._unregister(poller, registered)
+						registered = None
+					if self._observer is None:
+						# Без udev — редкий опрос вместо поиска на каждом тике цикла управления
+						self.connect()
+						self._stop.wait(1.0)
+					else:
+						self._stop.wait(0.1)
+					continue
+				if registered is not dev:
+					if registered is not None:
+						self._unregister(poller, registered)
+					poller.register(dev.fd, select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP)
+					registered = dev
+				try:
+					if poller.poll(0.5):
+						self._drain(dev)
+				except (IOError, OSError) as e:
+					start = time.monotonic()
+					if self._detach(dev, "read"):
+						self.disconnect_latencies.append(time.monotonic() - start)
+						j_logger.warning("Геймпад отключен. Ошибка: %s", e)
+		finally:
+			poller.close()
+
+	def _unregister(self, poller, dev):
+		try:
+			poller.unregister(dev.fd)
+		except (OSError, ValueError):
+			pass
+
+	def _drain(self, dev):
+		for event in dev.read():
+			self._handle_event(event.type, event.code, event.value, event.timestamp())
+
+	def _handle_event(self, ev_type, code, value, timestamp):
+		if self.recorder is not None:
+			event_time = timestamp if self._monotonic else time.monotonic()
+			self.recorder.record_evdev(ev_type, code, value, event_time)
+		if ev_type == evdev.ecodes.EV_ABS:
+			# Оси копятся до SYN_REPORT, чтобы X и Y публиковались вместе
+			self._pending_axes[code] = int(max(min(value, 254), 0)) - 127.5
+			self._pending_time = timestamp
+		elif ev_type == evdev.ecodes.EV_SYN and code == evdev.ecodes.SYN_REPORT:
+			if self._pending_time:
+				self.reports += 1
+				self._state = PadState(dict(self._pending_axes), self._pending_time,
+				                       self._state.seq + 1, True)
+				self._pending_time = 0.0
+		elif ev_type == evdev.ecodes.EV_KEY and code == self.estop_button:
+			if value == 1 and self.on_estop is not None:
+				self.on_estop(timestamp if self._monotonic else None)
+		elif ev_type == evdev.ecodes.EV_KEY and code in self.button_phrases:
+			self._button_edge(code, value)
+
+	def inject(self, ev_type, code, value, timestamp=None):
+		"""
+		Подает событие тем же путем, что и чтение с устройства
+		(воспроизведение записанной сессии, см. input_session.py).
+		"""
+		self._handle_event(ev_type, code, value, self._now() if timestamp is None else timestamp)
+
+	def set_virtual(self, connected=True):
+		"""Геймпад без устройства: is_connected() истинно, события подаются через inject()."""
+		self._virtual = connected
+		self._monotonic = True  # метки inject() берутся из time.monotonic()
+
+	def _button_edge(self, code, value):
+		if value == 1 and not self.button_states[code]:
+			self.button_states[code] = True
+			phrase = self.button_phrases[code]
+			j_logger.info("Кнопка %d нажата, озвучиваем: '%s'", code, phrase)
+			self.speak_async(phrase)
+		elif value == 0 and self.button_states[code]:
+			self.button_states[code] = False
+
+	def snapshot(self):
+		"""
+		Последнее опубликованное состояние за O(1), без обращения к устройству.
+		При первом использовании нового отчета запоминает его возраст.
+		"""
+		state = self._state
+		if state.seq != self._last_used_seq:
+			self._last_used_seq = state.seq
+			if state.connected:
+				self.input_ages.append(self._now() - state.timestamp)
+		return state
+
+	def get_stats(self):
+		"""Возраст данных стиков в момент использования циклом управления."""
+		ages = np.array(self.input_ages) * 1000.0
+		stats = {
+			"connected": self.is_connected(),
+			"name": self.dev.name if self.dev else None,
+			"monotonic_timestamps": self._monotonic,
+			"reports": self.reports,
+		}
+		if ages.size:
+			stats["input_age_ms"] = {
+				"mean": round(float(ages.mean()), 2),
+				"p50": round(float(np.percentile(ages, 50)), 2),
+				"p95": round(float(np.percentile(ages, 95)), 2),
+				"max": round(float(ages.max()), 2),
+			}
+		for key, values in (("connect_latency_ms", self.connect_latencies),
+		                    ("disconnect_latency_ms", self.disconnect_latencies)):
+			if values:
+				stats[key] = {"last": round(values[-1] * 1000.0, 2),
+				              "max": round(max(values) * 1000.0, 2)}
+		stats["last_disconnect_source"] = self.last_disconnect_source
+		stats["hotplug"] = self._observer is not None
+		return stats
+
+	def read_events(self):
+		"""
+		Оси из последнего снимка потока чтения (совместимость со старым API).
+		"""
+		return self.snapshot().axes
@@ -0,0 +1,153 @@
+"""
+Аварийная остановка с фиксацией до явного сброса.
+
+Сработать может веб (POST /estop, событие SocketIO 'estop'), кнопка PS на
+геймпаде (из потока чтения геймпада) или сторожевой таймер: цикл
+управления не тикал дольше watchdog_timeout, а моторы крутятся. trigger()
+сразу пишет в порт команды торможения обоих моторов каждого Qik шины
+(SerialMux.emergency) — мимо очереди запросов и цикла управления; байты
+готовятся заранее. После этого отменяются маневры, сбрасываются профиль
+движения и веб-джойстик. Пока остановка зафиксирована, мультиплексор не
+пишет команды скорости; clear() снимает фиксацию, профиль стартует с нуля.
+
+Задержка считается от срабатывания (для геймпада — от времени события
+ядра) до возврата flush() после записи, то есть до выдачи байтов в линию.
+Худший случай: текущая запись потока-владельца (команды тика и один
+запрос) плюс торможение — десятки байт, около 3 мс на 115200 бод.
+"""
+import time
+import logging
+import threading
+from collections import deque
+
+from qik import QIK_2S12V10_MOTOR_M0_BRAKE, QIK_2S12V10_MOTOR_M1_BRAKE
+
+logger = logging.getLogger('rover.estop')
+
+FULL_BRAKE = 127
+
+
+class EmergencyStop:
+    """Аварийная остановка шины Qik; latency_budget — допустимая задержка до линии, с."""
+
+    def __init__(self, bus, motion_profile=None, maneuvers=None, web_commands=None,
+                 loop_monitor=None, watchdog_timeout=0.5, latency_budget=0.02, on_trigger=None):
+        self.bus = bus
+        self.motion_profile = motion_profile
+        self.maneuvers = maneuvers
+        self.web_commands = web_commands
+        self.loop_monitor = loop_monitor
+        self.watchdog_timeout = watchdog_timeout
+        self.latency_budget = latency_budget
+        self.on_trigger = on_trigger
+        self.brake_frames = b''.join(
+            mc.build_message(mc.id, QIK_2S12V10_MOTOR_M0_BRAKE, FULL_BRAKE) +
+            mc.build_message(mc.id, QIK_2S12V10_MOTOR_M1_BRAKE, FULL_BRAKE)
+            for mc in bus.controllers.values())
+
+        self._lock = threading.Lock()
+        self.engaged = False
+        self.source = None
+        self.reason = None
+        self.engaged_at = None
+        self.triggers = 0
+        self.over_budget = 0
+        self.latencies = deque(maxlen=200)
+        self.history = deque(maxlen=20)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def trigger(self, source, reason=None, since=None):
+        """
+        Тормозит все моторы и фиксирует остановку. since — time.monotonic()
+        исходного события (например, метка геймпада). Возвращает задержку, с.
+        """
+        since = time.monotonic() if since is None else since
+        with self._lock:
+            cancelled = self.bus.mux.emergency(self.brake_frames)
+            latency = time.monotonic() - since
+            first = not self.engaged
+            self.triggers += 1
+            self.latencies.append(latency)
+            if latency > self.latency_budget:
+                self.over_budget += 1
+            if first:
+                self.engaged = True
+                self.source = source
+                self.reason = reason
+                self.engaged_at = time.time()
+            self.history.append({"event": "trigger", "source": source, "reason": reason,
+                                 "time": time.time(), "latency_ms": round(latency * 1000.0, 3)})
+        for mc in self.bus.controllers.values():
+            mc.current_speeds.update({0: 0, 1: 0})
+        if self.maneuvers is not None:
+            self.maneuvers.clear()
+        if self.motion_profile is not None:
+            self.motion_profile.reset()
+        if self.web_commands is not None:
+            self.web_commands.clear()
+        level = logging.ERROR if latency > self.latency_budget else logging.WARNING
+        logger.log(level, f"Аварийная остановка ({source}{': ' + reason if reason else ''}): "
+                          f"торможение в линии через {latency * 1000.0:.2f} мс, "
+                          f"отменено запросов: {cancelled}")
+        if first and self.on_trigger is not None:
+            self.on_trigger(source)
+        return latency
+
+    def clear(self, source):
+        """Снимает фиксацию; моторы стоят, пока цикл управления не выдаст новую команду."""
+        with self._lock:
+            if not self.engaged:
+                return False
+            if self.motion_profile is not None:
+                self.motion_profile.reset()
+            self.bus.mux.clear_emergency()
+            self.engaged = False
+            self.history.append({"event": "clear", "source": source, "time": time.time()})
+        logger.warning(f"Аварийная остановка снята ({source})")
+        return True
+
+    # --- Сторожевой таймер цикла управления ---
+
+    def start(self):
+        if self._thread is None and self.loop_monitor is not None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watchdog, daemon=True,
+                                            name="EStopWatchdog")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _moving(self):
+        return any(speed for mc in self.bus.controllers.values()
+                   for speed in mc.current_speeds.values())
+
+    def _watchdog(self):
+        while not self._stop.wait(self.watchdog_timeout / 4):
+            last_tick = self.loop_monitor.last_tick
+            if last_tick is None or self.engaged:
+                continue
+            stalled = time.monotonic() - last_tick
+            if stalled > self.watchdog_timeout and self._moving():
+                self.trigger("watchdog", f"цикл управления не отвечает {stalled * 1000.0:.0f} мс")
+
+    def get_status(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                "engaged": self.engaged,
+                "source": self.source if self.engaged else None,
+                "reason": self.reason if self.engaged else None,
+                "engaged_at": self.engaged_at if self.engaged else None,
+                "triggers": self.triggers,
+                "latency_budget_ms": round(self.latency_budget * 1000.0, 2),
+                "latency_ms_p50": (round(latencies[len(latencies) // 2] * 1000.0, 3)
+                                   if latencies else None),
+                "latency_ms_max": round(latencies[-1] * 1000.0, 3) if latencies else None,
+                "over_budget": self.over_budget,
+                "history": list(self.history),
+            }
@@ -0,0 +1,197 @@
+"""
+Проверка границы задержки аварийной остановки и задержки команд моторам
+на QikSerialStub.
+
+QikBus на заглушке со временем передачи байтов нагружается как в работе:
+цикл управления ставит скорости каждые --period с, телеметрия опрашивает
+устройства, а запрос к несуществующему id держит порт в ожидании ответа до
+таймаута (запрос в полете). В случайные моменты из другого потока
+срабатывает EmergencyStop.trigger(); для каждого срабатывания проверяется:
+  - задержка до выдачи торможения в линию не больше границы
+    (текущая запись потока-владельца + команды торможения на скорости
+    порта + --slack-ms на планирование потоков);
+  - заглушка приняла торможение обоих моторов каждого Qik;
+  - до сброса заглушка не приняла ни одной команды скорости.
+Перед срабатываниями проверяется, что запросы без ответа не задерживают
+команды скорости: наибольший промежуток между ними не больше периода тика
+плюс отрезок чтения мультиплексора, запись тика и --slack-ms.
+Код выхода 1, если хоть одна проверка не прошла.
+
+    python estop_check.py --baudrate 115200 --controllers 2 --triggers 50
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+from emergency_stop import EmergencyStop
+from qik_bus import QikBus
+from qik_stub import QikSerialStub
+from qik_telemetry import QikTelemetry
+from serial_mux import PRIORITY_TELEMETRY, READ_SLICE
+
+FIRST_ID = 0x0A
+# id, на который не отвечает ни одно устройство: запрос ждет таймаута read()
+SILENT_ID = 0x7E
+
+
+class Load:
+    """Фоновая нагрузка: цикл управления, телеметрия и запросы без ответа."""
+
+    def __init__(self, bus, estop, period):
+        self.bus = bus
+        self.estop = estop
+        self.period = period
+        self.telemetry = QikTelemetry(None, interval=0.05, bus=bus)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for target, name in ((self._control, "LoadControl"), (self._queries, "LoadQueries")):
+            thread = threading.Thread(target=target, daemon=True, name=name)
+            thread.start()
+            self._threads.append(thread)
+        self.telemetry.start()
+
+    def stop(self):
+        self._stop.set()
+        self.telemetry.stop()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def _control(self):
+        tick = 0
+        while not self._stop.wait(self.period):
+            if not self.estop.engaged:
+                speed = 40 + tick % 60
+                self.bus.set_speed(speed, -speed)
+            tick += 1
+
+    def _queries(self):
+        mc = self.bus.primary
+        while not self._stop.is_set():
+            mc.mux.request(mc.build_message(SILENT_ID, 0x01), 1, PRIORITY_TELEMETRY,
+                           timeout=2.0, retries=2)
+
+
+def worst_case(bus, stub, estop, slack):
+    """
+    Граница: самая длинная запись потока-владельца (тик всех устройств +
+    запрос с CRC) и торможение.
+    """
+    owner_bytes = 4 * 2 * len(bus.controllers) + 5
+    if bus.primary.crc:
+        owner_bytes += 2 * len(bus.controllers) + 1
+    return (owner_bytes + len(estop.brake_frames)) * 10.0 / stub.baudrate + slack
+
+
+def speed_gap_bound(bus, stub, period, slack):
+    tick_bytes = (5 if bus.primary.crc else 4) * 2 * len(bus.controllers)
+    return period + READ_SLICE + tick_bytes * 10.0 / stub.baudrate + slack
+
+
+def max_speed_gap(stub, duration):
+    """Наибольший промежуток между командами скорости, принятыми заглушкой за duration с."""
+    since = len(stub.commands)
+    start = time.monotonic()
+    time.sleep(duration)
+    end = time.monotonic()
+    # Границы окна тоже считаются: одна пачка команд за окно — это промежуток почти в окно
+    speeds = [timestamp for timestamp, cmd, _ in stub.commands[since:] if 0x88 <= cmd <= 0x8F]
+    times = [start] + speeds + [end]
+    return max(b - a for a, b in zip(times, times[1:]))
+
+
+def check_trigger(stub, estop, index, settle):
+    since = len(stub.commands)
+    latency = estop.trigger("check", f"#{index}")
+    time.sleep(settle)
+    received = stub.commands[since:]
+    brakes = [i for i, (_, cmd, data) in enumerate(received)
+              if cmd in (0x86, 0x87) and data[0] == 127]
+    # Запись потока-владельца, начатая до срабатывания, может дойти раньше торможения
+    after = received[brakes[0]:] if brakes else received
+    speeds = [cmd for _, cmd, _ in after if 0x88 <= cmd <= 0x8F]
+    braked = len(brakes)
+    return latency, braked, speeds
+
+
+def run(baudrate, controllers, triggers, period, crc, slack, seed):
+    device_ids = tuple(FIRST_ID + i for i in range(controllers))
+    stub = QikSerialStub(crc=crc, chain_ids=device_ids[1:])
+    bus = QikBus(ser=stub, device_ids=device_ids, baudrate=baudrate, crc=crc)
+    estop = EmergencyStop(bus)
+    bound = worst_case(bus, stub, estop, slack)
+    load = Load(bus, estop, period)
+    rng = random.Random(seed)
+    failures = []
+    latencies = []
+    gap_bound = speed_gap_bound(bus, stub, period, slack)
+    load.start()
+    try:
+        # Запрос к молчащему id ждет ответа весь таймаут порта, с повторами
+        gap = max_speed_gap(stub, 20 * period + 3 * bus.mux.reply_timeout)
+        if gap > gap_bound:
+            failures.append(f"speed commands stalled {gap * 1000.0:.2f} ms "
+                            f"> bound {gap_bound * 1000.0:.2f} ms while a query was unanswered")
+        for index in range(triggers):
+            # Срабатывание в случайной фазе тика и обмена
+            time.sleep(rng.uniform(2 * period, 8 * period))
+            latency, braked, speeds = check_trigger(stub, estop, index, settle=5 * period)
+            latencies.append(latency)
+            if latency > bound:
+                failures.append(f"#{index}: latency {latency * 1000.0:.2f} ms "
+                                f"> bound {bound * 1000.0:.2f} ms")
+            if braked < 2 * controllers:
+                failures.append(f"#{index}: {braked} brake commands received, "
+                                f"expected {2 * controllers}")
+            if speeds:
+                failures.append(f"#{index}: {len(speeds)} speed commands received while latched")
+            estop.clear("check")
+    finally:
+        load.stop()
+        bus.close()
+    latencies.sort()
+    return {
+        "baudrate": stub.baudrate,
+        "controllers": controllers,
+        "crc": crc,
+        "triggers": triggers,
+        "speed_gap_ms_max": round(gap * 1000.0, 3),
+        "speed_gap_bound_ms": round(gap_bound * 1000.0, 3),
+        "bound_ms": round(bound * 1000.0, 3),
+        "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000.0, 3),
+        "latency_ms_max": round(latencies[-1] * 1000.0, 3),
+        "cancelled": bus.mux.cancelled,
+        "motor_frames_blocked": bus.mux.motor_frames_blocked,
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка границы задержки аварийной остановки")
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--controllers', type=int, default=1)
+    parser.add_argument('--triggers', type=int, default=30)
+    parser.add_argument('--period', type=float, default=0.01,
+                        help="период тика цикла управления, с")
+    parser.add_argument('--crc', action='store_true')
+    parser.add_argument('--slack-ms', type=float, default=5.0,
+                        help="запас на планирование потоков, мс")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    report = run(args.baudrate, args.controllers, args.triggers, args.period, args.crc,
+                 args.slack_ms / 1000.0, args.seed)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report["failures"]:
+        print(f"FAIL: {len(report['failures'])} violations", file=sys.stderr)
+        sys.exit(1)
+    print(f"OK: estop max {report['latency_ms_max']} ms <= {report['bound_ms']} ms, "
+          f"speed gap max {report['speed_gap_ms_max']} ms <= {report['speed_gap_bound_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Запись видео до и после события (детекция собаки, сбой цикла управления,
+ручной запрос из веба).
+
+Последние секунды кадров детектора хранятся в памяти как JPEG с жестким
+лимитом по байтам: расход памяти не зависит от разрешения захвата, при
+росте кадров просто уменьшается глубина буфера. По событию буфер и
+следующие post_seconds секунд передаются фоновому потоку, который
+декодирует их и пишет видеофайл, не задерживая захват.
+
+Лимит max_bytes общий для кольцевого буфера, собираемого события, очереди
+записи и записываемого события: кадр, на который ссылаются несколько из
+них, считается один раз (счетчик ссылок). Если новый кадр не помещается,
+собираемое событие завершается досрочно без него, а из кольца вытесняются
+старые кадры: пока события ждут записи, кольцо короче pre_seconds.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('rover.events')
+
+EVENTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          '..', 'recordings', 'events'))
+
+
+class EventRecorder:
+    """
+    Кольцевой буфер JPEG-кадров и запись событий в файлы.
+    add() вызывается из потока детектора; trigger() — из любого потока.
+    """
+
+    def __init__(self, pre_seconds=10.0, post_seconds=5.0, max_bytes=16 * 1024 * 1024,
+                 record_fps=10, quality=70, output_dir=EVENTS_DIR, cooldown=10.0):
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self.min_interval = 1.0 / record_fps if record_fps else 0.0
+        self.quality = quality
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.output_dir = output_dir
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._frames = deque()  # [timestamp, jpeg bytes, ссылки] — кольцо до события
+        self._bytes = 0         # байты кадров кольца
+        self._held = 0          # байты всех кадров в памяти (кольцо + события), без повторов
+        self._last_add = 0.0
+        self._event = None  # текущее событие, собирающее кадры после срабатывания
+        self._last_trigger = 0.0
+
+        # Поток записи стартует при первом событии; очередь — под тем же замком
+        self._pending = deque()
+        self._max_pending = 2
+        self._pending_ready = threading.Condition(self._lock)
+        self._writer = None
+
+        self.evicted_frames = 0
+        self.encoded_frames = 0
+        self.events_written = 0
+        self.events_dropped = 0
+        self.last_file = None
+
+    def add(self, frame, jpeg=None, timestamp=None):
+        """
+        Добавляет кадр в буфер (не чаще record_fps). jpeg — уже закодированные
+        байты этого кадра (например, от FrameBroadcaster), чтобы не кодировать дважды.
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        if now - self._last_add < self.min_interval:
+            return
+        if jpeg is None:
+            ok, encoded = cv2.imencode('.jpg', frame, self._params)
+            if not ok:
+                return
+            jpeg = encoded.tobytes()
+            self.encoded_frames += 1
+        self._last_add = now
+
+        with self._lock:
+            entry = [now, jpeg, 1]
+            self._frames.append(entry)
+            self._bytes += len(jpeg)
+            self._held += len(jpeg)
+            if self._event is not None:
+                if self._held > self.max_bytes:
+                    logger.warning(f"Событие '{self._event['reasons'][0]}' "
+                                   f"завершено досрочно: лимит памяти")
+                    self._submit(self._event)
+                    self._event = None
+                else:
+                    self._hold(self._event, entry)
+                    if now >= self._event["until"]:
+                        self._submit(self._event)
+                        self._event = None
+            self._evict(now)
+
+    def _hold(self, event, entry):
+        entry[2] += 1
+        event["frames"].append(entry)
+        event["bytes"] += len(entry[1])
+
+    def _release(self, entry):
+        entry[2] -= 1
+        if entry[2] == 0:
+            self._held -= len(entry[1])
+
+    def _release_event(self, event):
+        for entry in event["frames"]:
+            self._release(entry)
+
+    def _evict(self, now):
+        """
+        Удаляет кадры кольца старше pre_seconds и сверх общего лимита байт.
+        Новый кадр держит только кольцо, так что лимит всегда достижим.
+        """
+        frames = self._frames
+        while frames and (self._held > self.max_bytes or now - frames[0][0] > self.pre_seconds):
+            entry = frames.popleft()
+            self._bytes -= len(entry[1])
+            self._release(entry)
+            self.evicted_frames += 1
+
+    def trigger(self, reason):
+        """
+        Запрашивает запись события. Повторные срабатывания во время записи
+        или в пределах cooldown продлевают текущее событие, а не создают новое.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._event is not None:
+                self._event["until"] = max(self._event["until"], now + self.post_seconds)
+                self._event["reasons"].append(reason)
+                return False
+            if now - self._last_trigger < self.cooldown:
+                return False
+            self._last_trigger = now
+            # Кадры до события сохраняются ссылками на те же байты, без копий
+            self._event = {
+                "reasons": [reason],
+                "wall_time": time.time(),
+                "frames": [],
+                "bytes": 0,
+                "until": now + self.post_seconds,
+            }
+            for entry in self._frames:
+                self._hold(self._event, entry)
+        logger.info(f"Событие '{reason}': запись {self.pre_seconds:.0f}+{self.post_seconds:.0f} c")
+        return True
+
+    def _submit(self, event):
+        """Ставит событие в очередь записи. Вызывается под замком."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                            name="EventWriter")
+            self._writer.start()
+        if len(self._pending) >= self._max_pending:
+            self._drop(event)
+            return
+        self._pending.append(event)
+        self._pending_ready.notify()
+
+    def _drop(self, event):
+        self._release_event(event)
+        self.events_dropped += 1
+        logger.warning(f"Запись события '{event['reasons'][0]}' пропущена: писатель занят")
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._pending_ready.wait()
+                event = self._pending.popleft()
+            if event is None:
+                break
+            try:
+                self._write_event(event)
+            except Exception as e:
+                logger.error(f"Ошибка записи события: {e}")
+            finally:
+                with self._lock:
+                    self._release_event(event)
+
+    def _write_event(self, event):
+        frames = event["frames"]
+        if not frames:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = time.strftime('%Y%m%d-%H%M%S', time.localtime(event["wall_time"]))
+        reason = "".join(c if c.isalnum() else "_" for c in event["reasons"][0])
+        path = os.path.join(self.output_dir, f"{name}-{reason}.avi")
+
+        duration = frames[-1][0] - frames[0][0]
+        if duration > 0:
+            fps = (len(frames) - 1) / duration
+        else:
+            fps = 1.0 / self.min_interval if self.min_interval else 10.0
+        writer = None
+        size = None
+        try:
+            for _, jpeg, _ in frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    continue
+                if writer is None:
+                    size = (image.shape[1], image.shape[0])
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+                elif (image.shape[1], image.shape[0]) != size:
+                    # Разрешение захвата менялось (QualityGovernor) — приводим к первому кадру
+                    image = cv2.resize(image, size)
+                writer.write(image)
+        finally:
+            if writer is not None:
+                writer.release()
+        self.events_written += 1
+        self.last_file = path
+        logger.info(f"Событие записано: {path} ({len(frames)} кадров, {event['bytes'] // 1024} КБ)")
+
+    def get_stats(self):
+        with self._lock:
+            buffered = len(self._frames)
+            span = self._frames[-1][0] - self._frames[0][0] if buffered > 1 else 0.0
+            return {
+                "buffered_frames": buffered,
+                "buffered_seconds": round(span, 1),
+                "buffered_bytes": self._bytes,
+                "held_bytes": self._held,
+                "max_bytes": self.max_bytes,
+                "pending_events": len(self._pending),
+                "recording": self._event is not None,
+                "evicted_frames": self.evicted_frames,
+                "encoded_frames": self.encoded_frames,
+                "events_written": self.events_written,
+                "events_dropped": self.events_dropped,
+                "last_file": self.last_file,
+            }
+
+    def close(self):
+        """Дописывает текущее событие и останавливает поток записи."""
+        with self._lock:
+            if self._event is not None:
+                self._submit(self._event)
+                self._event = None
+            if self._writer is not None:
+                # Сигнал остановки — мимо лимита очереди, после уже поставленных событий
+                self._pending.append(None)
+                self._pending_ready.notify()
+        if self._writer is not None:
+            self._writer.join(timeout=10.0)
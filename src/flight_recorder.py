@@ -0,0 +1,217 @@
+"""
+Бортовой самописец: колонки фиксированной ширины в memory-mapped файлах.
+
+Каждый сегмент — каталог recordings/flight/<время начала>/ с файлом на
+колонку (сырой массив numpy.memmap заранее выделенной длины) и meta.json.
+Запись — присваивание в memmap по индексу, без сериализации; число
+записанных строк хранится в count.i8 того же сегмента. Новый сегмент
+начинается, когда текущий заполнен или старше segment_seconds.
+
+query() возвращает диапазон времени, сжатый до N корзин (min/max/mean),
+обходя сегменты по очереди: в память попадают только нужные страницы.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger('rover.flight')
+
+FLIGHT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          '..', 'recordings', 'flight'))
+
+# Колонки самописца; t — time.time(), по нему ищутся диапазоны
+COLUMNS = [
+    ("t", "f8"),
+    ("left", "i2"),
+    ("right", "i2"),
+    ("source", "u1"),
+    ("current_m0", "f4"),
+    ("current_m1", "f4"),
+    ("loop_period_ms", "f4"),
+    ("detections", "u2"),
+    ("dog", "u1"),
+    ("cpu_temp", "f4"),
+]
+SOURCES = {"none": 0, "pad": 1, "web": 2, "follow": 3, "maneuver": 4, "estop": 5}
+_FLOAT_MISSING = np.nan
+
+
+class _Segment:
+    """Один сегмент: memmap на колонку и счетчик строк."""
+
+    def __init__(self, path, capacity=None, columns=COLUMNS, create=False):
+        self.path = path
+        self.columns = columns
+        if create:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, 'meta.json'), 'w') as f:
+                json.dump({"capacity": capacity, "columns": columns}, f)
+            mode = 'w+'
+        else:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            capacity = meta["capacity"]
+            self.columns = columns = [tuple(c) for c in meta["columns"]]
+            mode = 'r'
+        self.capacity = capacity
+        self.arrays = {
+            name: np.memmap(os.path.join(path, f"{name}.{dtype}"), dtype=dtype, mode=mode,
+                            shape=(capacity,))
+            for name, dtype in columns
+        }
+        self._count = np.memmap(os.path.join(path, 'count.i8'), dtype='i8', mode=mode, shape=(1,))
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    def append(self, row):
+        index = self.count
+        for name, array in self.arrays.items():
+            value = row.get(name)
+            if value is None:
+                value = _FLOAT_MISSING if array.dtype.kind == 'f' else 0
+            array[index] = value
+        # Счетчик увеличивается после записи строки — читатель не увидит половину
+        self._count[0] = index + 1
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+        self._count.flush()
+
+    def time_range(self):
+        count = self.count
+        if not count:
+            return None
+        t = self.arrays["t"]
+        return float(t[0]), float(t[count - 1])
+
+
+class FlightRecorder:
+    """
+    Добавление строк из цикла управления и запросы из веба.
+    Файлы создаются при первой записи.
+    """
+
+    def __init__(self, directory=FLIGHT_DIR, segment_seconds=3600, rate_hz=10, columns=COLUMNS):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.capacity = int(segment_seconds * rate_hz * 1.25)  # запас на неровный период
+        self.columns = columns
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_start = None
+        self.samples = 0
+
+    def record(self, **row):
+        """Добавляет строку; отсутствующие колонки — NaN (float) или 0."""
+        now = time.time()
+        row.setdefault("t", now)
+        if isinstance(row.get("source"), str):
+            row["source"] = SOURCES.get(row["source"], 0)
+        with self._lock:
+            segment = self._segment
+            if segment is None or segment.count >= segment.capacity \
+                    or now - self._segment_start >= self.segment_seconds:
+                segment = self._roll(now)
+            segment.append(row)
+            self.samples += 1
+
+    def _roll(self, now):
+        if self._segment is not None:
+            self._segment.flush()
+        name = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        path = os.path.join(self.directory, name)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{suffix}")
+            suffix += 1
+        self._segment = _Segment(path, self.capacity, self.columns, create=True)
+        self._segment_start = now
+        logger.info(f"Новый сегмент самописца: {path}")
+        return self._segment
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.flush()
+                self._segment = None
+
+    def segments(self):
+        """Список сегментов: путь и диапазон времени."""
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(os.path.join(path, 'meta.json')):
+                continue
+            time_range = self._open(path).time_range()
+            if time_range:
+                result.append({"name": name, "start": time_range[0], "end": time_range[1]})
+        return result
+
+    def _open(self, path):
+        if self._segment is not None and self._segment.path == path:
+            return self._segment
+        return _Segment(path)
+
+    def query(self, columns, start=None, end=None, points=500):
+        """
+        Возвращает {"t": центры корзин, колонка: {"min", "max", "mean"}}
+        для [start, end], сжатый до points корзин по времени. Пустые корзины — None.
+        """
+        segments = [s for s in self.segments()
+                    if (end is None or s["start"] <= end) and (start is None or s["end"] >= start)]
+        if not segments:
+            return {"t": [], **{c: {"min": [], "max": [], "mean": []} for c in columns}}
+        start = segments[0]["start"] if start is None else start
+        end = segments[-1]["end"] if end is None else end
+        points = max(1, int(points))
+        edges = np.linspace(start, end, points + 1)
+
+        samples = np.zeros(points, dtype=np.int64)
+        valid_counts = {c: np.zeros(points, dtype=np.int64) for c in columns}
+        sums = {c: np.zeros(points) for c in columns}
+        mins = {c: np.full(points, np.inf) for c in columns}
+        maxs = {c: np.full(points, -np.inf) for c in columns}
+
+        for info in segments:
+            segment = self._open(os.path.join(self.directory, info["name"]))
+            t = segment.arrays["t"][:segment.count]
+            lo = np.searchsorted(t, start, side='left')
+            hi = np.searchsorted(t, end, side='right')
+            if hi <= lo:
+                continue
+            # Номер корзины для каждой строки; строки одной корзины идут подряд
+            bucket = np.minimum(np.searchsorted(edges, t[lo:hi], side='right') - 1, points - 1)
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            ids = bucket[starts]
+            samples[ids] += np.diff(np.r_[starts, hi - lo])
+            for column in columns:
+                values = np.asarray(segment.arrays[column][lo:hi], dtype=np.float64)
+                valid = ~np.isnan(values)
+                valid_counts[column][ids] += np.add.reduceat(valid.astype(np.int64), starts)
+                sums[column][ids] += np.add.reduceat(np.where(valid, values, 0.0), starts)
+                low = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+                high = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+                mins[column][ids] = np.minimum(mins[column][ids], low)
+                maxs[column][ids] = np.maximum(maxs[column][ids], high)
+
+        centers = (edges[:-1] + edges[1:]) / 2
+        result = {"t": centers.round(3).tolist(), "samples": samples.tolist()}
+        for column in columns:
+            n = valid_counts[column]
+            has = n > 0
+            mean = np.divide(sums[column], n, out=np.zeros(points), where=has)
+            result[column] = {
+                "min": [float(v) if h else None for v, h in zip(mins[column], has)],
+                "max": [float(v) if h else None for v, h in zip(maxs[column], has)],
+                "mean": [round(float(v), 3) if h else None for v, h in zip(mean, has)],
+            }
+        return result
@@ -0,0 +1,170 @@
+import time
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from detections import DOG_CLASS_ID
+
+logger = logging.getLogger('rover.follow')
+
+
+class PID:
+    """Простой ПИД-регулятор с ограничением интеграла и выхода."""
+
+    def __init__(self, kp, ki=0.0, kd=0.0, output_limit=127.0, integral_limit=1.0):
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.prev_error = None
+
+    def update(self, error, dt):
+        if dt > 0:
+            integral = self.integral + error * dt
+            self.integral = max(-self.integral_limit, min(integral, self.integral_limit))
+        derivative = 0.0
+        if self.prev_error is not None and dt > 0:
+            derivative = (error - self.prev_error) / dt
+        self.prev_error = error
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.output_limit, min(output, self.output_limit))
+
+
+class FollowController:
+    """
+    Режим следования за целью (по умолчанию — собакой) по детекциям
+    VirtualCameraObjectDetector. Поворот — ПИД по смещению центра бокса
+    от центра кадра, движение вперед — ПИД по площади бокса.
+    Задержка компенсируется экстраполяцией смещения по времени детекции,
+    при устаревших детекциях моторы останавливаются.
+    """
+
+    def __init__(self, detector=None, target_class=DOG_CLASS_ID, target_area=0.20,
+                 max_age=0.5, max_speed=70, max_step=15,
+                 turn_pid=None, distance_pid=None):
+        self.detector = detector
+        self.target_class = target_class
+        self.target_area = target_area
+        self.max_age = max_age
+        self.max_speed = max_speed
+        self.max_step = max_step
+        self.turn_pid = turn_pid or PID(kp=60.0, ki=5.0, kd=8.0, output_limit=max_speed)
+        self.distance_pid = distance_pid or PID(kp=250.0, ki=20.0, kd=0.0, output_limit=max_speed)
+
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._last_time = None
+        self._last_command = (0, 0)
+        self._prev_detection = None  # (timestamp, offset) для оценки скорости цели
+        self._velocity = 0.0
+        self.latencies = deque(maxlen=300)
+        self.stale_ticks = 0
+        self.target_ticks = 0
+
+    def set_enabled(self, enabled):
+        with self._lock:
+            self.enabled = bool(enabled)
+            self._reset()
+        logger.info(f"Режим следования {'включен' if enabled else 'выключен'}")
+
+    def _reset(self):
+        self.turn_pid.reset()
+        self.distance_pid.reset()
+        self._last_time = None
+        self._last_command = (0, 0)
+        self._prev_detection = None
+        self._velocity = 0.0
+
+    def compute(self, now=None):
+        """Возвращает (left, right) для цикла управления."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.enabled:
+                return 0, 0
+            dt = now - self._last_time if self._last_time is not None else 0.0
+            self._last_time = now
+
+            previous = self._prev_detection[0] if self._prev_detection is not None else None
+            target = self._find_target(now)
+            if target is None:
+                # Цели нет или детекции устарели — безопасная остановка
+                self.stale_ticks += 1
+                self.turn_pid.reset()
+                self.distance_pid.reset()
+                self._last_command = (0, 0)
+                return 0, 0
+
+            timestamp, offset, area = target
+            self.target_ticks += 1
+            if timestamp != previous:
+                # Задержка — до первой команды по новой детекции; тики на той же детекции не в счет
+                self.latencies.append(now - timestamp)
+
+            # Компенсация задержки: цель сместилась за время от захвата кадра до сейчас
+            predicted = float(np.clip(offset + self._velocity * (now - timestamp), -1.0, 1.0))
+            turn = self.turn_pid.update(predicted, dt)
+            forward = self.distance_pid.update(self.target_area - area, dt)
+            forward = max(0.0, forward)  # назад за целью не едем
+
+            left = max(-self.max_speed, min(forward + turn, self.max_speed))
+            right = max(-self.max_speed, min(forward - turn, self.max_speed))
+            left, right = self._smooth(left, right)
+            self._last_command = (left, right)
+            return left, right
+
+    def _find_target(self, now):
+        if self.detector is None:
+            return None
+        latest = self.detector.latest_detections()
+        if latest is None:
+            return None
+        timestamp, (w, h), detections = latest
+        if now - timestamp > self.max_age:
+            return None
+
+        targets = detections[detections['class_id'] == self.target_class]
+        if len(targets) == 0:
+            return None
+        best = targets[np.argmax(targets['confidence'])]
+        cx = (int(best['x1']) + int(best['x2'])) / 2.0
+        offset = (cx - w / 2.0) / (w / 2.0)
+        box_w = int(best['x2']) - int(best['x1'])
+        box_h = int(best['y2']) - int(best['y1'])
+        area = box_w * box_h / float(w * h)
+
+        if self._prev_detection is not None and timestamp > self._prev_detection[0]:
+            prev_ts, prev_offset = self._prev_detection
+            self._velocity = (offset - prev_offset) / (timestamp - prev_ts)
+        if self._prev_detection is None or timestamp > self._prev_detection[0]:
+            self._prev_detection = (timestamp, offset)
+        return timestamp, offset, area
+
+    def _smooth(self, left, right):
+        """Ограничивает изменение скорости колес за один тик."""
+        prev_left, prev_right = self._last_command
+        left = prev_left + max(-self.max_step, min(left - prev_left, self.max_step))
+        right = prev_right + max(-self.max_step, min(right - prev_right, self.max_step))
+        return int(left), int(right)
+
+    def get_status(self):
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000.0
+            status = {
+                "enabled": self.enabled,
+                "last_command": list(self._last_command),
+                "target_ticks": self.target_ticks,
+                "stale_ticks": self.stale_ticks,
+            }
+        if latencies.size:
+            status["detection_to_command_ms"] = {
+                "mean": round(float(latencies.mean()), 1),
+                "p50": round(float(np.percentile(latencies, 50)), 1),
+                "p95": round(float(np.percentile(latencies, 95)), 1),
+                "max": round(float(latencies.max()), 1),
+            }
+        return status
@@ -0,0 +1,143 @@
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Параметры нормализации MobileNet-SSD (как в cv2.dnn.blobFromImage)
+BLOB_SCALE = 0.007843
+BLOB_MEAN = 127.5
+
+
+class FrameBufferPool:
+    """
+    Набор заранее выделенных буферов для обработки кадра.
+    Все промежуточные массивы (кадр захвата, resize, blob, I420) переиспользуются
+    между кадрами, поэтому горячий цикл детектора не выделяет память.
+    """
+
+    def __init__(self, width=640, height=480, input_size=(300, 300)):
+        self.width = width
+        self.height = height
+        self.input_size = tuple(input_size)
+        in_w, in_h = self.input_size
+
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self.resized = np.empty((in_h, in_w, 3), dtype=np.uint8)
+        self.blob = np.empty((1, 3, in_h, in_w), dtype=np.float32)
+        self.yuv = np.empty((height * 3 // 2, width), dtype=np.uint8)
+
+    def prepare_blob(self, frame, out=None):
+        """
+        Аналог blobFromImage(resize(frame), BLOB_SCALE, size, BLOB_MEAN),
+        но результат пишется в self.blob без новых выделений.
+        Скаляр mean в blobFromImage — это Scalar(127.5, 0, 0): среднее
+        вычитается только из канала B, здесь так же, чтобы выход сети не менялся.
+        out — срез 3xHxW чужого блоба (например, элемент пакета нескольких камер).
+        """
+        cv2.resize(frame, self.input_size, dst=self.resized)
+        chw = self.blob[0] if out is None else out
+        np.copyto(chw, self.resized.transpose(2, 0, 1), casting='unsafe')
+        np.subtract(chw[0], BLOB_MEAN, out=chw[0])
+        np.multiply(chw, BLOB_SCALE, out=chw)
+        return self.blob if out is None else out
+
+    def to_yuv(self, frame, dst=None):
+        """Конвертирует BGR-кадр в I420 в dst (по умолчанию во внутренний буфер)."""
+        if dst is None:
+            dst = self.yuv
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=dst)
+        return dst
+
+
+# --- Бенчмарк выделений памяти ---
+
+def _legacy_frame_path(frame, fd):
+    """Старый путь кадра: каждый шаг создает новый массив."""
+    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), BLOB_SCALE, (300, 300), BLOB_MEAN)
+    yuv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+    os.write(fd, yuv_frame.tobytes())
+    return blob
+
+
+def _pooled_frame_path(frame, pool, sink):
+    blob = pool.prepare_blob(frame)
+    pool.to_yuv(frame, dst=sink.acquire())
+    sink.commit()
+    return blob
+
+
+def _measure(step, frames):
+    """
+    Прогоняет step() frames раз под tracemalloc. Для каждого кадра
+    фиксирует пик временных выделений (peak - current до кадра).
+    """
+    step()  # прогрев
+    tracemalloc.start()
+    transient = 0
+    worst = 0
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - before
+        worst = max(worst, peak - before)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    return {
+        "transient_bytes_per_frame": transient // frames,
+        "worst_frame_bytes": worst,
+        "ms_per_frame": elapsed * 1000.0 / frames,
+    }
+
+
+def run_benchmark(frames=300, width=640, height=480, device=None, out_file=None):
+    """
+    Сравнивает старый и пуловый путь кадра по объему временных выделений
+    (tracemalloc) и времени на кадр. Пишет либо в v4l2loopback (device),
+    либо в файл-заглушку (out_file, по умолчанию /dev/null).
+    """
+    from frame_sinks import FileFrameSink, LoopbackFrameSink
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    target = out_file or os.devnull
+
+    results = {}
+
+    fd = os.open(device or target, os.O_WRONLY | (0 if device else os.O_CREAT))
+    try:
+        results['legacy'] = _measure(lambda: _legacy_frame_path(frame, fd), frames)
+    finally:
+        os.close(fd)
+
+    pool = FrameBufferPool(width, height)
+    if device:
+        sink = LoopbackFrameSink(device, width, height)
+    else:
+        sink = FileFrameSink(target, width, height)
+    try:
+        results['pooled'] = _measure(lambda: _pooled_frame_path(frame, pool, sink), frames)
+    finally:
+        sink.close()
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Бенчмарк выделений памяти на пути кадра")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--device', help="v4l2loopback устройство, например /dev/video2")
+    parser.add_argument('--out-file', help="файл-заглушка вместо loopback (по умолчанию /dev/null)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.frames, args.width, args.height, args.device, args.out_file)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,232 @@
+"""
+Шина кадров в разделяемой памяти (multiprocessing.shared_memory).
+
+Один производитель (захват с камеры) пишет кадры в кольцо из N слотов,
+потребители в этом или других процессах читают последний кадр без копий:
+numpy-представление слота смотрит прямо в разделяемую память.
+
+Каждый слот защищен счетчиком последовательности (seqlock): перед записью
+производитель помечает слот как занятый (-1), после записи кладет номер
+кадра. Потребитель после обработки проверяет, что номер не изменился —
+иначе кадр был перезаписан и результат нужно отбросить.
+"""
+import time
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger('object_detector')
+
+_WRITING = -1
+
+
+class FrameBus:
+    """
+    Кольцо слотов кадров в разделяемой памяти.
+    Заголовок (int64): [latest_seq, slot0_seq, slot0_ts_ns, slot1_seq, ...].
+    """
+
+    def __init__(self, width=640, height=480, slots=4, name=None, create=True):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.frame_shape = (height, width, 3)
+        frame_bytes = width * height * 3
+        header_items = 1 + 2 * slots
+        header_bytes = header_items * 8
+        size = header_bytes + slots * frame_bytes
+
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+
+        self._header = np.ndarray((header_items,), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = [
+            np.ndarray(self.frame_shape, dtype=np.uint8, buffer=self.shm.buf,
+                       offset=header_bytes + i * frame_bytes)
+            for i in range(slots)
+        ]
+        if create:
+            self._header[:] = 0
+            self._header[0] = _WRITING
+            for i in range(slots):
+                self._header[1 + 2 * i] = _WRITING
+        self._next_seq = 0
+
+    def describe(self):
+        """Параметры для подключения к шине из другого процесса."""
+        return {"name": self.name, "width": self.width, "height": self.height, "slots": self.slots}
+
+    @classmethod
+    def attach(cls, name, width, height, slots):
+        return cls(width, height, slots, name=name, create=False)
+
+    # --- Производитель ---
+
+    def begin_write(self):
+        """Возвращает (seq, view) слота для записи следующего кадра."""
+        seq = self._next_seq
+        slot = seq % self.slots
+        self._header[1 + 2 * slot] = _WRITING
+        return seq, self._frames[slot]
+
+    def commit_write(self, seq, timestamp=None):
+        slot = seq % self.slots
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._header[2 + 2 * slot] = int(timestamp * 1e9)
+        self._header[1 + 2 * slot] = seq
+        self._header[0] = seq
+        self._next_seq = seq + 1
+
+    # --- Потребители ---
+
+    def latest_seq(self):
+        return int(self._header[0])
+
+    def read(self, seq):
+        """
+        Возвращает (timestamp, view) кадра seq без копирования
+        или None, если кадр уже перезаписан.
+        """
+        if seq < 0:
+            return None
+        slot = seq % self.slots
+        if self._header[1 + 2 * slot] != seq:
+            return None
+        return self._header[2 + 2 * slot] / 1e9, self._frames[slot]
+
+    def read_latest(self):
+        """(seq, timestamp, view) последнего кадра или None, если кадров еще нет."""
+        seq = self.latest_seq()
+        frame = self.read(seq)
+        if frame is None:
+            return None
+        return (seq,) + frame
+
+    def is_valid(self, seq):
+        """Проверяет, что слот кадра seq не был перезаписан за время обработки."""
+        return self._header[1 + 2 * (seq % self.slots)] == seq
+
+    def wait_for_frame(self, after_seq, timeout=1.0, poll_interval=0.002):
+        """Ждет кадр новее after_seq. Возвращает его seq или None по таймауту."""
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq()
+            if seq > after_seq:
+                return seq
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._frames = []
+        self._header = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def inference_worker(bus_info, conn, backend_spec=None, confidence_threshold=0.5,
+                     class_filter=None, nms_threshold=0.45, gated=False):
+    """
+    Процесс инференса: берет последний кадр из шины, прогоняет DNN и
+    отправляет (seq, timestamp, detections, dropped, forward_seconds, fresh)
+    через conn. Если кадр был перезаписан во время подготовки blob,
+    результат отбрасывается. dict в conn меняет настройки (input_size,
+    detect_every), None или закрытый канал завершает процесс.
+
+    gated=True: кадры выбирает гейт движения на стороне захвата, процесс
+    прогоняет только запрошенные (seq, roi). При roi сеть видит только
+    область, детекции вне нее переносятся с прошлого прогона, а fresh —
+    детекции из самой области. Если запросы накопились, берется последний
+    и по полному кадру.
+    """
+    from detections import postprocess
+    from frame_buffers import FrameBufferPool
+    from inference_backends import create_backend
+    from motion_gate import remap_roi_detections, merge_roi_detections
+
+    bus = FrameBus.attach(bus_info["name"], bus_info["width"], bus_info["height"],
+                          bus_info["slots"])
+    backend = create_backend(backend_spec)
+    pool = FrameBufferPool(bus.width, bus.height, backend.input_size)
+    last_seq = -1
+    dropped = 0
+    detect_every = 1
+    cached = None
+
+    try:
+        running = True
+        while running:
+            request = None
+            requests = 0
+            # С гейтом ждем запрос, без него — только забираем настройки
+            timeout = 0.5 if gated else 0
+            while conn.poll(timeout):
+                timeout = 0
+                message = conn.recv()
+                if message is None:
+                    running = False
+                    break
+                if isinstance(message, dict):
+                    # Настройки качества от QualityGovernor
+                    detect_every = max(1, int(message.get("detect_every", detect_every)))
+                    input_size = tuple(message.get("input_size", pool.input_size))
+                    if input_size != pool.input_size:
+                        pool = FrameBufferPool(bus.width, bus.height, input_size)
+                        backend.input_size = input_size
+                        cached = None
+                else:
+                    request = message
+                    requests += 1
+            if not running:
+                break
+
+            if gated:
+                if request is None:
+                    continue
+                seq, roi = request
+                if requests > 1 or cached is None:
+                    roi = None
+            else:
+                seq = bus.wait_for_frame(last_seq + detect_every - 1, timeout=0.5)
+                if seq is None:
+                    continue
+                last_seq = seq
+                roi = None
+            frame = bus.read(seq)
+            if frame is None:
+                if gated:
+                    # Запрошенный кадр успели перезаписать, пока процесс был занят
+                    dropped += 1
+                continue
+            timestamp, view = frame
+            start = time.perf_counter()
+            if roi is None:
+                blob = pool.prepare_blob(view)
+            else:
+                x1, y1, x2, y2 = roi
+                blob = pool.prepare_blob(view[y1:y2, x1:x2])
+            if not bus.is_valid(seq):
+                dropped += 1
+                continue
+            raw = backend.forward(blob)
+            fresh = None
+            if roi is not None:
+                fresh = remap_roi_detections(raw, roi, bus.width, bus.height)
+                raw = merge_roi_detections(cached, fresh, roi, bus.width, bus.height)
+            cached = raw
+            forward_seconds = time.perf_counter() - start
+            detections = postprocess(raw, bus.width, bus.height, confidence_threshold,
+                                     class_filter, nms_threshold)
+            if fresh is not None:
+                fresh = postprocess(fresh, bus.width, bus.height, confidence_threshold,
+                                    class_filter, nms_threshold)
+            conn.send((seq, timestamp, detections, dropped, forward_seconds,
+                       detections if fresh is None else fresh))
+    except (EOFError, BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        bus.close()
@@ -0,0 +1,188 @@
+import os
+import mmap
+import fcntl
+import ctypes
+import logging
+
+import numpy as np
+
+logger = logging.getLogger('object_detector')
+
+
+def _i420_shape(width, height):
+    return (height * 3 // 2, width)
+
+
+class NullFrameSink:
+    """Отбрасывает кадры (для бенчмарков без устройства вывода)."""
+
+    def __init__(self, width=640, height=480):
+        self.buffer = np.empty(_i420_shape(width, height), dtype=np.uint8)
+
+    def acquire(self):
+        return self.buffer
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FileFrameSink:
+    """
+    Пишет I420-кадры в файл (или /dev/null) из заранее выделенного буфера.
+    os.write получает сам numpy-массив, поэтому tobytes() не нужен.
+    """
+
+    def __init__(self, path, width=640, height=480):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.buffer = np.empty(_i420_shape(width, height), dtype=np.uint8)
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    def acquire(self):
+        """Возвращает буфер, в который нужно записать следующий кадр."""
+        return self.buffer
+
+    def commit(self):
+        os.write(self.fd, self.buffer)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class LoopbackFrameSink:
+    """
+    Выход в v4l2loopback через streaming I/O (V4L2_MEMORY_MMAP).
+    acquire() отдает numpy-представление буфера драйвера, поэтому
+    cvtColor(..., dst=...) пишет кадр прямо в память драйвера без копий.
+    Если драйвер не поддерживает mmap, используется обычный write().
+    """
+
+    def __init__(self, device, width=640, height=480, buffer_count=4, use_mmap=True):
+        import v4l2
+        self._v4l2 = v4l2
+
+        if not os.path.exists(device):
+            raise FileNotFoundError(f"Device not found: {device}")
+
+        self.device = device
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3 // 2
+        self.fd = os.open(device, os.O_RDWR)
+        self.streaming = False
+        self._mmaps = []
+        self._views = []
+        self._queued = 0
+        self._current = None
+        self._fallback = np.empty(_i420_shape(width, height), dtype=np.uint8)
+
+        try:
+            self._set_format()
+            if use_mmap:
+                self._setup_mmap(buffer_count)
+        except Exception:
+            self.close()
+            raise
+
+    def _set_format(self):
+        v4l2 = self._v4l2
+        fmt = v4l2.v4l2_format()
+        fmt.type = v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT
+        fmt.fmt.pix.width = self.width
+        fmt.fmt.pix.height = self.height
+        fmt.fmt.pix.pixelformat = v4l2.V4L2_PIX_FMT_YUV420
+        fmt.fmt.pix.bytesperline = self.width
+        fmt.fmt.pix.sizeimage = self.frame_size
+        fmt.fmt.pix.field = v4l2.V4L2_FIELD_NONE
+        fcntl.ioctl(self.fd, v4l2.VIDIOC_S_FMT, fmt)
+        logger.info(f"Virtual camera format set to YUV420 on {self.device}")
+
+    def _setup_mmap(self, buffer_count):
+        v4l2 = self._v4l2
+        req = v4l2.v4l2_requestbuffers()
+        req.type = v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT
+        req.memory = v4l2.V4L2_MEMORY_MMAP
+        req.count = buffer_count
+        try:
+            fcntl.ioctl(self.fd, v4l2.VIDIOC_REQBUFS, req)
+        except OSError as e:
+            logger.warning(f"mmap streaming is not supported by {self.device}, "
+                           f"falling back to write(): {e}")
+            return
+
+        for index in range(req.count):
+            buf = self._new_buffer(index)
+            fcntl.ioctl(self.fd, v4l2.VIDIOC_QUERYBUF, buf)
+            mm = mmap.mmap(self.fd, buf.length, mmap.MAP_SHARED,
+                           mmap.PROT_READ | mmap.PROT_WRITE, offset=buf.m.offset)
+            self._mmaps.append(mm)
+            view = np.frombuffer(mm, dtype=np.uint8, count=self.frame_size)
+            self._views.append(view.reshape(_i420_shape(self.width, self.height)))
+
+        buf_type = ctypes.c_int(v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT)
+        fcntl.ioctl(self.fd, v4l2.VIDIOC_STREAMON, buf_type)
+        self.streaming = True
+        logger.info(f"V4L2 mmap streaming enabled on {self.device} ({len(self._mmaps)} buffers)")
+
+    def _new_buffer(self, index):
+        v4l2 = self._v4l2
+        buf = v4l2.v4l2_buffer()
+        buf.type = v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT
+        buf.memory = v4l2.V4L2_MEMORY_MMAP
+        buf.index = index
+        return buf
+
+    def acquire(self):
+        """
+        Возвращает буфер для следующего кадра. Пока не все буферы драйвера
+        заняты, берем следующий по порядку, затем ждем освободившийся (DQBUF).
+        """
+        if not self.streaming:
+            return self._fallback
+
+        if self._queued < len(self._views):
+            self._current = self._new_buffer(self._queued)
+        else:
+            buf = self._new_buffer(0)
+            fcntl.ioctl(self.fd, self._v4l2.VIDIOC_DQBUF, buf)
+            self._current = buf
+        return self._views[self._current.index]
+
+    def commit(self):
+        if not self.streaming:
+            os.write(self.fd, self._fallback)
+            return
+
+        buf = self._current
+        buf.bytesused = self.frame_size
+        fcntl.ioctl(self.fd, self._v4l2.VIDIOC_QBUF, buf)
+        if self._queued < len(self._views):
+            self._queued += 1
+        self._current = None
+
+    def close(self):
+        if self.fd is None:
+            return
+        if self.streaming:
+            try:
+                buf_type = ctypes.c_int(self._v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT)
+                fcntl.ioctl(self.fd, self._v4l2.VIDIOC_STREAMOFF, buf_type)
+            except OSError as e:
+                logger.warning(f"VIDIOC_STREAMOFF failed: {e}")
+            self.streaming = False
+        self._views = []
+        for mm in self._mmaps:
+            try:
+                mm.close()
+            except BufferError:
+                # Кто-то еще держит представление буфера; его освободит GC
+                pass
+        self._mmaps = []
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,88 @@
+import os
+import logging
+
+import cv2
+
+logger = logging.getLogger('object_detector')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class ImageDirectorySource:
+    """Кадры из каталога с изображениями (в алфавитном порядке)."""
+
+    def __init__(self, path, width=None, height=None, loop=False):
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            raise IOError(f"No images found in {path}")
+        self.size = (width, height) if width and height else None
+        self.loop = loop
+        self._index = 0
+
+    def read(self, image=None):
+        if self._index >= len(self.paths):
+            if not self.loop:
+                return False, None
+            self._index = 0
+        frame = cv2.imread(self.paths[self._index])
+        self._index += 1
+        if frame is None:
+            return False, None
+        if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, dst=image)
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class VideoFileSource:
+    """Кадры из записанного видеофайла."""
+
+    def __init__(self, path, width=None, height=None, loop=False):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video file {path}")
+        self.size = (width, height) if width and height else None
+        self.loop = loop
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image if self.size is None else None)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, dst=image)
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_recording(path, width=None, height=None, loop=False):
+    """Источник кадров по пути: каталог изображений или видеофайл."""
+    if os.path.isdir(path):
+        return ImageDirectorySource(path, width, height, loop)
+    return VideoFileSource(path, width, height, loop)
+
+
+def load_frames(path, limit=None, width=None, height=None):
+    """Загружает записанные кадры в память (для повторяемых бенчмарков)."""
+    source = open_recording(path, width, height)
+    frames = []
+    try:
+        while limit is None or len(frames) < limit:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame.copy())
+    finally:
+        source.release()
+    logger.info(f"Loaded {len(frames)} frames from {path}")
+    return frames
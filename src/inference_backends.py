@@ -0,0 +1,157 @@
+import os
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('object_detector')
+
+MODELS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          '..', 'models'))
+
+DEFAULT_BACKEND = {
+    "type": "opencv",
+    "model": os.path.join(MODELS_DIR, 'MobileNetSSD_deploy.caffemodel'),
+    "config": os.path.join(MODELS_DIR, 'MobileNetSSD_deploy.prototxt'),
+    "backend": "default",
+    "target": "cpu",
+    "threads": None,
+    "input_size": (300, 300),
+}
+
+# Имена бэкендов/таргетов OpenCV DNN; отсутствующие в сборке дают ValueError
+_OPENCV_BACKEND_NAMES = {
+    "default": "DNN_BACKEND_DEFAULT",
+    "opencv": "DNN_BACKEND_OPENCV",
+    "inference_engine": "DNN_BACKEND_INFERENCE_ENGINE",
+    "vkcom": "DNN_BACKEND_VKCOM",
+    "timvx": "DNN_BACKEND_TIMVX",
+}
+_OPENCV_TARGET_NAMES = {
+    "cpu": "DNN_TARGET_CPU",
+    "opencl": "DNN_TARGET_OPENCL",
+    "opencl_fp16": "DNN_TARGET_OPENCL_FP16",
+    "vulkan": "DNN_TARGET_VULKAN",
+    "npu": "DNN_TARGET_NPU",
+}
+
+
+def _resolve_model_path(path):
+    """Относительные пути моделей считаются от каталога models/."""
+    if path is None or os.path.isabs(path):
+        return path
+    return os.path.join(MODELS_DIR, path)
+
+
+def _as_ssd_output(output):
+    """Приводит выход детектора к форме SSD 1x1xNx7."""
+    output = np.asarray(output, dtype=np.float32)
+    return output.reshape(1, 1, -1, 7)
+
+
+class OpenCVDnnBackend:
+    """Инференс через cv2.dnn (Caffe или ONNX, в том числе int8-квантованные ONNX)."""
+
+    def __init__(self, model, config=None, backend="default", target="cpu", threads=None,
+                 input_size=(300, 300)):
+        self.name = f"opencv:{backend}/{target}"
+        self.input_size = tuple(input_size)
+        self.threads = threads
+        # cv2.setNumThreads глобален для процесса; -1 возвращает значение по умолчанию
+        cv2.setNumThreads(int(threads) if threads else -1)
+
+        self.net = cv2.dnn.readNet(_resolve_model_path(model), _resolve_model_path(config) or "")
+        self.net.setPreferableBackend(self._lookup(_OPENCV_BACKEND_NAMES, backend))
+        self.net.setPreferableTarget(self._lookup(_OPENCV_TARGET_NAMES, target))
+
+    @staticmethod
+    def _lookup(names, key):
+        attr = names.get(key)
+        if attr is None or not hasattr(cv2.dnn, attr):
+            raise ValueError(f"Unsupported OpenCV DNN option: {key}")
+        return getattr(cv2.dnn, attr)
+
+    def forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()
+
+
+class OnnxRuntimeBackend:
+    """
+    Инференс ONNX-модели через ONNX Runtime на CPU.
+    Ожидается модель с выходом в формате SSD DetectionOutput (Nx7).
+    """
+
+    def __init__(self, model, threads=None, input_size=(300, 300)):
+        import onnxruntime as ort
+
+        self.name = "onnxruntime:cpu"
+        self.input_size = tuple(input_size)
+        self.threads = threads
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(_resolve_model_path(model), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, blob):
+        outputs = self.session.run(None, {self.input_name: blob})
+        return _as_ssd_output(outputs[0])
+
+
+def create_backend(spec=None):
+    """
+    Создает бэкенд по описанию (dict), например:
+    {"type": "onnxruntime", "model": "mobilenet_ssd_int8.onnx", "threads": 4,
+     "input_size": [256, 256]}
+    Недостающие ключи берутся из DEFAULT_BACKEND.
+    """
+    if spec is None:
+        spec = {}
+    if not isinstance(spec, dict):
+        # Уже готовый бэкенд
+        return spec
+    if "model" in spec and "config" not in spec:
+        spec = dict(spec, config=None)
+    spec = {**DEFAULT_BACKEND, **spec}
+
+    kind = spec["type"]
+    if kind == "opencv":
+        backend = OpenCVDnnBackend(spec["model"], spec["config"], spec["backend"], spec["target"],
+                                   spec["threads"], spec["input_size"])
+    elif kind == "onnxruntime":
+        backend = OnnxRuntimeBackend(spec["model"], spec["threads"], spec["input_size"])
+    else:
+        raise ValueError(f"Unknown inference backend type: {kind}")
+
+    if spec.get("name"):
+        backend.name = spec["name"]
+    logger.info(f"Inference backend: {backend.name}, input {backend.input_size}, "
+                f"threads {spec['threads']}")
+    return backend
+
+
+def quantize_onnx_model(src_path, dst_path):
+    """
+    Создает int8-вариант ONNX-модели (динамическая квантизация весов).
+    Результат загружается любым из бэкендов как обычная ONNX-модель.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(_resolve_model_path(src_path), _resolve_model_path(dst_path),
+                     weight_type=QuantType.QInt8)
+    return dst_path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="int8-квантизация ONNX-модели детектора")
+    parser.add_argument('src', help="исходная ONNX-модель (путь или имя в models/)")
+    parser.add_argument('dst', help="куда сохранить int8-модель")
+    args = parser.parse_args()
+    print(quantize_onnx_model(args.src, args.dst))
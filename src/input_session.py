@@ -0,0 +1,248 @@
+"""
+Запись и воспроизведение сессий управления (геймпад + веб-джойстик).
+
+Формат файла — заголовок и далее записи фиксированной длины (18 байт,
+little-endian), только дозапись:
+
+    evdev:  float64 время, uint8 1, pad, uint16 type, uint16 code, int32 value
+    web:    float64 время, uint8 2, pad, float32 lx, float32 ly
+
+Время — time.monotonic() (или метка ядра по CLOCK_MONOTONIC).
+Воспроизведение подает события в DualShock.inject() и WebCommands.set_joystick(),
+а цикл управления выполняет тот же select_speeds() с MotorController поверх
+QikSerialStub:
+
+    python input_session.py ../recordings/session.rin               # в реальном времени
+    python input_session.py ../recordings/session.rin --fast        # как можно быстрее
+"""
+import sys
+import json
+import time
+import struct
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+MAGIC = b'RVIN\x01\x00'
+RECORD_EVDEV = 1
+RECORD_WEB = 2
+_EVDEV = struct.Struct('<dBxHHi')
+_WEB = struct.Struct('<dBxff')
+RECORD_SIZE = _EVDEV.size
+assert _WEB.size == RECORD_SIZE
+
+
+class InputRecorder:
+    """Пишет события ввода в файл; вызывается из потока геймпада и из SocketIO."""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.records = 0
+
+    def record_evdev(self, ev_type, code, value, timestamp=None):
+        self._write(_EVDEV.pack(time.monotonic() if timestamp is None else timestamp,
+                                RECORD_EVDEV, ev_type, code, value))
+
+    def record_web(self, lx, ly, timestamp=None):
+        self._write(_WEB.pack(time.monotonic() if timestamp is None else timestamp,
+                              RECORD_WEB, lx, ly))
+
+    def _write(self, record):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(record)
+            self.records += 1
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_session(path):
+    """
+    Возвращает записи файла: (время, RECORD_EVDEV, (type, code, value))
+    или (время, RECORD_WEB, (lx, ly)). Недописанный хвост отбрасывается.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not an input session file")
+        data = f.read()
+    records = []
+    for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        kind = data[offset + 8]
+        if kind == RECORD_EVDEV:
+            timestamp, _, ev_type, code, value = _EVDEV.unpack_from(data, offset)
+            records.append((timestamp, kind, (ev_type, code, value)))
+        elif kind == RECORD_WEB:
+            timestamp, _, lx, ly = _WEB.unpack_from(data, offset)
+            records.append((timestamp, kind, (lx, ly)))
+    return records
+
+
+def _dispatch(record, pad, web_commands):
+    _, kind, payload = record
+    if kind == RECORD_EVDEV:
+        pad.set_virtual(True)
+        pad.inject(*payload)
+    else:
+        web_commands.set_joystick(*payload)
+
+
+def _percentiles(values):
+    values = np.array(values) * 1000.0
+    if not values.size:
+        return None
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def replay(records, period=0.1, fast=False, dead_zone=10):
+    """
+    Воспроизводит сессию через select_speeds() и MotorController на QikSerialStub.
+
+    fast=False — события подаются отдельным потоком в моменты записи, цикл
+    управления тикает как в main.py, заглушка порта воспроизводит задержки Qik.
+    fast=True — виртуальное время: перед каждым тиком подаются все события
+    до его момента, порт отвечает мгновенно, результат детерминирован
+    (digest одинаков для одной и той же записи).
+    """
+    from control_loop import select_speeds
+    from dualshock4 import DualShock
+    from loop_monitor import LoopMonitor
+    from motion_profile import MotionProfile
+    from qik import MotorController
+    from qik_stub import QikSerialStub
+    from web_commands import WebCommands
+
+    if not records:
+        raise ValueError("empty session")
+
+    serial_stub = QikSerialStub(simulate_timing=not fast)
+    motor_control = MotorController(ser=serial_stub)
+    serial_stub.commands.clear()
+    pad = DualShock(dead_zone)
+    web_commands = WebCommands()
+    monitor = LoopMonitor(period)
+    profile = MotionProfile()
+
+    session_start = records[0][0]
+    duration = records[-1][0] - session_start
+    outputs = []
+    tick_durations = []
+    latencies = []
+    state = {"index": 0, "last_input": None}
+    virtual_now = [0.0]
+
+    if fast:
+        # Виртуальные часы: устаревание веб-команд считается по времени сессии
+        web_commands.clock = lambda: virtual_now[0]
+        clock = lambda: virtual_now[0]
+    else:
+        clock = time.monotonic
+    replay_start = clock()
+
+    def feed_until(limit):
+        while state["index"] < len(records) and records[state["index"]][0] - session_start <= limit:
+            record = records[state["index"]]
+            _dispatch(record, pad, web_commands)
+            state["last_input"] = replay_start + record[0] - session_start if fast else clock()
+            state["index"] += 1
+
+    feeder = None
+    if not fast:
+        def feed():
+            for record in records:
+                delay = replay_start + record[0] - session_start - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                feed_until(record[0] - session_start)
+        feeder = threading.Thread(target=feed, daemon=True, name="ReplayFeeder")
+        feeder.start()
+
+    last_seen_input = None
+    wall_start = time.monotonic()
+    tick = 0
+    while state["index"] < len(records) or tick * period <= duration:
+        if fast:
+            virtual_now[0] = replay_start + tick * period
+            feed_until(tick * period)
+        else:
+            monitor.tick()
+
+        tick_start = time.perf_counter()
+        ls, rs, source = select_speeds(pad, web_commands, None, dead_zone)
+        # Как в main.motor_control_loop; в fast-режиме dt — номинальный период
+        ls, rs = profile.update(ls, rs, period)
+        motor_control.set_speed(ls, rs)
+        tick_durations.append(time.perf_counter() - tick_start)
+        outputs.append((ls, rs, source))
+
+        # Задержка от подачи события до отправки команды, учитывающей его
+        last_input = state["last_input"]
+        if last_input is not None and last_input != last_seen_input:
+            last_seen_input = last_input
+            sent = virtual_now[0] if fast else time.monotonic()
+            latencies.append(sent - last_input)
+
+        tick += 1
+        if not fast:
+            time.sleep(period)
+
+    if feeder is not None:
+        feeder.join()
+    motor_control.close()
+
+    result = {
+        "records": len(records),
+        "session_seconds": round(duration, 2),
+        "replay_seconds": round(time.monotonic() - wall_start, 2),
+        "mode": "fast" if fast else "realtime",
+        "ticks": len(outputs),
+        "tick_ms": _percentiles(tick_durations),
+        "input_to_command_ms": _percentiles(latencies),
+        "motor_commands": len(serial_stub.motor_commands()),
+        "serial_bytes": serial_stub.bytes_written,
+        "serial_mux": motor_control.mux.get_stats(),
+    }
+    if fast:
+        result["digest"] = hashlib.sha1(json.dumps(outputs).encode()).hexdigest()
+    else:
+        result["control_loop"] = monitor.get_stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии управления")
+    parser.add_argument('session', help="файл, записанный InputRecorder (main.input_record_path)")
+    parser.add_argument('--fast', action='store_true', help="виртуальное время, без задержек порта")
+    parser.add_argument('--period', type=float, default=0.1, help="период цикла управления, с")
+    args = parser.parse_args()
+
+    records = read_session(args.session)
+    if not records:
+        print("Сессия пуста", file=sys.stderr)
+        return 1
+    print(json.dumps(replay(records, args.period, args.fast), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Замер джиттера цикла управления при работающем детекторе.
+
+Запускает синтетический цикл управления (тот же sleep(timeout) и расчет
+скоростей, что в main.motor_control_loop) и параллельно детектор на
+записанных кадрах: без детектора, с DNN в потоке и с DNN в отдельном
+процессе через FrameBus.
+
+    python jitter_bench.py --input ../recordings/room.mp4 --seconds 30
+"""
+import json
+import time
+import argparse
+import threading
+
+import utils
+from frame_sinks import NullFrameSink
+from frame_sources import open_recording
+from loop_monitor import LoopMonitor
+from object_detector import VirtualCameraObjectDetector
+
+
+def control_loop(monitor, stop_event, period):
+    """Повторяет работу цикла управления без обращения к железу."""
+    while not stop_event.is_set():
+        monitor.tick()
+        utils.joystick_to_diff_control(40.0, -80.0, 10)
+        time.sleep(period)
+
+
+def measure(mode, input_path, seconds, period, backend=None):
+    monitor = LoopMonitor(period)
+    stop_event = threading.Event()
+    detector = None
+    detector_thread = None
+
+    if mode != "none":
+        detector = VirtualCameraObjectDetector(
+            source=open_recording(input_path, 640, 480, loop=True),
+            sink=NullFrameSink(640, 480),
+            tts_enabled=False,
+            use_motion_gate=False,
+            backend=backend,
+            inference_mode=mode,
+        )
+        detector_thread = threading.Thread(target=detector.run, daemon=True,
+                                           name="ObjectDetectionThread")
+        detector_thread.start()
+        time.sleep(2.0)  # дать модели прогреться
+
+    control_thread = threading.Thread(target=control_loop, args=(monitor, stop_event, period),
+                                      daemon=True, name="MotorControlThread")
+    control_thread.start()
+    time.sleep(seconds)
+    stop_event.set()
+    control_thread.join()
+
+    result = {"mode": mode, "control_loop": monitor.get_stats()}
+    if detector is not None:
+        result["detector"] = detector.get_stats()
+        detector.running = False
+        detector_thread.join(timeout=5.0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Джиттер цикла управления с DNN в потоке и в процессе")
+    parser.add_argument('--input', required=True, help="видеофайл или каталог изображений")
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--period', type=float, default=0.1, help="период цикла управления, с")
+    parser.add_argument('--backend', help="JSON-описание бэкенда для create_backend")
+    args = parser.parse_args()
+
+    backend = json.loads(args.backend) if args.backend else None
+    report = [measure(mode, args.input, args.seconds, args.period, backend)
+              for mode in ("none", "thread", "process")]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Асинхронное логирование.
+
+Потоки цикла управления, геймпада и детектора только кладут запись в
+ограниченную очередь (без форматирования и записи в stdout/journald);
+форматирует и пишет фоновый QueueListener. При переполнении очереди
+записи отбрасываются и считаются. Частые сообщения ограничиваются по
+месту вызова (файл:строка): не больше rate записей за per секунд,
+число подавленных добавляется к следующему пропущенному сообщению.
+
+Настройка выполняется один раз при старте (setup_logging в main.py);
+модули только получают логгеры через logging.getLogger('rover.*').
+"""
+import sys
+import time
+import queue
+import logging
+import threading
+import logging.handlers
+
+LOG_FORMAT = "[%(asctime)s] %(levelname)-8s %(threadName)s %(name)s: %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+_listener = None
+_handler = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не блокирует вызывающий поток: запись кладется
+    как есть (сообщение форматируется уже в потоке записи), при полной
+    очереди отбрасывается.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Без self.format(): форматирование — работа фонового потока
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничение частоты сообщений для каждого места вызова."""
+
+    def __init__(self, rate=10, per=1.0, exempt_level=logging.ERROR):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        self.exempt_level = exempt_level
+        self._sites = {}  # (pathname, lineno) -> [начало окна, count, подавлено]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.per:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (+{suppressed} подавлено)"
+                return True
+            if site[1] < self.rate:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+def setup_logging(level=logging.INFO, queue_size=2000, rate=10, per=1.0, stream=None, levels=None):
+    """
+    Единая настройка логирования: корневой логгер пишет в очередь,
+    фоновый поток — в stream (по умолчанию stderr, под systemd — journald).
+    levels — уровни отдельных логгеров, например {"rover.qik": logging.DEBUG};
+    модули сами уровни не задают.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.addFilter(RateLimitFilter(rate, per))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Дописывает очередь и останавливает поток записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats():
+    if _handler is None:
+        return None
+    rate_filter = _handler.filters[0]
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "rate_limited": rate_filter.suppressed,
+    }
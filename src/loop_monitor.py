@@ -0,0 +1,76 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class LoopMonitor:
+    """
+    Статистика периодического цикла (например, цикла управления моторами).
+    tick() вызывается в начале каждой итерации; хранится окно последних
+    периодов, по которому считаются средний период и джиттер.
+    Джиттер — отклонение периода от медианы окна, а не от target_period:
+    цикл со sleep(timeout) без компенсации всегда длиннее цели на время
+    работы тика, и это постоянное смещение джиттером не считается.
+    """
+
+    def __init__(self, target_period, window=600):
+        self.target_period = target_period
+        self.periods = deque(maxlen=window)
+        self.ticks = 0
+        self.last_tick = None
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.last_tick is not None:
+                self.periods.append(now - self.last_tick)
+            self.last_tick = now
+            self.ticks += 1
+        return now
+
+    def reset(self):
+        with self._lock:
+            self.periods.clear()
+            self.last_tick = None
+            self.ticks = 0
+
+    def jitter_since(self, tick):
+        """
+        p99 джиттера (мс) по периодам после тика номер tick и текущий номер тика
+        (курсор для следующего вызова). Без новых периодов — (None, ticks).
+        """
+        with self._lock:
+            ticks = self.ticks
+            count = ticks - tick if 0 <= tick <= ticks else ticks
+            count = min(count, len(self.periods))
+            periods = np.array(self.periods, dtype=np.float64)
+        if count <= 0:
+            return None, ticks
+        jitter = np.abs(periods[len(periods) - count:] - np.median(periods)) * 1000.0
+        return round(float(np.percentile(jitter, 99)), 3), ticks
+
+    def get_stats(self):
+        with self._lock:
+            periods = np.array(self.periods, dtype=np.float64)
+            ticks = self.ticks
+            last_tick = self.last_tick
+        if periods.size == 0:
+            return {"ticks": ticks, "samples": 0}
+
+        median = float(np.median(periods))
+        jitter = np.abs(periods - median) * 1000.0
+        return {
+            "ticks": ticks,
+            "samples": int(periods.size),
+            "target_ms": round(self.target_period * 1000.0, 2),
+            "period_ms_mean": round(float(periods.mean()) * 1000.0, 2),
+            "period_ms_p50": round(median * 1000.0, 2),
+            "period_ms_max": round(float(periods.max()) * 1000.0, 2),
+            "jitter_ms_mean": round(float(jitter.mean()), 3),
+            "jitter_ms_p99": round(float(np.percentile(jitter, 99)), 3),
+            "jitter_ms_max": round(float(jitter.max()), 3),
+            "since_last_tick_ms": round((time.monotonic() - last_tick) * 1000.0, 1),
+        }
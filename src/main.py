@@ -1,47 +1,151 @@
+import os
 import logging
 from time import sleep
 from threading import Thread, Lock
-from evdev._ecodes import ABS_X, ABS_Y
-import serial
 
 # Ваши существующие импорты
 import dualshock4
-from qik import MotorController
+from qik_bus import QikBus
+from emergency_stop import EmergencyStop
 from QikErrorChecker import QikErrorChecker
-import utils
+from qik_telemetry import QikTelemetry
 from web_commands import WebCommands
 from audio_player import AudioPlayer
 
 # Новый импорт для веб-сервера
 from web_server.app_factory import create_app
 from object_detector import VirtualCameraObjectDetector
+from multi_camera import CameraChannel, MultiCameraDetector
+from loop_monitor import LoopMonitor
+from video_stream import FrameBroadcaster
+from quality_governor import QualityGovernor
+from follow_mode import FollowController
+from event_recorder import EventRecorder
+from track_store import TrackStore, DetectionTracker
+from control_loop import select_speeds
+from motion_profile import MotionProfile, ManeuverQueue
+from input_session import InputRecorder
+from log_setup import setup_logging, shutdown_logging
+from flight_recorder import FlightRecorder
+from motion_gate import read_cpu_temperature
+from detections import DOG_CLASS_ID, contains_class
 
 # --- НАСТРОЙКИ ---
 dead_zone = 10
 timeout = 0.1
+# "process" — DNN в отдельном процессе (FrameBus), "thread" — в потоке детектора
+detector_inference_mode = "process"
+# Несколько камер с одной сетью и пакетным инференсом;
+# None — одна камера (/dev/video0 -> /dev/video2).
+# Первая камера — основная: веб-трансляция, запись событий, треки и режим следования.
+# Пример: [{"name": "front", "device": 0, "output": "/dev/video2"},
+#          {"name": "rear", "device": "/dev/video4", "output": "/dev/video3"}]
+camera_specs = None
+# Путь для записи сессии ввода (геймпад + веб) для input_session.py; None — не писать
+input_record_path = None
+# Температура CPU пишется в самописец раз в N тиков; токи берутся из кэша опроса Qik
+flight_slow_every = 10
+# Период опроса байта ошибки и токов Qik, с
+qik_telemetry_interval = 1.0
+# Скорость порта Qik: None — самая быстрая, на которой контроллер отвечает
+qik_baudrate = None
+# CRC-7 в каждой команде; включать только вместе с перемычкой CRC на плате Qik
+qik_crc = False
+# id контроллеров Qik в цепочке на одном порту; первый — основной (согласование скорости порта)
+qik_device_ids = (0x0A,)
+# Аварийная остановка сторожевым таймером, если цикл управления не тикал дольше, с
+estop_watchdog_timeout = 0.5
+# Токен доступа к /profiler; без него профилировщик в вебе выключен
+profiler_token = os.environ.get("ROVER_PROFILER_TOKEN")
 shutdown_requested = False
+# Сертификаты HTTPS лежат в репозитории, путь не зависит от домашнего каталога
+REPO_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SSL_CONTEXT = (os.path.join(REPO_DIR, 'certs', 'cert.pem'),
+               os.path.join(REPO_DIR, 'certs', 'key.pem'))
 
 # --- ЛОГИРОВАНИЕ ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] %(levelname)-8s %(message)s",
-    datefmt="%H:%M:%S"
-)
+# Настраивается один раз в точке входа (setup_logging): запись в фоновом потоке
 logger = logging.getLogger('rover')
 
 # --- ИНИЦИАЛИЗАЦИЯ КОМПОНЕНТОВ ---
-try:
-    pad = dualshock4.DualShock(dead_zone)
-    logger.info("DualShock контроллер инициализирован.")
-except Exception as e:
-    logger.error(f"Не удалось инициализировать DualShock: {e}")
-    pad = None
-
-motor_control = MotorController()
+# Устройства открываются в init_components(), а не при импорте: процесс
+# инференса (multiprocessing spawn) импортирует этот модуль повторно.
+pad = None
+motor_control = None
+qik_bus = None
+qik_telemetry = None
+emergency_stop = None
 web_commands = WebCommands()
-audio_player = AudioPlayer()
+audio_player = None
+app, socketio = None, None
+loop_monitor = LoopMonitor(timeout)
+video_broadcaster = FrameBroadcaster()
+quality_governor = QualityGovernor(loop_monitor=loop_monitor)
+follow_controller = FollowController()
+event_recorder = EventRecorder()
+# Треки объектов из детекций: склейка в потоке детектора, запись в фоновом потоке
+track_store = TrackStore()
+detection_tracker = DetectionTracker(track_store)
+input_recorder = None
+flight_recorder = FlightRecorder(rate_hz=1.0 / timeout)
+# Все команды моторам проходят через профиль (ускорение и рывок), маневры — через очередь
+motion_profile = MotionProfile()
+maneuvers = ManeuverQueue()
+# Параметры детектора, подменяемые в режиме симуляции (source, sink, tts_enabled)
+detector_options = {}
 
-app, socketio = create_app(web_commands, audio_player)
+def init_components(devices=None):
+    """
+    Создает устройства и веб-приложение. devices — заглушки из simulation.py
+    (pad, serial, audio_player, detector_options) для запуска без железа.
+    """
+    global pad, motor_control, qik_bus, qik_telemetry, emergency_stop, audio_player, app, socketio
+    global input_recorder, detector_options
+    if input_record_path:
+        input_recorder = InputRecorder(input_record_path)
+        web_commands.recorder = input_recorder
+        logger.info(f"Запись сессии ввода: {input_record_path}")
+    if devices is not None:
+        pad = devices.pad
+        pad.recorder = input_recorder
+    else:
+        try:
+            pad = dualshock4.DualShock(dead_zone)
+            pad.recorder = input_recorder
+            pad.start()
+            logger.info("DualShock контроллер инициализирован.")
+        except Exception as e:
+            logger.error(f"Не удалось инициализировать DualShock: {e}")
+            pad = None
+
+    qik_bus = QikBus(ser=devices.serial if devices else None, device_ids=qik_device_ids,
+                     baudrate=qik_baudrate, crc=qik_crc)
+    motor_control = qik_bus.primary
+    qik_telemetry = QikTelemetry(motor_control, qik_telemetry_interval, bus=qik_bus,
+                                 on_error=lambda err, messages: event_recorder.trigger("qik_error"))
+    emergency_stop = EmergencyStop(
+        qik_bus, motion_profile, maneuvers, web_commands, loop_monitor,
+        watchdog_timeout=estop_watchdog_timeout,
+        on_trigger=lambda source: event_recorder.trigger(f"estop:{source}"))
+    if pad is not None:
+        pad.on_estop = lambda timestamp: emergency_stop.trigger("pad", since=timestamp)
+    audio_player = devices.audio_player if devices else AudioPlayer()
+    detector_options = dict(devices.detector_options) if devices else {}
+
+    app, socketio = create_app(web_commands, audio_player,
+                               config={"profiler_token": profiler_token})
+    app.loop_monitor = loop_monitor
+    app.video_broadcaster = video_broadcaster
+    app.quality_governor = quality_governor
+    app.follow_controller = follow_controller
+    app.event_recorder = event_recorder
+    app.track_store = track_store
+    app.pad = pad
+    app.flight_recorder = flight_recorder
+    app.motion_profile = motion_profile
+    app.maneuvers = maneuvers
+    app.qik_telemetry = qik_telemetry
+    app.emergency_stop = emergency_stop
 
 thread_count_lock = Lock()
 active_threads = 0
@@ -53,57 +157,99 @@ def start_object_detection():
     global object_detector
     try:
         logger.info("Инициализация детектора объектов...")
-        object_detector = VirtualCameraObjectDetector(input_device_index=0, output_device="/dev/video2")
+        if camera_specs:
+            object_detector = create_multi_camera_detector(camera_specs)
+        else:
+            object_detector = VirtualCameraObjectDetector(
+                input_device_index=0, output_device="/dev/video2",
+                inference_mode=detector_inference_mode,
+                broadcaster=video_broadcaster,
+                recorder=event_recorder,
+                tracks=detection_tracker,
+                **detector_options)
+        app.object_detector = object_detector
+        quality_governor.attach(object_detector)
+        follow_controller.detector = object_detector
         object_detector.run()
     except Exception as e:
         logger.error(f"Ошибка в детекторе объектов: {e}")
 
-# --- ПРОВЕРКА МОТОРОВ  ---      
-# def check_motor_controller():
-#     qik_port = None
-#     try:
-#         logger.info("Проверка контроллера моторов Qik...")
-#         qik_port = serial.Serial(port="/dev/ttyUSB0", baudrate=38400, timeout=0.5)
-#         qc = QikErrorChecker(serial_port=qik_port, model="2s12v10")
-#         qc.check_and_print()
-#         logger.info("Контроллер Qik найден и исправен.")
-#     except serial.SerialException as se:
-#         logger.error(f"Ошибка serial-порта Qik: {se}")
-#     except Exception as e:
-#         logger.error(f"Не удалось проверить статус Qik: {e}")
-#     finally:
-#         if qik_port and qik_port.is_open:
-#             qik_port.close()
+def create_multi_camera_detector(specs):
+    """Детектор нескольких камер; первая камера подключается к вебу, событиям и трекам."""
+    cameras = [CameraChannel.from_spec(spec) for spec in specs]
+    primary = cameras[0]
+    primary.broadcaster = video_broadcaster
+    primary.recorder = event_recorder
+    primary.tracks = detection_tracker
+    options = {k: v for k, v in detector_options.items()
+               if k in ("backend", "confidence_threshold", "class_filter")}
+    return MultiCameraDetector(cameras, **options)
+
+# --- ПРОВЕРКА МОТОРОВ  ---
+def check_motor_controller():
+    """Разовая проверка байта ошибки Qik через тот же порт, что и у MotorController."""
+    try:
+        logger.info("Проверка контроллера моторов Qik...")
+        qc = QikErrorChecker(motor_control.mux, model="2s12v10", crc=motor_control.crc)
+        qc.check_and_print()
+    except Exception as e:
+        logger.error(f"Не удалось проверить статус Qik: {e}")
 
 # --- ГЛАВНЫЙ ЦИКЛ УПРАВЛЕНИЯ МОТОРАМИ ---
 def motor_control_loop(web_commands_instance):
     logger.info("Запуск основного цикла управления моторами...")
     try:
+        tick = 0
+        last_tick = None
         while not shutdown_requested:
-            # Приоритет №1: Геймпад
-            if pad and pad.is_connected():
-                active_keys = pad.read_events()
-                if ABS_X in active_keys and ABS_Y in active_keys:
-                    ls, rs = utils.joystick_to_diff_control(
-                        active_keys[ABS_X], active_keys[ABS_Y], dead_zone
-                    )
-                else:
-                    ls, rs = 0, 0
-                motor_control.set_speed(ls, rs)
+            now = loop_monitor.tick()
+            if emergency_stop.engaged:
+                # Торможение уже в линии; до сброса команды скорости не отправляются
+                ls, rs, source = 0, 0, "estop"
+                motion_profile.reset()
             else:
-                # Приоритет №2: Веб-интерфейс
-                web_ls, web_rs = web_commands_instance.get_speed()
-                motor_control.set_speed(web_ls, web_rs)
-            
-            if pad and not pad.is_connected():
-                pad.connect()
+                ls, rs, source = select_speeds(pad, web_commands_instance, follow_controller,
+                                               dead_zone, maneuvers)
+                # Профиль разгона считается от фактического периода тика, без sleep внутри
+                dt = min(now - last_tick, 0.5) if last_tick else timeout
+                ls, rs = motion_profile.update(ls, rs, dt)
+                # Команды всех контроллеров шины уходят в порт одной записью
+                qik_bus.set_speed(ls, rs)
+            record_flight_sample(tick, now - last_tick if last_tick else None, ls, rs, source)
+            last_tick = now
+            tick += 1
 
             sleep(timeout)
     except KeyboardInterrupt:
         logger.info("Цикл управления моторами прерван.")
+    except Exception as e:
+        logger.error(f"Сбой цикла управления моторами: {e}")
+        event_recorder.trigger("control_loop_failure")
+        raise
     finally:
         logger.info("Цикл управления моторами завершен. Остановка моторов.")
-        motor_control.stop_all()
+        qik_bus.stop_all()
+
+def record_flight_sample(tick, period, ls, rs, source):
+    """Строка бортового самописца для текущего тика цикла управления."""
+    row = {"left": ls, "right": rs, "source": source}
+    if period is not None:
+        row["loop_period_ms"] = period * 1000.0
+    detector = app.object_detector if app else None
+    latest = detector.latest_detections() if detector else None
+    if latest is not None:
+        detections = latest[2]
+        row["detections"] = len(detections)
+        row["dog"] = int(contains_class(detections, DOG_CLASS_ID))
+    if tick % flight_slow_every == 0:
+        row["cpu_temp"] = read_cpu_temperature()
+        telemetry = qik_telemetry.latest()
+        row["current_m0"] = telemetry["current_m0"]
+        row["current_m1"] = telemetry["current_m1"]
+    try:
+        flight_recorder.record(**row)
+    except OSError as e:
+        logger.error(f"Ошибка записи самописца: {e}")
 
 # --- ФУНКЦИЯ ОЧИСТКИ ---
 def cleanup():
@@ -113,39 +259,67 @@ def cleanup():
         
     logger.info("Выполняется очистка ресурсов...")
     shutdown_requested = True
+    quality_governor.stop()
+    event_recorder.close()
+    detection_tracker.close_all()
+    track_store.close()
+    if pad:
+        pad.stop()
+    if input_recorder:
+        input_recorder.close()
+    flight_recorder.close()
+    if qik_telemetry:
+        qik_telemetry.stop()
+    if emergency_stop:
+        emergency_stop.stop()
     
     try:
-        motor_control.stop_all()
-        logger.info("Моторы остановлены.")
+        if qik_bus:
+            qik_bus.close()
+            logger.info("Моторы остановлены.")
     except Exception as e:
         logger.error(f"Ошибка при остановке моторов: {e}")
     
     logger.info("Очистка ресурсов завершена.")
 
+def start_threads():
+    """Запускает цикл управления, регулятор качества и детектор. Возвращает потоки."""
+    # Создаем и запускаем поток для управления моторами (БЕЗ ИЗМЕНЕНИЙ)
+    motor_thread = Thread(target=motor_control_loop, 
+                                args=(web_commands,),  # <-- Вот ключевое изменение
+                                daemon=True, 
+                                name="MotorControlThread")
+    motor_thread.start()
+
+    # Регулятор качества детектора по температуре, загрузке и джиттеру
+    quality_governor.start()
+    qik_telemetry.start()
+    emergency_stop.start()
+
+    # Создаем и запускаем поток для детекции объектов
+    detection_thread = Thread(target=start_object_detection,
+                             daemon=True,
+                             name="ObjectDetectionThread")
+    detection_thread.start()
+    logger.info("Поток детекции объектов запущен")
+    return motor_thread, detection_thread
+
 # --- ТОЧКА ВХОДА ---
 if __name__ == '__main__':
-    # check_motor_controller()
+    setup_logging(logging.INFO)
+    init_components()
+    check_motor_controller()
     motor_thread = None
+    detection_thread = None
     audio_player.play("media/startup.mp3")  # Ваш существующий стартовый звук
     
     try:
-        # Создаем и запускаем поток для управления моторами (БЕЗ ИЗМЕНЕНИЙ)
-        motor_thread = Thread(target=motor_control_loop, 
-                                    args=(web_commands,),  # <-- Вот ключевое изменение
-                                    daemon=True, 
-                                    name="MotorControlThread")
-        motor_thread.start()
-
-        # Создаем и запускаем поток для детекции объектов
-        detection_thread = Thread(target=start_object_detection,
-                                 daemon=True,
-                                 name="ObjectDetectionThread")
-        detection_thread.start()
-        logger.info("Поток детекции объектов запущен")
+        motor_thread, detection_thread = start_threads()
 
         # Запускаем веб-сервер в основном потоке
         logger.info("Запуск веб-сервера на http://0.0.0.0:5000")
-        socketio.run(app, host='0.0.0.0', port=5000, ssl_context=('/home/volodya/roverPi/certs/cert.pem', '/home/volodya/roverPi/certs/key.pem'), allow_unsafe_werkzeug=True)
+        socketio.run(app, host='0.0.0.0', port=5000, ssl_context=SSL_CONTEXT,
+                     allow_unsafe_werkzeug=True)
         #socketio.run(app, host='0.0.0.0', port=5000)
     except (KeyboardInterrupt, SystemExit):
         logger.info("Получен сигнал завершения. Начинаем остановку...")
@@ -156,3 +330,4 @@ if __name__ == '__main__':
         if detection_thread and detection_thread.is_alive():
             detection_thread.join(timeout=2.0)
         logger.info("Программа завершена.")
+        shutdown_logging()
@@ -0,0 +1,176 @@
+import time
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('object_detector')
+
+THERMAL_ZONE_PATH = '/sys/class/thermal/thermal_zone0/temp'
+
+
+def read_cpu_temperature():
+    """Температура CPU в °C или None, если датчик недоступен."""
+    try:
+        with open(THERMAL_ZONE_PATH, 'r') as f:
+            return int(f.read()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+class MotionGate:
+    """
+    Дешевый детектор движения перед DNN.
+    Кадр уменьшается до маленького серого изображения и сравнивается
+    с фоновой моделью (скользящее среднее). Нейросеть запускается только
+    при движении или когда прошло keyframe_interval кадров с последнего прогона.
+    При непрерывном движении каждый max_roi_passes-й прогон идет по полному
+    кадру: детекции вне ROI переносятся из кэша и без него не обновлялись бы.
+    """
+
+    def __init__(self, width=640, height=480, gate_size=(80, 60),
+                 pixel_threshold=25, motion_fraction=0.01,
+                 keyframe_interval=30, background_alpha=0.05, roi_padding=0.1,
+                 max_roi_passes=10):
+        self.width = width
+        self.height = height
+        self.gate_size = tuple(gate_size)
+        self.pixel_threshold = pixel_threshold
+        self.motion_fraction = motion_fraction
+        self.keyframe_interval = keyframe_interval
+        self.background_alpha = background_alpha
+        self.roi_padding = roi_padding
+        self.max_roi_passes = max_roi_passes
+
+        g_w, g_h = self.gate_size
+        self._small = np.empty((g_h, g_w, 3), dtype=np.uint8)
+        self._gray = np.empty((g_h, g_w), dtype=np.uint8)
+        self._diff = np.empty((g_h, g_w), dtype=np.uint8)
+        self._mask = np.empty((g_h, g_w), dtype=np.uint8)
+        self._background = None
+        self._background_u8 = np.empty((g_h, g_w), dtype=np.uint8)
+
+        self.frames_since_inference = keyframe_interval
+        self.roi_passes = 0  # ROI-прогонов подряд с последнего полного кадра
+        self.last_roi = None
+
+        # --- Статистика ---
+        self.total_frames = 0
+        self.skipped_frames = 0
+        self.motion_frames = 0
+        self.keyframes = 0
+        self.forward_time_total = 0.0
+        self.forward_count = 0
+        self.started_at = time.monotonic()
+        self.temperature_at_start = read_cpu_temperature()
+
+    def check(self, frame):
+        """
+        Возвращает (run_inference, roi). roi — (x1, y1, x2, y2) в координатах
+        кадра, покрывающий изменившуюся область, либо None для полного кадра.
+        """
+        self.total_frames += 1
+        cv2.resize(frame, self.gate_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._background is None:
+            self._background = self._gray.astype(np.float32)
+            self.frames_since_inference = 0
+            self.roi_passes = 0
+            self.keyframes += 1
+            return True, None
+
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(self._gray, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+        cv2.accumulateWeighted(self._gray, self._background, self.background_alpha)
+
+        changed = cv2.countNonZero(self._mask)
+        has_motion = changed >= self.motion_fraction * self._mask.size
+
+        if has_motion:
+            self.motion_frames += 1
+            self.frames_since_inference = 0
+            self.last_roi = self._changed_region()
+            if self.roi_passes >= self.max_roi_passes:
+                self.roi_passes = 0
+                self.keyframes += 1
+                return True, None
+            self.roi_passes += 1
+            return True, self.last_roi
+
+        self.frames_since_inference += 1
+        if self.frames_since_inference >= self.keyframe_interval:
+            self.keyframes += 1
+            self.frames_since_inference = 0
+            self.roi_passes = 0
+            return True, None
+
+        self.skipped_frames += 1
+        return False, None
+
+    def _changed_region(self):
+        """Ограничивающий прямоугольник изменившихся пикселей в координатах кадра."""
+        x, y, w, h = cv2.boundingRect(self._mask)
+        g_w, g_h = self.gate_size
+        sx = self.width / g_w
+        sy = self.height / g_h
+        pad_x = int(self.width * self.roi_padding)
+        pad_y = int(self.height * self.roi_padding)
+        x1 = max(0, int(x * sx) - pad_x)
+        y1 = max(0, int(y * sy) - pad_y)
+        x2 = min(self.width, int((x + w) * sx) + pad_x)
+        y2 = min(self.height, int((y + h) * sy) + pad_y)
+        return x1, y1, x2, y2
+
+    def record_forward(self, seconds):
+        """Учитывает длительность прогона DNN для оценки экономии CPU."""
+        self.forward_time_total += seconds
+        self.forward_count += 1
+
+    def get_stats(self):
+        avg_forward = self.forward_time_total / self.forward_count if self.forward_count else 0.0
+        uptime = max(time.monotonic() - self.started_at, 1e-6)
+        saved_seconds = self.skipped_frames * avg_forward
+        temperature = read_cpu_temperature()
+        return {
+            "total_frames": self.total_frames,
+            "skipped_frames": self.skipped_frames,
+            "motion_frames": self.motion_frames,
+            "keyframes": self.keyframes,
+            "hit_rate": (round(self.skipped_frames / self.total_frames, 3)
+                         if self.total_frames else 0.0),
+            "avg_forward_ms": round(avg_forward * 1000.0, 2),
+            "cpu_seconds_saved": round(saved_seconds, 2),
+            # Доля одного ядра, которую заняла бы DNN на пропущенных кадрах
+            "cpu_core_percent_saved": round(100.0 * saved_seconds / uptime, 1),
+            "temperature": temperature,
+            "temperature_at_start": self.temperature_at_start,
+        }
+
+
+def remap_roi_detections(detections, roi, width, height):
+    """
+    Переводит нормированные координаты боксов из кропа roi
+    в нормированные координаты полного кадра (in-place).
+    """
+    x1, y1, x2, y2 = roi
+    boxes = detections[0, 0, :, 3:7]
+    boxes[:, [0, 2]] = (x1 + boxes[:, [0, 2]] * (x2 - x1)) / width
+    boxes[:, [1, 3]] = (y1 + boxes[:, [1, 3]] * (y2 - y1)) / height
+    return detections
+
+
+def merge_roi_detections(cached, fresh, roi, width, height):
+    """
+    Объединяет кэшированные детекции вне roi со свежими детекциями из roi.
+    Возраст перенесенных боксов ограничивает MotionGate.max_roi_passes:
+    полный прогон заменяет кэш целиком.
+    """
+    if cached is None:
+        return fresh
+    x1, y1, x2, y2 = roi
+    boxes = cached[0, 0, :, 3:7]
+    outside = ((boxes[:, 2] * width < x1) | (boxes[:, 0] * width > x2) |
+               (boxes[:, 3] * height < y1) | (boxes[:, 1] * height > y2))
+    return np.concatenate([cached[:, :, outside, :], fresh], axis=2)
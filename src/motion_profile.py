@@ -0,0 +1,244 @@
+"""
+Профиль движения для двух моторов: ограничение ускорения и рывка.
+
+MotionProfile.update() вызывается на каждом тике цикла управления с
+целевыми скоростями и возвращает уставки, к которым моторы идут плавно.
+Новая цель просто заменяет старую на следующем тике, поэтому разгон
+можно прервать в любой момент. Ничего не спит и не блокирует поток.
+
+Маневры (дуга, разворот на угол, езда по времени) ставятся в очередь
+ManeuverQueue и выдают цели по времени, пока не завершатся.
+"""
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger('rover.motion')
+
+
+class AxisProfile:
+    """Одна ось: скорость и ускорение с ограничением рывка (единицы Qik, -127..127)."""
+
+    def __init__(self, max_accel=250.0, max_jerk=1500.0, max_speed=127.0):
+        self.max_accel = max_accel
+        self.max_jerk = max_jerk
+        self.max_speed = max_speed
+        self.speed = 0.0
+        self.accel = 0.0
+
+    def step(self, target, dt):
+        target = max(-self.max_speed, min(target, self.max_speed))
+        if dt <= 0:
+            return self.speed
+        error = target - self.speed
+        sign = 1.0 if error >= 0 else -1.0
+        # Дальше все в направлении цели: accel > 0 — движение к цели
+        accel = self.accel * sign
+        max_change = self.max_jerk * dt
+        desired = min(self.max_accel, self._approach_accel(abs(error), dt))
+        accel = max(accel - max_change, min(desired, accel + max_change))
+        accel = max(-self.max_accel, min(accel, self.max_accel))
+
+        self.accel = accel * sign
+        new_speed = self.speed + self.accel * dt
+        arrived = (new_speed - target) * sign >= 0 or abs(target - new_speed) < 1e-6
+        if arrived and abs(self.accel) <= max_change:
+            # Цель достигнута; остаток ускорения снимется следующим тиком в пределах рывка
+            new_speed = target
+        self.speed = new_speed
+        return self.speed
+
+    def _approach_accel(self, error, dt):
+        """
+        Наибольшее ускорение к цели, при котором этот тик и последующее
+        снятие ускорения шагами max_jerk*dt не проводят скорость мимо цели.
+        Прирост скорости считается по тикам, а не непрерывно (a²/2J): с
+        ускорением a и n тиками торможения он равен a*dt*(n+1) - J*dt²*n(n+1)/2.
+        """
+        step = self.max_jerk * dt * dt
+        n = int((math.sqrt(1.0 + 8.0 * error / step) - 1.0) / 2.0)
+        return (error + step * n * (n + 1) / 2.0) / (dt * (n + 1))
+
+    def reset(self, speed=0.0):
+        self.speed = float(speed)
+        self.accel = 0.0
+
+
+class MotionProfile:
+    """Оба мотора одновременно; update() возвращает целые уставки (left, right)."""
+
+    def __init__(self, max_accel=250.0, max_jerk=1500.0, max_speed=127.0):
+        self.left = AxisProfile(max_accel, max_jerk, max_speed)
+        self.right = AxisProfile(max_accel, max_jerk, max_speed)
+        self.target = (0, 0)
+
+    def update(self, left_target, right_target, dt):
+        self.target = (left_target, right_target)
+        return (int(round(self.left.step(left_target, dt))),
+                int(round(self.right.step(right_target, dt))))
+
+    def settled(self):
+        return (round(self.left.speed) == round(self.target[0]) and
+                round(self.right.speed) == round(self.target[1]))
+
+    def reset(self):
+        """Мгновенная остановка профиля (например, аварийный стоп)."""
+        self.left.reset()
+        self.right.reset()
+        self.target = (0, 0)
+
+    def get_status(self):
+        return {
+            "target": list(self.target),
+            "speed": [round(self.left.speed, 1), round(self.right.speed, 1)],
+            "accel": [round(self.left.accel, 1), round(self.right.accel, 1)],
+        }
+
+
+# Пределы параметров маневров из веба
+MAX_SPEED = 127.0
+MAX_DURATION = 60.0
+MAX_SPIN_ANGLE = 720.0
+
+
+def _number(name, value, low, high):
+    """
+    float из JSON-значения в [low, high]; иначе ValueError
+    (ответ 400, а не сбой цикла управления).
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    # NaN не проходит ни одно сравнение
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be in [{low}, {high}], got {value!r}")
+    return number
+
+
+class Maneuver:
+    """Маневр по времени: targets(elapsed) -> (left, right) или None по завершении."""
+
+    name = "maneuver"
+
+    def __init__(self, duration):
+        self.duration = _number("duration", duration, 0.0, MAX_DURATION)
+
+    def targets(self, elapsed):
+        raise NotImplementedError
+
+    def describe(self):
+        return {"type": self.name, "duration": round(self.duration, 2)}
+
+
+class TimedDrive(Maneuver):
+    name = "drive"
+
+    def __init__(self, left, right, duration):
+        super().__init__(duration)
+        self.left = _number("left", left, -MAX_SPEED, MAX_SPEED)
+        self.right = _number("right", right, -MAX_SPEED, MAX_SPEED)
+
+    def targets(self, elapsed):
+        return (self.left, self.right) if elapsed < self.duration else None
+
+
+class Arc(Maneuver):
+    """Дуга: turn в -1..1 — доля разницы скоростей колес (left = speed*(1+turn))."""
+    name = "arc"
+
+    def __init__(self, speed, turn, duration):
+        super().__init__(duration)
+        self.speed = _number("speed", speed, -MAX_SPEED, MAX_SPEED)
+        self.turn = _number("turn", turn, -1.0, 1.0)
+
+    def targets(self, elapsed):
+        if elapsed >= self.duration:
+            return None
+        return self.speed * (1.0 + self.turn), self.speed * (1.0 - self.turn)
+
+
+class Spin(Maneuver):
+    """
+    Разворот на месте на angle градусов (> 0 — вправо). Без одометрии угол
+    считается по калибровке: deg_per_second при скорости 100.
+    """
+    name = "spin"
+
+    def __init__(self, angle, speed=60, deg_per_second=180.0):
+        angle = _number("angle", angle, -MAX_SPIN_ANGLE, MAX_SPIN_ANGLE)
+        speed = _number("speed", speed, 1.0, MAX_SPEED)
+        deg_per_second = _number("deg_per_second", deg_per_second, 1.0, 3600.0)
+        super().__init__(abs(angle) / (deg_per_second * speed / 100.0))
+        self.direction = 1 if angle >= 0 else -1
+        self.speed = speed
+
+    def targets(self, elapsed):
+        if elapsed >= self.duration:
+            return None
+        return self.direction * self.speed, -self.direction * self.speed
+
+
+class ManeuverQueue:
+    """Очередь маневров, исполняемых по тикам цикла управления."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._current = None
+        self._started = None
+
+    def push(self, maneuver):
+        with self._lock:
+            self._queue.append(maneuver)
+        logger.info(f"Маневр в очереди: {maneuver.describe()}")
+
+    def clear(self):
+        with self._lock:
+            self._queue.clear()
+            self._current = None
+
+    def active(self):
+        return self._current is not None or bool(self._queue)
+
+    def targets(self, now=None):
+        """Цели текущего маневра или None, если очередь пуста."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while True:
+                if self._current is None:
+                    if not self._queue:
+                        return None
+                    self._current = self._queue.popleft()
+                    self._started = now
+                try:
+                    result = self._current.targets(now - self._started)
+                except Exception as e:
+                    # Сломанный маневр снимается, цикл управления продолжает работу
+                    logger.error(f"Маневр {self._current.name} снят с очереди: {e}")
+                    result = None
+                if result is not None:
+                    return result
+                # Маневр завершен — следующий начинается на этом же тике
+                self._current = None
+
+    def get_status(self):
+        with self._lock:
+            return {
+                "current": self._current.describe() if self._current else None,
+                "queued": [m.describe() for m in self._queue],
+            }
+
+
+MANEUVERS = {"drive": TimedDrive, "arc": Arc, "spin": Spin}
+
+
+def make_maneuver(spec):
+    """Маневр из dict: {"type": "arc", "speed": 50, "turn": 0.3, "duration": 2}."""
+    spec = dict(spec)
+    kind = spec.pop("type", None)
+    if kind not in MANEUVERS:
+        raise ValueError(f"Unknown maneuver type: {kind}")
+    return MANEUVERS[kind](**spec)
@@ -0,0 +1,253 @@
+"""
+Несколько камер с одной сетью: кадры всех камер собираются в один блоб
+N x 3 x H x W и проходят через сеть за один forward.
+
+Каждая камера (CameraChannel) — свой источник (V4L2 или запись), свой
+выход (v4l2loopback или NullFrameSink) и свои буферы; бэкенд инференса
+один на все камеры. Выход SSD для пакета — общий список строк
+[image_id, class_id, confidence, x1, y1, x2, y2], строки раскладываются по
+камерам по image_id и дальше обрабатываются обычным postprocess().
+
+Пакетный режим поддерживают бэкенды с динамическим размером пакета
+(Caffe MobileNet-SSD в cv2.dnn); для ONNX-моделей с фиксированным
+пакетом 1 нужен batched=False — тогда сеть та же, но forward на камеру.
+"""
+import time
+import logging
+
+import cv2
+import numpy as np
+
+from detections import (CLASSES, DOG_CLASS_ID, contains_class, draw_detections, empty_detections,
+                        postprocess)
+from frame_buffers import FrameBufferPool
+from frame_sinks import LoopbackFrameSink, NullFrameSink
+from frame_sources import open_recording
+from inference_backends import create_backend
+
+logger = logging.getLogger('object_detector')
+
+
+def open_camera_source(device, width, height):
+    """Индекс или /dev/videoN — камера V4L2, иначе видеофайл/каталог кадров по кругу."""
+    if isinstance(device, int) or str(device).isdigit() or str(device).startswith('/dev/video'):
+        cap = cv2.VideoCapture(int(device) if str(device).isdigit() else device)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open camera {device}")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, float(width))
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, float(height))
+        return cap
+    return open_recording(device, width, height, loop=True)
+
+
+def split_batch_output(raw, batch_size):
+    """Строки SSD-выхода пакета -> список массивов Kx7 по image_id."""
+    rows = np.asarray(raw, dtype=np.float32).reshape(-1, 7)
+    image_ids = rows[:, 0].astype(np.int32)
+    return [rows[image_ids == i] for i in range(batch_size)]
+
+
+class CameraChannel:
+    """Одна камера: источник, выход, буферы и последние детекции."""
+
+    def __init__(self, name, source, sink, width=640, height=480, input_size=(300, 300),
+                 broadcaster=None, recorder=None, tracks=None):
+        self.name = name
+        self.source = source
+        self.sink = sink
+        self.width = width
+        self.height = height
+        self.buffers = FrameBufferPool(width, height, input_size)
+        self.broadcaster = broadcaster
+        self.recorder = recorder
+        self.tracks = tracks
+        self.detections = empty_detections()
+        self.latest = None
+        self.capture_time = 0.0
+        self.frames = 0
+        self.missed = 0
+        self.dog_in_view = False
+
+    @classmethod
+    def from_spec(cls, spec, width=640, height=480, input_size=(300, 300)):
+        """
+        spec: {"name": "rear", "device": 1 | "/dev/video4" | "room.mp4",
+               "output": "/dev/video3" | None}.
+        """
+        source = open_camera_source(spec["device"], width, height)
+        output = spec.get("output")
+        sink = LoopbackFrameSink(output, width, height) if output else NullFrameSink(width, height)
+        return cls(spec.get("name", str(spec["device"])), source, sink, width, height, input_size)
+
+    def capture(self):
+        ret, frame = self.source.read(self.buffers.frame)
+        if not ret:
+            self.missed += 1
+            return None
+        if frame is not self.buffers.frame:
+            cv2.resize(frame, (self.width, self.height), dst=self.buffers.frame)
+            frame = self.buffers.frame
+        self.capture_time = time.monotonic()
+        return frame
+
+    def publish(self, frame, raw, detections_time, conf_threshold, class_filter, nms_threshold):
+        """Детекции кадра -> треки, разметка, веб и выходное устройство камеры."""
+        if raw is not None:
+            self.detections = postprocess(raw, self.width, self.height, conf_threshold,
+                                          class_filter, nms_threshold)
+            self.latest = (detections_time, (self.width, self.height), self.detections)
+        if self.tracks is not None:
+            self.tracks.observe(self.detections if raw is not None else (), frame)
+        draw_detections(frame, self.detections, CLASSES)
+
+        dog = contains_class(self.detections, DOG_CLASS_ID)
+        if dog and not self.dog_in_view and self.recorder is not None:
+            self.recorder.trigger(f"dog:{self.name}")
+        self.dog_in_view = dog
+
+        jpeg = self.broadcaster.publish(frame) if self.broadcaster is not None else None
+        if self.recorder is not None:
+            self.recorder.add(frame, jpeg, self.capture_time)
+        self.buffers.to_yuv(frame, dst=self.sink.acquire())
+        self.sink.commit()
+        self.frames += 1
+
+    def close(self):
+        self.source.release()
+        self.sink.close()
+        if self.tracks is not None:
+            self.tracks.close_all()
+
+    def get_stats(self):
+        return {
+            "frames": self.frames,
+            "missed": self.missed,
+            "detections": int(len(self.detections)),
+        }
+
+
+class MultiCameraDetector:
+    """
+    Цикл захвата и пакетного инференса для нескольких камер.
+    Интерфейс для main.py тот же, что у VirtualCameraObjectDetector:
+    run(), stop(), latest_detections() (первая камера), set_quality(), get_stats().
+    """
+
+    def __init__(self, cameras, backend=None, batched=True, confidence_threshold=0.5,
+                 class_filter=None, nms_threshold=0.45):
+        if not cameras:
+            raise ValueError("At least one camera is required")
+        self.cameras = list(cameras)
+        self.backend = create_backend(backend)
+        self.batched = batched
+        self.confidence_threshold = confidence_threshold
+        self.class_filter = class_filter
+        self.nms_threshold = nms_threshold
+        self.running = False
+        self.frames = 0
+        self.forward_passes = 0
+        self.forward_seconds = 0.0
+        self.detect_every = 1
+        self.quality = None
+        self._pending_quality = None
+        self._allocate(self.backend.input_size)
+
+    def _allocate(self, input_size):
+        in_w, in_h = input_size
+        self.blob = np.empty((len(self.cameras), 3, in_h, in_w), dtype=np.float32)
+        for camera in self.cameras:
+            if camera.buffers.input_size != tuple(input_size):
+                camera.buffers = FrameBufferPool(camera.width, camera.height, input_size)
+
+    def set_quality(self, level):
+        """Применяется в потоке детектора перед следующим проходом."""
+        self._pending_quality = level
+
+    def _apply_quality(self, level):
+        self._pending_quality = None
+        self.quality = level
+        self.detect_every = max(1, int(level.get("detect_every", 1)))
+        input_size = tuple(level.get("input_size", self.backend.input_size))
+        if input_size != tuple(self.backend.input_size):
+            self.backend.input_size = input_size
+            self._allocate(input_size)
+        logger.info(f"Quality level '{level.get('name')}' for {len(self.cameras)} cameras: "
+                    f"detect every {self.detect_every}, input {input_size}")
+
+    def infer(self, frames):
+        """
+        frames — список кадров по камерам (None — кадра нет). Возвращает
+        список SSD-строк по камерам (None для пропущенных) за один forward
+        в пакетном режиме или за forward на камеру.
+        """
+        present = [i for i, frame in enumerate(frames) if frame is not None]
+        results = [None] * len(frames)
+        if not present:
+            return results
+        start = time.perf_counter()
+        if self.batched:
+            batch = self.blob[:len(present)]
+            for slot, index in enumerate(present):
+                self.cameras[index].buffers.prepare_blob(frames[index], out=batch[slot])
+            outputs = split_batch_output(self.backend.forward(batch), len(present))
+            for slot, rows in enumerate(outputs):
+                results[present[slot]] = rows
+            self.forward_passes += 1
+        else:
+            for index in present:
+                blob = self.cameras[index].buffers.prepare_blob(frames[index])
+                raw = np.asarray(self.backend.forward(blob), dtype=np.float32)
+                results[index] = raw.reshape(-1, 7)
+                self.forward_passes += 1
+        self.forward_seconds += time.perf_counter() - start
+        return results
+
+    def step(self, index):
+        if self._pending_quality is not None:
+            self._apply_quality(self._pending_quality)
+        frames = [camera.capture() for camera in self.cameras]
+        detect = index % self.detect_every == 0
+        results = self.infer(frames) if detect else [None] * len(frames)
+        for camera, frame, raw in zip(self.cameras, frames, results):
+            if frame is not None:
+                camera.publish(frame, raw, camera.capture_time, self.confidence_threshold,
+                               self.class_filter, self.nms_threshold)
+        return any(frame is not None for frame in frames)
+
+    def run(self):
+        self.running = True
+        logger.info(f"Starting multi-camera stream: {', '.join(c.name for c in self.cameras)}")
+        index = 0
+        try:
+            while self.running:
+                if self.step(index):
+                    self.frames += 1
+                index += 1
+        except KeyboardInterrupt:
+            logger.info("KeyboardInterrupt received.")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        for camera in self.cameras:
+            if camera.source is not None:
+                camera.close()
+                camera.source = None
+        logger.info("Multi-camera streaming stopped.")
+
+    def latest_detections(self):
+        """Детекции основной (первой) камеры — для режима следования."""
+        return self.cameras[0].latest
+
+    def get_stats(self):
+        return {
+            "running": self.running,
+            "frames": self.frames,
+            "inference_mode": "batched" if self.batched else "per-camera",
+            "quality": self.quality.get("name") if self.quality else None,
+            "forward_passes": self.forward_passes,
+            "forward_ms_mean": round(self.forward_seconds * 1000.0 / self.forward_passes, 2)
+            if self.forward_passes else None,
+            "cameras": {camera.name: camera.get_stats() for camera in self.cameras},
+        }
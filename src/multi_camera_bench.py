@@ -0,0 +1,103 @@
+"""
+Пакетный инференс нескольких камер против forward на каждую камеру (CPU).
+
+Записанные кадры раздаются N «камерам» со сдвигом, чтобы у камер были
+разные сцены. Для каждого N одна и та же сеть прогоняет кадры пакетом
+(MultiCameraDetector.infer, batched=True) и по одному (batched=False);
+сообщаются кадры в секунду на все камеры, время прохода и совпадение
+детекций пакетного режима с покадровым.
+
+    python multi_camera_bench.py --frames ../recordings/room --cameras 1,2,3,4
+"""
+import json
+import time
+import argparse
+
+from backend_bench import agreement
+from detections import postprocess
+from frame_sinks import NullFrameSink
+from frame_sources import load_frames
+from inference_backends import create_backend
+from multi_camera import CameraChannel, MultiCameraDetector
+
+
+def run_mode(detector, frame_sets, warmup=3):
+    for frames in frame_sets[:warmup]:
+        detector.infer(frames)
+    detector.forward_passes = 0
+    detector.forward_seconds = 0.0
+
+    results = []
+    start = time.perf_counter()
+    for frames in frame_sets:
+        raw = detector.infer(frames)
+        results.append([postprocess(rows, f.shape[1], f.shape[0]) for rows, f in zip(raw, frames)])
+    elapsed = time.perf_counter() - start
+    images = sum(len(frames) for frames in frame_sets)
+    return {
+        "images_per_second": round(images / elapsed, 2),
+        "sets_per_second": round(len(frame_sets) / elapsed, 2),
+        "forward_passes": detector.forward_passes,
+        "forward_ms_mean": round(detector.forward_seconds * 1000.0 / detector.forward_passes, 2),
+    }, results
+
+
+def measure(backend, frames, camera_count):
+    height, width = frames[0].shape[:2]
+    cameras = [CameraChannel(f"cam{i}", None, NullFrameSink(width, height), width, height,
+                             backend.input_size)
+               for i in range(camera_count)]
+    shift = max(1, len(frames) // camera_count)
+    frame_sets = [[frames[(index + i * shift) % len(frames)] for i in range(camera_count)]
+                  for index in range(len(frames))]
+
+    report = {"cameras": camera_count}
+    per_camera = MultiCameraDetector(cameras, backend=backend, batched=False)
+    report["per_camera"], reference = run_mode(per_camera, frame_sets)
+    batched = MultiCameraDetector(cameras, backend=backend, batched=True)
+    try:
+        report["batched"], results = run_mode(batched, frame_sets)
+    except Exception as e:
+        # Модель с фиксированным размером пакета
+        report["batched"] = {"error": str(e)}
+        return report
+    flat = lambda sets: [dets for dets_per_camera in sets for dets in dets_per_camera]
+    report["batched"]["agreement"] = agreement(flat(reference), flat(results))
+    report["speedup"] = round(report["batched"]["images_per_second"] /
+                              report["per_camera"]["images_per_second"], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пакетный инференс нескольких камер против покадрового")
+    parser.add_argument('--frames', required=True, help="каталог изображений или видеофайл")
+    parser.add_argument('--limit', type=int, default=100, help="максимум кадров")
+    parser.add_argument('--cameras', default="1,2,3,4", help="числа камер через запятую")
+    parser.add_argument('--backend', help="JSON-описание бэкенда для create_backend")
+    parser.add_argument('--output', help="куда сохранить результат (JSON)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        raise SystemExit(f"No frames in {args.frames}")
+    # Одна сеть на все замеры, как в MultiCameraDetector
+    backend = create_backend(json.loads(args.backend) if args.backend else None)
+
+    report = {"frames": len(frames), "backend": backend.name, "runs": []}
+    for count in (int(c) for c in args.cameras.split(',') if c):
+        run = measure(backend, frames, count)
+        report["runs"].append(run)
+        batched = run["batched"]
+        print(f"{count} cam: per-camera {run['per_camera']['images_per_second']} img/s, "
+              f"batched {batched.get('images_per_second', batched.get('error'))}")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
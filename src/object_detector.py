@@ -1,37 +1,108 @@
-import os
 import cv2
 import time
-import fcntl
-import v4l2
 import logging
+import multiprocessing
 import numpy as np
 import requests  # <--- Добавили импорт
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from frame_buffers import FrameBufferPool
+from frame_bus import FrameBus, inference_worker
+from frame_sinks import LoopbackFrameSink
+from detections import (CLASSES, DOG_CLASS_ID, empty_detections, postprocess, contains_class,
+                        draw_detections)
+from inference_backends import create_backend
+from stage_timer import NullStageTimer
+from motion_gate import MotionGate, remap_roi_detections, merge_roi_detections
+
 logger = logging.getLogger('object_detector')
 
 
 class VirtualCameraObjectDetector:
-    def __init__(self, width=640, height=480, input_device_index=0, output_device="/dev/video2", tts_url="http://127.0.0.1:5000/audio/speak"):
+    def __init__(self, width=640, height=480, input_device_index=0, output_device="/dev/video2",
+                 tts_url="http://127.0.0.1:5000/audio/speak",
+                 use_motion_gate=True, roi_inference=False, keyframe_interval=30,
+                 confidence_threshold=0.5, class_filter=None, nms_threshold=0.45,
+                 backend=None, source=None, sink=None, tts_enabled=True, inference_mode="thread",
+                 broadcaster=None, recorder=None, tracks=None):
         self.width = width
         self.height = height
         self.input_device_index = int(input_device_index)
         self.output_device = output_device
         self.tts_url = "https://192.168.0.38:5000/audio/speak" # <--- URL для TTS
         self.running = False
-        self.fd_out = None
-        self.cap = None
+        self.frames = 0  # обработанных кадров (FPS в отчетах симуляции)
+        # source (read/release) и sink (acquire/commit/close) можно подменить,
+        # например записью и NullFrameSink для офлайн-бенчмарка (vision_bench.py)
+        self.sink = sink
+        self.cap = source
+        self.tts_enabled = tts_enabled
+        # Раздача размеченных кадров в веб (FrameBroadcaster), кодирование один раз на кадр
+        self.broadcaster = broadcaster
+        # Буфер кадров до события и запись по срабатыванию (EventRecorder)
+        self.recorder = recorder
+        # Склейка детекций в треки объектов (DetectionTracker); запись — в фоне
+        self.tracks = tracks
+        self._tracked_time = None
+        # Сырые строки SSD, полученные инференсом на текущем кадре (для треков):
+        # None — кадр взят из кэша, на ROI-проходе — только свежие строки из ROI
+        self._inferred = None
+        # Замер стадий кадра; по умолчанию выключен
+        self.timer = NullStageTimer()
+
+        # --- Пост-обработка: порог, фильтр классов (id из CLASSES), NMS ---
+        self.confidence_threshold = confidence_threshold
+        self.class_filter = class_filter
+        self.nms_threshold = nms_threshold
+        self.detections = empty_detections()
+        # Последний результат для потребителей вне потока детектора (режим следования):
+        # (время захвата кадра, на котором получены детекции, (w, h), детекции)
+        self.latest = None
+        self._capture_time = 0.0
+        self._detections_time = 0.0
+
+        # inference_mode="process": DNN в отдельном процессе, кадры через FrameBus
+        self.inference_mode = inference_mode
+        self.bus = None
+        self.inference_conn = None
+        self.inference_process = None
+        self.remote_frames = 0
+        self.remote_dropped = 0
+        self._capture_seq = None
+        self._remote_fresh = None
+        if inference_mode == "process":
+            self.backend = None
+            self._start_inference_process(backend, gated=use_motion_gate)
+            input_size = (300, 300)
+        else:
+            # Бэкенд инференса: описание для create_backend (dict) или готовый объект
+            self.backend = create_backend(backend)
+            input_size = self.backend.input_size
+        # Заранее выделенные буферы для resize/blob, чтобы не аллоцировать на каждом кадре
+        self.buffers = FrameBufferPool(width, height, input_size)
+
+        # --- Гейт движения: DNN только при движении или раз в keyframe_interval кадров ---
+        # (в режиме process гейт работает на стороне захвата и выбирает кадры для процесса)
+        self.motion_gate = None
+        if use_motion_gate:
+            self.motion_gate = MotionGate(width, height, keyframe_interval=keyframe_interval)
+        self.roi_inference = roi_inference
+        self.cached_detections = None
+
+        # --- Уровень качества (см. quality_governor.py) ---
+        self.detect_every = 1
+        self.frame_index = 0
+        self.quality = None
+        self._pending_quality = None
 
         # --- Состояние для TTS ---
         self.dog_detected_recently = False # <--- Флаг для предотвращения спама
 
-        prototxt_path = '../models/MobileNetSSD_deploy.prototxt'
-        model_path = '../models/MobileNetSSD_deploy.caffemodel'
-        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-        self.CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat", "bottle", "bus", "car", "cat", "chair", "cow", "diningtable", "dog", "horse", "motorbike", "person", "pottedplant", "sheep", "sofa", "train", "tvmonitor"]
+        self.CLASSES = CLASSES
         
-        self._initialize_camera()
-        self._initialize_virtual_device()
+        if self.cap is None:
+            self._initialize_camera()
+        if self.sink is None:
+            self._initialize_virtual_device()
 
 
     def _initialize_camera(self):
@@ -45,28 +116,34 @@ class VirtualCameraObjectDetector:
 
 
     def _initialize_virtual_device(self):
-        if not os.path.exists(self.output_device):
-            raise FileNotFoundError(f"Device not found: {self.output_device}")
-        self.fd_out = os.open(self.output_device, os.O_RDWR)
-        
-        format = v4l2.v4l2_format()
-        format.type = v4l2.V4L2_BUF_TYPE_VIDEO_OUTPUT
-        format.fmt.pix.width = self.width
-        format.fmt.pix.height = self.height
-        format.fmt.pix.pixelformat = v4l2.V4L2_PIX_FMT_YUV420
-        format.fmt.pix.bytesperline = self.width
-        format.fmt.pix.sizeimage = int(self.width * self.height * 1.5)
-        format.fmt.pix.field = v4l2.V4L2_FIELD_NONE
-        
-        try:
-            fcntl.ioctl(self.fd_out, v4l2.VIDIOC_S_FMT, format)
-            logger.info(f"Virtual camera format set to YUV420 on {self.output_device}")
-        except Exception as e:
-            logger.error(f"Failed to set virtual camera format: {e}")
-            raise
+        # Кадры пишутся прямо в mmap-буферы v4l2loopback (см. frame_sinks.py)
+        self.sink = LoopbackFrameSink(self.output_device, self.width, self.height)
+
+    def _start_inference_process(self, backend_spec, gated=False):
+        """Создает шину кадров и запускает процесс инференса (gated — кадры по запросу гейта)."""
+        if backend_spec is not None and not isinstance(backend_spec, dict):
+            raise ValueError("inference_mode='process' requires a backend description (dict)")
+        self.bus = FrameBus(self.width, self.height)
+        ctx = multiprocessing.get_context('spawn')
+        self.inference_conn, child_conn = ctx.Pipe()
+        self.inference_process = ctx.Process(
+            target=inference_worker,
+            args=(self.bus.describe(), child_conn, backend_spec),
+            kwargs={"confidence_threshold": self.confidence_threshold,
+                    "class_filter": self.class_filter,
+                    "nms_threshold": self.nms_threshold,
+                    "gated": gated},
+            daemon=True,
+            name="InferenceWorker",
+        )
+        self.inference_process.start()
+        logger.info(f"Inference worker started (pid {self.inference_process.pid}), "
+                    f"frame bus {self.bus.name}")
 
     def speak(self, text):
         """Отправляет запрос на TTS сервер."""
+        if not self.tts_enabled:
+            return
         try:
             requests.post(self.tts_url, json={"text": text}, timeout=2, verify=False)
             logger.info(f"Отправлен запрос на озвучку: '{text}'")
@@ -74,54 +151,249 @@ class VirtualCameraObjectDetector:
             logger.warning(f"Не удалось подключиться к TTS-серверу: {e}")
 
     def _process_and_write_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            return
+        """Обрабатывает один кадр. Возвращает False, если кадр не получен."""
+        if self._pending_quality is not None:
+            self._apply_quality(self._pending_quality)
+
+        timer = self.timer
+        timer.begin()
+        frame = self._capture()
+        timer.mark('capture')
+        if frame is None:
+            return False
+        self._capture_time = time.monotonic()
+
+        if self.bus is None:
+            (h, w) = frame.shape[:2]
+            self._inferred = None
+            detections = self._detect(frame)
+
+            self.detections = postprocess(detections, w, h, self.confidence_threshold,
+                                          self.class_filter, self.nms_threshold)
+            self.latest = (self._detections_time, (w, h), self.detections)
+        else:
+            self._request_remote_inference(frame)
+            self._receive_remote_detections()
+        timer.mark('postprocess')
+        if self.tracks is not None:
+            # Только новые детекции (не кэш с прошлых кадров), кадр еще без разметки
+            self.tracks.observe(self._fresh_detections(), frame)
+        if self.bus is not None and len(self.detections):
+            # Слот шины читает процесс инференса — разметка только на своей копии.
+            # Без боксов трансляция, запись и loopback читают слот напрямую:
+            # следующий кадр пишет в шину этот же поток, уже после них
+            np.copyto(self.buffers.frame, frame)
+            frame = self.buffers.frame
+        draw_detections(frame, self.detections, self.CLASSES)
+        # Проверяем наличие собаки в ТЕКУЩЕМ кадре
+        is_dog_in_current_frame = contains_class(self.detections, DOG_CLASS_ID)
 
-        (h, w) = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
-        self.net.setInput(blob)
-        detections = self.net.forward()
-        
-        is_dog_in_current_frame = False # <--- Проверяем наличие собаки в ТЕКУЩЕМ кадре
-
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.5:
-                idx = int(detections[0, 0, i, 1])
-                # Проверяем, является ли найденный объект собакой
-                if self.CLASSES[idx] == "dog":
-                    is_dog_in_current_frame = True
-
-                box = detections[0, 0, i, 3:7] * [w, h, w, h]
-                (startX, startY, endX, endY) = box.astype("int")
-                label = f"{self.CLASSES[idx]}: {confidence:.2f}"
-                cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 255, 0), 2)
-                cv2.putText(frame, label, (startX, startY - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
         # --- Логика озвучки ---
         if is_dog_in_current_frame and not self.dog_detected_recently:
             self.speak("Жужа, жужа, скорее иди сюда!!!")
             self.dog_detected_recently = True # Взводим флаг
+            if self.recorder is not None:
+                self.recorder.trigger("dog")
         
         # Если собака пропала из кадра, сбрасываем флаг, чтобы среагировать в следующий раз
         if not is_dog_in_current_frame:
             self.dog_detected_recently = False
 
-        yuv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
-        
+        timer.mark('annotate')
+
+        jpeg = None
+        if self.broadcaster is not None:
+            jpeg = self.broadcaster.publish(frame)
+        if self.recorder is not None:
+            # JPEG уже закодирован для зрителей — используем те же байты
+            self.recorder.add(frame, jpeg, self._capture_time)
+        timer.mark('encode')
+
         try:
-            os.write(self.fd_out, yuv_frame.tobytes())
+            # Конвертация в I420 сразу в буфер устройства, без промежуточных копий
+            self.buffers.to_yuv(frame, dst=self.sink.acquire())
+            timer.mark('convert')
+            self.sink.commit()
+            timer.mark('write')
         except Exception as e:
             logger.error(f"Failed to write to virtual camera: {e}")
             self.stop()
+        return True
+
+    def _fresh_detections(self):
+        """Детекции, которые инференс дал именно на этом кадре; кэш треки не считают повторно."""
+        if self.bus is not None:
+            # Каждый результат процесса инференса — новый прогон; новый он или нет, видно по времени
+            latest_time = self.latest[0] if self.latest else None
+            fresh = latest_time is not None and latest_time != self._tracked_time
+            self._tracked_time = latest_time
+            return self._remote_fresh if fresh else ()
+        if self._inferred is None:
+            return ()
+        if self._inferred is self.cached_detections:
+            # Полный проход: постобработка уже сделана
+            return self.detections
+        return postprocess(self._inferred, self.width, self.height, self.confidence_threshold,
+                           self.class_filter, self.nms_threshold)
+
+    def _capture(self):
+        """Читает кадр с камеры; в режиме process — сразу в слот FrameBus."""
+        if self.bus is None:
+            # read() с готовым массивом переиспользует его, если размер совпадает
+            ret, frame = self.cap.read(self.buffers.frame)
+            if not ret:
+                return None
+            if frame is not self.buffers.frame:
+                # Захват в пониженном разрешении: выход остается width x height
+                cv2.resize(frame, (self.width, self.height), dst=self.buffers.frame)
+                frame = self.buffers.frame
+            return frame
+
+        seq, view = self.bus.begin_write()
+        ret, frame = self.cap.read(view)
+        if not ret:
+            return None
+        if frame is not view:
+            cv2.resize(frame, (self.width, self.height), dst=view)
+        self.bus.commit_write(seq)
+        self._capture_seq = seq
+        return view
+
+    def _request_remote_inference(self, frame):
+        """Гейт движения на стороне захвата: процессу инференса уходят только нужные кадры."""
+        if self.motion_gate is None:
+            return
+        self.frame_index += 1
+        if self.detect_every > 1 and self.frame_index % self.detect_every:
+            return
+        run_inference, roi = self.motion_gate.check(frame)
+        self.timer.mark('gate')
+        if not run_inference:
+            return
+        try:
+            self.inference_conn.send((self._capture_seq, roi if self.roi_inference else None))
+        except OSError as e:
+            logger.error(f"Inference worker is gone: {e}")
+            self.stop()
+
+    def _receive_remote_detections(self):
+        """Забирает все готовые результаты процесса инференса, оставляя последний."""
+        try:
+            while self.inference_conn.poll():
+                message = self.inference_conn.recv()
+                seq, timestamp, detections, dropped, forward_seconds, fresh = message
+                self.detections = detections
+                self._remote_fresh = fresh
+                self.latest = (timestamp, (self.width, self.height), detections)
+                self.remote_frames += 1
+                self.remote_dropped = dropped
+                if self.motion_gate is not None:
+                    self.motion_gate.record_forward(forward_seconds)
+        except (EOFError, OSError) as e:
+            logger.error(f"Inference worker is gone: {e}")
+            self.stop()
+
+    def _detect(self, frame):
+        """
+        Прогоняет DNN с учетом гейта движения. На статичных кадрах
+        возвращает закэшированные детекции предыдущего прогона.
+        """
+        self.frame_index += 1
+        if self.detect_every > 1 and self.cached_detections is not None \
+                and self.frame_index % self.detect_every:
+            return self.cached_detections
+
+        if self.motion_gate is None:
+            self.cached_detections = self._inferred = self._forward(frame)
+            return self.cached_detections
+
+        run_inference, roi = self.motion_gate.check(frame)
+        self.timer.mark('gate')
+        if not run_inference and self.cached_detections is not None:
+            # Сцена не изменилась — прежние детекции актуальны для этого кадра
+            # (для режима следования), но для треков это не новое наблюдение
+            self._detections_time = self._capture_time
+            return self.cached_detections
+
+        start = time.perf_counter()
+        if self.roi_inference and roi is not None:
+            (h, w) = frame.shape[:2]
+            x1, y1, x2, y2 = roi
+            fresh = remap_roi_detections(self._forward(frame[y1:y2, x1:x2]), roi, w, h)
+            detections = merge_roi_detections(self.cached_detections, fresh, roi, w, h)
+            self._inferred = fresh
+        else:
+            detections = self._forward(frame)
+            self._inferred = detections
+        self.motion_gate.record_forward(time.perf_counter() - start)
+
+        self.cached_detections = detections
+        return detections
+
+    def _forward(self, image):
+        self._detections_time = self._capture_time
+        blob = self.buffers.prepare_blob(image)
+        self.timer.mark('preprocess')
+        detections = self.backend.forward(blob)
+        self.timer.mark('forward')
+        return detections
+
+    def latest_detections(self):
+        """(timestamp, (w, h), detections) последнего результата или None."""
+        return self.latest
+
+    def set_quality(self, level):
+        """
+        Запрашивает смену уровня качества (dict из QUALITY_LEVELS).
+        Применяется в потоке детектора перед следующим кадром.
+        """
+        self._pending_quality = level
+
+    def _apply_quality(self, level):
+        self._pending_quality = None
+        self.quality = level
+        self.detect_every = max(1, int(level.get("detect_every", 1)))
+
+        capture = level.get("capture")
+        if capture and hasattr(self.cap, "set"):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, float(capture[0]))
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, float(capture[1]))
+
+        input_size = tuple(level.get("input_size", self.buffers.input_size))
+        if self.bus is not None:
+            try:
+                self.inference_conn.send({"input_size": input_size,
+                                          "detect_every": self.detect_every})
+            except OSError as e:
+                logger.error(f"Failed to send quality settings to inference worker: {e}")
+        elif input_size != self.buffers.input_size:
+            self.buffers = FrameBufferPool(self.width, self.height, input_size)
+            self.backend.input_size = input_size
+            self.cached_detections = None
+        logger.info(f"Quality level '{level.get('name')}': capture {capture}, "
+                    f"detect every {self.detect_every}, input {input_size}")
+
+    def get_stats(self):
+        """Статистика детектора для веб-интерфейса."""
+        return {
+            "running": self.running,
+            "frames": self.frames,
+            "inference_mode": self.inference_mode,
+            "quality": self.quality.get("name") if self.quality else None,
+            "remote_inferences": self.remote_frames if self.bus else None,
+            "remote_dropped": self.remote_dropped if self.bus else None,
+            "motion_gate": self.motion_gate.get_stats() if self.motion_gate else None,
+            "event_recorder": self.recorder.get_stats() if self.recorder else None,
+            "tracks": self.tracks.get_stats() if self.tracks else None,
+        }
 
     def run(self):
         self.running = True
         logger.info("Starting virtual camera stream...")
         try:
             while self.running:
-                self._process_and_write_frame()
+                if self._process_and_write_frame():
+                    self.frames += 1
                 time.sleep(1/30) # Оставляем небольшую задержку
         except KeyboardInterrupt:
             logger.info("KeyboardInterrupt received.")
@@ -131,8 +403,23 @@ class VirtualCameraObjectDetector:
 
     def stop(self):
         self.running = False
-        if self.cap and self.cap.isOpened():
+        if self.tracks is not None:
+            self.tracks.close_all()
+        if self.cap:
             self.cap.release()
-        if self.fd_out:
-            os.close(self.fd_out)
+        if self.sink:
+            self.sink.close()
+            self.sink = None
+        if self.inference_process:
+            try:
+                self.inference_conn.send(None)
+            except OSError:
+                pass
+            self.inference_process.join(timeout=2.0)
+            if self.inference_process.is_alive():
+                self.inference_process.terminate()
+            self.inference_process = None
+        if self.bus:
+            self.bus.close()
+            self.bus = None
         logger.info("Streaming stopped.")
@@ -2,9 +2,14 @@
 
 from typing import List, Any, Union
 
+import time
 import logging
 import serial
 
+from motion_profile import AxisProfile
+from serial_mux import SerialMux, PRIORITY_QUERY
+from qik_link import QIK_BAUD_RATES, frame, negotiate_baud_rate
+
 QIK_AUTODETECT_BAUD_RATE = 0xAA
 
 QIK_GET_FIRMWARE_VERSION = 0x81
@@ -49,23 +54,47 @@ QIK_CONFIG_MOTOR_M0_CURRENT_LIMIT_RESPONSE = 10
 QIK_CONFIG_MOTOR_M1_CURRENT_LIMIT_RESPONSE = 11
 
 m_logger = logging.getLogger('rover.qik')
-m_logger.setLevel(logging.ERROR)
-logging.basicConfig(
-	level=logging.DEBUG,
-	format="[%(asctime)s] %(threadName)s %(message)s",
-	datefmt="%H:%M:%S"
-)
 
 
 class MotorController:
 
-	def __init__(self):
+	def __init__(self, ser=None, baudrate=None, crc=False, retries=2, mux=None, device_id=0x0A):
+		"""
+		:param baudrate: фиксированная скорость порта; None — подбор самой быстрой,
+			на которой отвечает Qik
+		:param crc: дописывать CRC-7 к командам (только с установленной перемычкой CRC на плате)
+		:param retries: повторы запроса без ответа
+		:param mux: мультиплексор уже открытого порта — для второго и следующих Qik
+			в цепочке (см. qik_bus)
+		:param device_id: id устройства в Pololu-протоколе (параметр конфигурации 0)
+		"""
 		self.params = [None] * 12  # Или {}
-		self.ser =serial.Serial('/dev/ttyUSB0', 38400, timeout=0.2)
-		self.id = 0x0A
+		self.id = device_id
 		self.pololu = True
-		self.ser.flushOutput()
-		self.ser.write(0xAA)
+		self.crc = crc
+		self.retries = retries
+		if mux is not None:
+			# Порт и скорость уже настроены владельцем линии
+			self.ser = mux.ser
+			self.mux = mux
+			self._owns_mux = False
+		else:
+			# ser можно подменить, например QikSerialStub для воспроизведения сессий
+			if ser is None:
+				ser = serial.Serial('/dev/ttyUSB0', baudrate or QIK_BAUD_RATES[0], timeout=0.2)
+			self.ser = ser
+			self.ser.flushOutput()
+			if baudrate is None:
+				baudrate = negotiate_baud_rate(self.ser, device_id=self.id, crc=crc)
+				if baudrate is None:
+					m_logger.error("Qik не ответил ни на одной скорости, остается %s бод", self.ser.baudrate)
+			else:
+				self.ser.baudrate = baudrate
+				self.ser.write(bytes([QIK_AUTODETECT_BAUD_RATE]))
+			# Дальше порт принадлежит только потоку мультиплексора; все запросы идут через него
+			self.mux = SerialMux(self.ser).start()
+			self._owns_mux = True
+		self.baudrate = self.ser.baudrate
 		self.debug = True
 		self.set_pwm_mode(1)  # Высокочастотный PWM 7 бит (19.7 кГц)
 #		self.set_current_limit(0, 28)  # Ограничение тока для мотора 0 до 6 А
@@ -81,24 +110,32 @@ class MotorController:
 	def set_debug(self, on=True):
 		self.debug = on
 
-	def send_message(self, device_id: int, cmd: int, value: Union[int, List[int]] = None, rcv_length: int = None) -> object:
-		self.ser.flushInput()
+	def build_message(self, device_id: int, cmd: int, value: Union[int, List[int]] = None) -> bytes:
 		sequence = [0xAA, device_id]
 		if self.pololu:
-			cmd = cmd ^ 0x80
+			# В Pololu-протоколе у байта команды сброшен старший бит; байт со старшим
+			# битом внутри пакета Qik принял бы за новую компактную команду (Format Error)
+			cmd = cmd & 0x7F
 		sequence.append(cmd)
 		if value is not None:
 			if isinstance(value, list):
 				sequence.extend(value)
 			else:
 				sequence.append(value)
-		self.ser.write(bytearray(sequence))
-		reply = []
-		if rcv_length is not None:
-			while len(reply) < rcv_length:
-				x = self.ser.read(1)
-				reply.append(x)
-		return reply
+		return frame(sequence, self.crc)
+
+	def send_message(self, device_id: int, cmd: int, value: Union[int, List[int]] = None,
+	                 rcv_length: int = None, priority: int = PRIORITY_QUERY) -> object:
+		"""
+		Отправляет команду через мультиплексор порта. Без rcv_length не ждет ответа.
+		Возвращает список полученных байтов (по одному bytes на элемент).
+		"""
+		message = self.build_message(device_id, cmd, value)
+		if not rcv_length:
+			self.mux.send(message, priority)
+			return []
+		reply = self.mux.request(message, rcv_length, priority, retries=self.retries, tag=self.id) or b''
+		return [reply[i:i + 1] for i in range(len(reply))]
 
 	def set_pwm_mode(self, mode=0):
 		# mode: 0–5 (0 — 7 бит 19.7кГц, 1 — 8 бит 9.8кГц, и т.д. согласно доке)
@@ -134,10 +171,10 @@ class MotorController:
 		current_m0 = self.get_motor_current(0)
 		current_m1 = self.get_motor_current(1)
 		if current_m0 is None or current_m1 is None:
-			print("Не удалось прочитать ток с моторов (контроллер не отвечает).")
+			m_logger.warning("Не удалось прочитать ток с моторов (контроллер не отвечает).")
 		else:
 			# Эта строка теперь выполнится, только если есть данные
-			print(f"I M0: {current_m0:.2f} A, I M1: {current_m1:.2f} A")
+			m_logger.info("I M0: %.2f A, I M1: %.2f A", current_m0, current_m1)
 
 
 	def get_firmware_version(self):
@@ -160,7 +197,7 @@ class MotorController:
 		for i in range(12):
 			params[i] = (self.get_config_param(i))
 			if params[i] is not None:
-				print("Parameter {0} = {1} ".format(i, (params[i])))
+				m_logger.info("Parameter %d = %s", i, params[i])
 		return params
 
 
@@ -174,17 +211,47 @@ class MotorController:
 
 
 	def set_speed(self, left, right):
-		self.set_motor_speed(0, left)
-		self.set_motor_speed(1, right)
+		# Обе команды ставятся разом и уходят в порт одной записью
+		self.mux.send_motors(self.speed_frames(left, right))
 		#print("{0}\t|\t{1}".format(left, right))
 
 
+	def speed_frames(self, left, right):
+		"""Команды скорости обоих моторов {канал мультиплексора: байты} без отправки (для QikBus)."""
+		return {self.motor_channel(0): self._speed_message(0, left),
+				self.motor_channel(1): self._speed_message(1, right)}
+
+
+	def motor_channel(self, motor_id):
+		# Канал мультиплексора свой у каждого мотора каждого устройства на линии
+		return (self.id, motor_id)
+
+
 	def stop_all(self):
 		self.set_motor_speed(0, 0)
 		self.set_motor_speed(1, 0)
+		self.mux.flush_motors()
+
+
+	def get_link_stats(self):
+		stats = {"baudrate": self.baudrate, "crc": self.crc}
+		stats.update(self.mux.get_stats())
+		return stats
+
+
+	def close(self):
+		self.stop_all()
+		if self._owns_mux:
+			self.mux.stop()
 
 
 	def set_motor_speed(self, motor_id, speed):
+		# Qik не отвечает на команды скорости: ответа не ждем, неотправленная команда
+		# того же мотора заменяется новой
+		self.mux.send_motor(self.motor_channel(motor_id), self._speed_message(motor_id, speed))
+
+
+	def _speed_message(self, motor_id, speed):
 		speed = max(min(speed, 127.0), -127.0)  # range limit
 		direction = speed < 0  # set reverse direction bit if speed less than 0
 		speed_byte = int(abs(speed))  # covert floating speed to scaled byte
@@ -195,44 +262,42 @@ class MotorController:
 		cmd |= motor_id << 2  # shift motor id into bit 2
 		cmd |= 1 << 3  # just set bit 3
 		if motor_id == 0:
-			logging.debug(speed_byte)
-		self.send_message(self.id, cmd, speed_byte, 1)
+			m_logger.debug("M0 speed byte %d", speed_byte)
+		self.current_speeds[motor_id] = speed
+		return self.build_message(self.id, cmd, speed_byte)
 
-	def set_motor_speed_smooth(self, motor_id, target_speed, step=5, delay=0.05):
+	def set_motor_speed_smooth(self, motor_id, target_speed, delay=0.05, max_accel=250.0,
+	                           max_jerk=1500.0):
 			"""
-			Плавно изменяет скорость мотора от текущей к target_speed
+			Плавно изменяет скорость мотора от текущей к target_speed (блокирует до конца разгона).
+			Для цикла управления используется неблокирующий motion_profile.MotionProfile.
 			:param motor_id: 0 или 1
 			:param target_speed: -127 .. 127
-			:param step: величина изменения скорости за один шаг
-			:param delay: время задержки между шагами в секундах
+			:param delay: время между уставками в секундах
 			"""
-			current_speed = self.current_speeds.get(motor_id, 0)
-
-			while current_speed != target_speed:
-				if abs(target_speed - current_speed) < step:
-					current_speed = target_speed
-				elif target_speed > current_speed:
-					current_speed += step
-				else:
-					current_speed -= step
-
-				self.set_motor_speed(motor_id, current_speed)
-				self.current_speeds[motor_id] = current_speed
+			profile = AxisProfile(max_accel, max_jerk)
+			profile.reset(self.current_speeds.get(motor_id, 0))
+			while True:
+				speed = profile.step(target_speed, delay)
+				self.set_motor_speed(motor_id, speed)
+				if speed == max(-127.0, min(target_speed, 127.0)):
+					break
 				time.sleep(delay)
 
 
 	def get_error(self):
 		error_byte = self.get_error_byte()
 		if error_byte == 8:
-			logging.error("Data Overrun Error: serial receive buffer is full")
+			m_logger.error("Data Overrun Error: serial receive buffer is full")
 		elif error_byte == 16:
-			logging.error("Frame Error: a bytes stop bit is not detected, maybe baudrate differs from pololu")
+			m_logger.error("Frame Error: a bytes stop bit is not detected, "
+			               "maybe baudrate differs from pololu")
 		elif error_byte == 32:
-			logging.error("CRC Error: CRC-enable jumper is in place and computed CRC failed")
+			m_logger.error("CRC Error: CRC-enable jumper is in place and computed CRC failed")
 		elif error_byte == 64:
-			logging.error("Format Error: command byte does not match a known command")
+			m_logger.error("Format Error: command byte does not match a known command")
 		elif error_byte == 128:
-			logging.error("Timeout: if enabled, serial timeout")
+			m_logger.error("Timeout: if enabled, serial timeout")
 		return error_byte
 
 	# --  --  --  --  --  --  -- 	Tests 	 --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  --  -- -
@@ -245,7 +310,7 @@ class MotorController:
 	def __test_motor_input(self, motor):
 		if not self.__testBinairyInput(motor):
 			if self.debug:
-				print("motor (%s) is not 0 or 1" % motor)
+				m_logger.warning("motor (%s) is not 0 or 1", motor)
 			return False
 		return True
 
@@ -253,7 +318,7 @@ class MotorController:
 	def __test_parameter_number(self, parameterNumber):
 		if parameterNumber < 0 or parameterNumber > 3:
 			if self.debug:
-				print("parameterNumber (%s) is not 0, 1, 2, 3" % parameterNumber)
+				m_logger.warning("parameterNumber (%s) is not 0, 1, 2, 3", parameterNumber)
 			return False
 		return True
 
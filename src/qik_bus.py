@@ -0,0 +1,77 @@
+"""
+Несколько Qik в цепочке на одной линии TX/RX (daisy chain).
+
+Каждое устройство — свой MotorController со своим id в Pololu-протоколе;
+порт, скорость и мультиплексор у всех общие: их создает первый контроллер
+(основной), остальные получают его мультиплексор. Команды скорости всех
+устройств за тик цикла управления ставятся в мультиплексор одним вызовом
+(send_motors) и уходят в порт одной записью — число write() на тик не
+растет с числом контроллеров, растут только байты (4 на мотор без CRC).
+
+Запросы ошибок и токов адресные: на компактную команду ответили бы все
+устройства сразу. QikTelemetry опрашивает устройства шины по очереди.
+Статистика шины — время обмена по каждому устройству (tag запроса = id)
+и размер/время записи команд за тик.
+"""
+import time
+import logging
+from collections import deque
+
+from qik import MotorController
+
+logger = logging.getLogger('rover.qik')
+
+
+class QikBus:
+    """Набор Qik на одном порту; controllers — {device_id: MotorController}."""
+
+    def __init__(self, ser=None, device_ids=(0x0A,), baudrate=None, crc=False, retries=2):
+        if not device_ids:
+            raise ValueError("At least one Qik device id is required")
+        if len(set(device_ids)) != len(device_ids):
+            raise ValueError(f"Duplicate Qik device ids: {device_ids}")
+        self.primary = MotorController(ser=ser, baudrate=baudrate, crc=crc, retries=retries,
+                                       device_id=device_ids[0])
+        self.mux = self.primary.mux
+        self.controllers = {self.primary.id: self.primary}
+        for device_id in device_ids[1:]:
+            self.controllers[device_id] = MotorController(crc=crc, retries=retries, mux=self.mux,
+                                                          device_id=device_id)
+        self.ticks = 0
+        self.tick_seconds = deque(maxlen=500)  # время постановки команд тика (без ожидания порта)
+        ids = ', '.join(f'0x{i:02X}' for i in self.controllers)
+        logger.info(f"Шина Qik: {ids} на {self.primary.baudrate} бод")
+
+    def set_speeds(self, speeds):
+        """speeds — {device_id: (left, right)}; команды всех устройств уходят одной записью."""
+        start = time.perf_counter()
+        frames = {}
+        for device_id, (left, right) in speeds.items():
+            frames.update(self.controllers[device_id].speed_frames(left, right))
+        self.mux.send_motors(frames)
+        self.ticks += 1
+        self.tick_seconds.append(time.perf_counter() - start)
+
+    def set_speed(self, left, right):
+        """Одни и те же скорости всем контроллерам (например, по Qik на ось)."""
+        self.set_speeds({device_id: (left, right) for device_id in self.controllers})
+
+    def stop_all(self):
+        self.set_speed(0, 0)
+        self.mux.flush_motors()
+
+    def close(self):
+        self.stop_all()
+        self.mux.stop()
+
+    def get_stats(self):
+        stats = self.primary.get_link_stats()
+        ticks = sorted(self.tick_seconds)
+        stats.update({
+            "controllers": len(self.controllers),
+            "ticks": self.ticks,
+            "tick_submit_ms_p50": round(ticks[len(ticks) // 2] * 1000.0, 3) if ticks else None,
+            "devices": {f"0x{device_id:02X}": self.mux.get_tag_stats(device_id)
+                        for device_id in self.controllers},
+        })
+        return stats
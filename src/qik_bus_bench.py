@@ -0,0 +1,98 @@
+"""
+Стоимость тика цикла управления в зависимости от числа Qik на линии.
+
+Для каждого числа контроллеров N собирается QikBus на QikSerialStub со
+временем передачи байтов (заглушка отвечает на все id цепочки). Каждый тик
+ставит скорости всем устройствам через set_speeds (одна запись в порт) и,
+для сравнения, по отдельному set_speed на устройство; параллельно идет
+опрос ошибок и токов по кругу. Сообщаются записи и байты на тик, время
+записи тика и время обмена по каждому устройству.
+
+    python qik_bus_bench.py --controllers 1,2,3,4 --ticks 200 --baudrate 115200
+"""
+import json
+import time
+import argparse
+
+from qik_bus import QikBus
+from qik_stub import QikSerialStub
+from qik_telemetry import QikTelemetry
+
+FIRST_ID = 0x0A
+
+
+def run_ticks(bus, ticks, period, combined, telemetry):
+    mux = bus.mux
+    writes, written = mux.writes, mux.bytes_written
+    start = time.perf_counter()
+    for tick in range(ticks):
+        speed = (tick % 64) - 32
+        if combined:
+            bus.set_speed(speed, -speed)
+        else:
+            # Как без шины: команды каждого контроллера ставятся и уходят отдельно
+            for controller in bus.controllers.values():
+                controller.set_speed(speed, -speed)
+                mux.flush_motors()
+        if tick % 5 == 0:
+            telemetry.poll()
+        time.sleep(period)
+    mux.flush_motors()
+    elapsed = time.perf_counter() - start
+    return {
+        "writes_per_tick": round((mux.writes - writes) / ticks, 2),
+        "bytes_per_tick": round((mux.bytes_written - written) / ticks, 1),
+        "overrun_ms_per_tick": round((elapsed / ticks - period) * 1000.0, 3),
+    }
+
+
+def measure(count, ticks, period, baudrate, crc):
+    device_ids = tuple(FIRST_ID + i for i in range(count))
+    stub = QikSerialStub(crc=crc, chain_ids=device_ids[1:])
+    bus = QikBus(ser=stub, device_ids=device_ids, baudrate=baudrate, crc=crc)
+    telemetry = QikTelemetry(None, bus=bus)
+    try:
+        separate = run_ticks(bus, ticks, period, False, telemetry)
+        bus.mux.motor_writes.clear()
+        combined = run_ticks(bus, ticks, period, True, telemetry)
+        stats = bus.get_stats()
+        combined["motor_write_ms_p50"] = stats["motor_write_ms_p50"]
+        return {
+            "controllers": count,
+            "separate": separate,
+            "combined": combined,
+            "devices": stats["devices"],
+            "timeouts": stats["timeouts"],
+        }
+    finally:
+        bus.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Стоимость тика в зависимости от числа Qik на линии")
+    parser.add_argument('--controllers', default="1,2,3,4", help="числа контроллеров через запятую")
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--period', type=float, default=0.01, help="период тика, с")
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--crc', action='store_true')
+    parser.add_argument('--output', help="куда сохранить результат (JSON)")
+    args = parser.parse_args()
+
+    report = []
+    for count in (int(c) for c in args.controllers.split(',') if c):
+        run = measure(count, args.ticks, args.period, args.baudrate, args.crc)
+        report.append(run)
+        print(f"{count} Qik: separate {run['separate']['writes_per_tick']} writes/tick, "
+              f"combined {run['combined']['writes_per_tick']} writes/tick, "
+              f"{run['combined']['bytes_per_tick']} B/tick")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
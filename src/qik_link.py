@@ -0,0 +1,86 @@
+"""
+Канальный уровень Qik: CRC-7 и подбор скорости порта.
+
+CRC-7 Pololu (полином 0x91, биты младшим вперед) считается по таблице из
+256 значений: один байт сообщения — одно обращение к таблице. Режим CRC
+включается перемычкой на плате; тогда Qik ждет байт CRC в конце каждой
+команды и молча отбрасывает команду с неверной суммой (бит CRC Error в
+байте ошибки).
+
+Qik определяет скорость по первому байту 0xAA после включения и дальше
+работает только на ней. negotiate_baud_rate() перебирает скорости от
+большей к меньшей: отправляет 0xAA и запрос версии прошивки, пока
+контроллер не ответит. Если Qik уже зафиксировал скорость раньше
+(перезапуск программы без перезапуска питания), найдется именно она.
+"""
+import time
+import logging
+
+logger = logging.getLogger('rover.qik')
+
+CRC7_POLY = 0x91
+QIK_AUTODETECT_BYTE = 0xAA
+QIK_GET_FIRMWARE_VERSION = 0x81
+# Скорости автоопределения 2s12v10 (до 115200), от быстрой к медленной
+QIK_BAUD_RATES = (115200, 57600, 38400, 19200, 9600)
+VALID_FIRMWARE_VERSIONS = (b'1', b'2')
+
+
+def _make_crc7_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc ^= CRC7_POLY
+            crc >>= 1
+        table.append(crc)
+    return bytes(table)
+
+
+CRC7_TABLE = _make_crc7_table()
+
+
+def crc7(data):
+    """CRC-7 сообщения Qik (значение 0..127, дописывается последним байтом)."""
+    crc = 0
+    for byte in data:
+        crc = CRC7_TABLE[crc ^ byte]
+    return crc
+
+
+def frame(message, crc=False):
+    """Команда Qik для отправки: с байтом CRC, если включен режим CRC."""
+    message = bytes(message)
+    return message + bytes([crc7(message)]) if crc else message
+
+
+def probe_message(device_id=None, crc=False):
+    """Запрос версии прошивки: компактный или Pololu-протокол с device_id."""
+    if device_id is None:
+        return frame([QIK_GET_FIRMWARE_VERSION], crc)
+    return frame([0xAA, device_id, QIK_GET_FIRMWARE_VERSION ^ 0x80], crc)
+
+
+def negotiate_baud_rate(ser, rates=QIK_BAUD_RATES, device_id=None, crc=False):
+    """
+    Подбирает скорость порта, на которой Qik отвечает на запрос версии.
+    Вызывается до запуска SerialMux, пока порт принадлежит вызывающему.
+    Возвращает скорость или None; при неудаче порт остается на последней.
+    """
+    probe = probe_message(device_id, crc)
+    for rate in rates:
+        ser.baudrate = rate
+        ser.reset_input_buffer()
+        ser.write(bytes([QIK_AUTODETECT_BYTE]))
+        ser.write(probe)
+        reply = ser.read(1)
+        if reply in VALID_FIRMWARE_VERSIONS:
+            logger.info(f"Qik отвечает на {rate} бод (прошивка {reply.decode()})")
+            # Без остатков от попыток на других скоростях
+            time.sleep(0.01)
+            ser.reset_input_buffer()
+            return rate
+        logger.debug(f"Нет ответа Qik на {rate} бод")
+    logger.error("Не удалось подобрать скорость порта Qik")
+    return None
@@ -0,0 +1,101 @@
+"""
+Пропускная способность канала Qik на разных скоростях порта, с CRC и без.
+
+Для каждой скорости из QIK_BAUD_RATES через MotorController и SerialMux
+отправляются команды скорости (без ответа) и запросы версии прошивки
+(с ответом); считаются команды в секунду, время обмена и статистика канала.
+Без --port используется QikSerialStub с временем передачи байтов;
+--corrupt-rate искажает принятые заглушкой байты, чтобы увидеть повторы.
+С --port замер идет на настоящем контроллере, только на скорости, которую
+выберет автоподбор (Qik меняет скорость лишь после перезапуска питания).
+
+    python qik_link_bench.py --commands 500 --queries 100 --corrupt-rate 0.001
+    python qik_link_bench.py --port /dev/ttyUSB0 --crc
+"""
+import json
+import time
+import argparse
+
+from qik import MotorController
+from qik_link import QIK_BAUD_RATES
+from qik_stub import QikSerialStub
+from serial_mux import PRIORITY_MOTOR
+
+
+def measure(motor_control, commands, queries):
+    mux = motor_control.mux
+    speed_frames = [motor_control.build_message(motor_control.id, 0x08 | (i & 1) << 2, i % 128)
+                    for i in range(commands)]
+    start = time.perf_counter()
+    last = None
+    for data in speed_frames:
+        # Без схлопывания send_motor — каждая команда действительно уходит в порт
+        last = mux.send(data, PRIORITY_MOTOR)
+    if last is not None:
+        last.wait(30.0)
+    command_seconds = time.perf_counter() - start
+
+    probe = motor_control.build_message(motor_control.id, 0x81)
+    answered = 0
+    start = time.perf_counter()
+    for _ in range(queries):
+        reply = mux.request(probe, 1, retries=motor_control.retries, timeout=5.0)
+        answered += bool(reply)
+    query_seconds = time.perf_counter() - start
+
+    return {
+        "baudrate": motor_control.baudrate,
+        "crc": motor_control.crc,
+        "commands_per_second": round(commands / command_seconds, 1) if command_seconds else None,
+        "queries_per_second": round(queries / query_seconds, 1) if query_seconds else None,
+        "queries_answered": answered,
+        "link": motor_control.get_link_stats(),
+    }
+
+
+def bench_stub(commands, queries, corrupt_rate, seed=1):
+    report = []
+    for crc in (False, True):
+        for rate in QIK_BAUD_RATES:
+            stub = QikSerialStub(crc=crc, corrupt_rate=0.0, seed=seed)
+            motor_control = MotorController(ser=stub, baudrate=rate, crc=crc)
+            # Искажения включаются после настройки контроллера
+            stub.corrupt_rate = corrupt_rate
+            result = measure(motor_control, commands, queries)
+            result["stub_error_byte"] = stub.error_byte
+            motor_control.mux.stop()
+            report.append(result)
+    return report
+
+
+def bench_port(port, commands, queries, crc):
+    import serial
+    ser = serial.Serial(port, QIK_BAUD_RATES[0], timeout=0.2)
+    motor_control = MotorController(ser=ser, crc=crc)
+    try:
+        return [measure(motor_control, commands, queries)]
+    finally:
+        motor_control.close()
+        ser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пропускная способность канала Qik по скоростям порта")
+    parser.add_argument('--commands', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--corrupt-rate', type=float, default=0.0,
+                        help="доля искаженных байтов (заглушка)")
+    parser.add_argument('--port', help="порт настоящего Qik вместо заглушки")
+    parser.add_argument('--crc', action='store_true', help="режим CRC (с --port, нужна перемычка)")
+    args = parser.parse_args()
+
+    if args.port:
+        report = bench_port(args.port, args.commands, args.queries, args.crc)
+    else:
+        report = bench_stub(args.commands, args.queries, args.corrupt_rate)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Заглушка serial-порта контроллера Pololu Qik для работы без железа.
+
+Разбирает команды компактного и Pololu-протокола так же, как их принял бы
+Qik 2s12v10, хранит скорости моторов и параметры конфигурации и отвечает на
+запросы. При simulate_timing=True воспроизводит время передачи байтов на
+заданной скорости и ожидание read() до таймаута, если ответа нет, — так
+задержки цикла управления совпадают с реальными.
+
+Как настоящий Qik, фиксирует скорость по первому байту 0xAA (не выше
+max_baudrate); байты на другой скорости принимаются как мусор с битом
+Serial Hardware Error. При crc=True проверяет CRC-7 каждой команды, а
+corrupt_rate искажает принятые байты для проверки повторов. chain_ids —
+id других Qik в цепочке на той же линии: на их Pololu-команды заглушка
+тоже отвечает (состояние моторов общее), чтобы мерить шину без железа.
+"""
+import time
+import random
+import threading
+
+from qik_link import crc7
+
+# Длина данных после байта команды (команда с установленным старшим битом)
+_DATA_LENGTH = {
+    0x81: 0, 0x82: 0, 0x83: 1, 0x84: 4,
+    0x86: 1, 0x87: 1,
+    0x88: 1, 0x89: 1, 0x8A: 1, 0x8B: 1, 0x8C: 1, 0x8D: 1, 0x8E: 1, 0x8F: 1,
+    0x90: 0, 0x91: 0, 0x92: 0, 0x93: 0,
+}
+
+_DEFAULT_CONFIG = [0x0A, 0, 1, 0, 0, 0, 0, 0, 0, 0, 4, 4]
+
+
+class QikSerialStub:
+    """Объект с интерфейсом serial.Serial, ведущий себя как Qik 2s12v10."""
+
+    def __init__(self, baudrate=38400, timeout=0.2, device_id=0x0A, simulate_timing=True,
+                 firmware_version=ord('2'), max_baudrate=115200, crc=False, corrupt_rate=0.0,
+                 seed=None, chain_ids=()):
+        self.baudrate = baudrate
+        self.max_baudrate = max_baudrate
+        self.locked_baudrate = None  # скорость, определенная по первому 0xAA
+        self.crc = crc
+        self.corrupt_rate = corrupt_rate
+        self._random = random.Random(seed)
+        self.timeout = timeout
+        self.device_id = device_id
+        self.device_ids = {device_id, *chain_ids}
+        self.simulate_timing = simulate_timing
+        self.firmware_version = firmware_version
+        self.is_open = True
+        self.port = "qik-stub"
+
+        self.config = list(_DEFAULT_CONFIG)
+        self.config[0] = device_id
+        self.speeds = [0, 0]
+        self.brakes = [0, 0]
+        self.error_byte = 0
+
+        self._lock = threading.Lock()
+        self._rx = bytearray()     # байты от хоста, еще не разобранные
+        self._reply = bytearray()  # ответы контроллера хосту
+        self.commands = []         # (время, команда, данные) принятых команд
+        self.bytes_written = 0
+
+    # --- Интерфейс serial.Serial ---
+
+    def write(self, data):
+        if isinstance(data, int):
+            # Как pyserial: write(int) передает int нулевых байт
+            data = bytes(bytearray(data))
+        data = bytes(data)
+        if self.simulate_timing:
+            time.sleep(len(data) * 10.0 / self.baudrate)
+        with self._lock:
+            self.bytes_written += len(data)
+            self._receive(data)
+        return len(data)
+
+    def _receive(self, data):
+        if self.locked_baudrate is None:
+            if self.baudrate > self.max_baudrate or not data or data[0] != 0xAA:
+                return  # до автоопределения скорости контроллер ничего не принимает
+            self.locked_baudrate = self.baudrate
+            data = data[1:]
+        elif self.baudrate != self.locked_baudrate:
+            self.error_byte |= 0x10
+            return
+        if self.corrupt_rate:
+            rng = self._random
+            data = bytes(b ^ (1 << rng.randrange(8)) if rng.random() < self.corrupt_rate else b
+                         for b in data)
+        self._rx.extend(data)
+        self._parse()
+
+    def read(self, size=1):
+        with self._lock:
+            available = min(size, len(self._reply))
+            data = bytes(self._reply[:available])
+            del self._reply[:available]
+        if self.simulate_timing:
+            if available < size and self.timeout:
+                # Контроллер не ответил — read() ждет до таймаута
+                time.sleep(self.timeout)
+            elif available:
+                time.sleep(available * 10.0 / self.baudrate)
+        return data
+
+    @property
+    def in_waiting(self):
+        return len(self._reply)
+
+    def flushInput(self):
+        self.reset_input_buffer()
+
+    def flushOutput(self):
+        self.reset_output_buffer()
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._reply.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    # --- Протокол Qik ---
+
+    def _parse(self):
+        rx = self._rx
+        while rx:
+            if rx[0] == 0xAA:
+                # Pololu-протокол: 0xAA, id, команда без старшего бита, данные
+                if len(rx) < 3:
+                    return
+                if rx[1] & 0x80 or rx[2] & 0x80:
+                    # Байт команды внутри пакета начинает новый пакет
+                    self.error_byte |= 0x40
+                    del rx[0]
+                    continue
+                device_id, cmd = rx[1], rx[2] | 0x80
+                header = 3
+            elif rx[0] & 0x80:
+                device_id, cmd = self.device_id, rx[0]
+                header = 1
+            else:
+                # Байт данных без команды — контроллер выставил бы Format Error
+                self.error_byte |= 0x40
+                del rx[0]
+                continue
+
+            length = _DATA_LENGTH.get(cmd)
+            if length is None:
+                self.error_byte |= 0x40
+                del rx[:header]
+                continue
+            total = header + length + (1 if self.crc else 0)
+            if len(rx) < total:
+                return
+            data = bytes(rx[header:header + length])
+            packet = bytes(rx[:total])
+            del rx[:total]
+            if self.crc and crc7(packet[:-1]) != packet[-1]:
+                self.error_byte |= 0x20  # CRC Error: команда отбрасывается
+                continue
+            if device_id in self.device_ids:
+                self._execute(cmd, data)
+
+    def _execute(self, cmd, data):
+        self.commands.append((time.monotonic(), cmd, data))
+        if cmd == 0x81:
+            self._reply.append(self.firmware_version)
+        elif cmd == 0x82:
+            self._reply.append(self.error_byte)
+            self.error_byte = 0
+        elif cmd == 0x83:
+            param = data[0]
+            self._reply.append(self.config[param] if param < len(self.config) else 0)
+        elif cmd == 0x84:
+            param, value = data[0], data[1]
+            if param < len(self.config) and data[2:] == b'\x55\x2a':
+                self.config[param] = value
+                self._reply.append(0)
+            else:
+                self._reply.append(1)
+        elif cmd in (0x86, 0x87):
+            self.brakes[cmd - 0x86] = data[0]
+            self.speeds[cmd - 0x86] = 0
+        elif 0x88 <= cmd <= 0x8F:
+            motor = (cmd >> 2) & 1
+            speed = data[0] + (128 if cmd & 1 else 0)
+            self.speeds[motor] = -speed if cmd & 2 else speed
+        elif 0x90 <= cmd <= 0x93:
+            self._reply.append(abs(self.speeds[cmd & 1]) if cmd >= 0x92 else 0)
+
+    def motor_commands(self):
+        """(время, motor, speed) всех принятых команд скорости."""
+        result = []
+        for timestamp, cmd, data in self.commands:
+            if 0x88 <= cmd <= 0x8F:
+                speed = data[0] + (128 if cmd & 1 else 0)
+                result.append((timestamp, (cmd >> 2) & 1, -speed if cmd & 2 else speed))
+        return result
@@ -0,0 +1,128 @@
+"""
+Периодический опрос Qik: байт ошибки и токи моторов.
+
+Запросы уходят одним пакетом мультиплексора с низким приоритетом и
+приклеиваются к очередной команде моторам, поэтому опрос не добавляет
+отдельных обменов и не задерживает цикл управления. Последние значения
+читаются из кэша (latest()) без обращения к порту.
+
+С шиной Qik (QikBus) за один период опрашивается одно устройство, по
+очереди: нагрузка на линию не растет с числом контроллеров, а последние
+значения хранятся по каждому id.
+"""
+import time
+import logging
+import threading
+
+from QikErrorChecker import QikErrorChecker
+from qik import QIK_2S12V10_GET_MOTOR_M0_CURRENT, QIK_2S12V10_GET_MOTOR_M1_CURRENT
+from serial_mux import PRIORITY_TELEMETRY
+
+logger = logging.getLogger('rover.qik')
+
+CURRENT_SCALE = 0.15  # А на единицу ответа 2s12v10
+
+
+class QikTelemetry:
+    """Поток опроса; on_error(err, messages) вызывается при ненулевом байте ошибки."""
+
+    def __init__(self, motor_control, interval=1.0, model="2s12v10", on_error=None, bus=None):
+        self.bus = bus
+        self.motor_control = bus.primary if bus is not None else motor_control
+        self.controllers = list(bus.controllers.values()) if bus is not None else [motor_control]
+        self.interval = interval
+        # С одним контроллером — прежний компактный запрос ошибки, в цепочке — адресный
+        chained = len(self.controllers) > 1
+        self.checkers = {mc.id: QikErrorChecker(mc.mux, model, crc=mc.crc,
+                                                device_id=mc.id if chained else None)
+                         for mc in self.controllers}
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._latest = {mc.id: {"error_byte": None, "current_m0": None, "current_m1": None,
+                                "timestamp": None}
+                        for mc in self.controllers}
+        self._next = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.failed_polls = 0
+        self.errors_seen = 0
+        # Сколько раз был выставлен каждый бит ошибки (CRC, Format, Serial Hardware — ошибки канала)
+        self.error_counts = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="QikTelemetryThread")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def poll(self, mc=None):
+        """
+        Один опрос: ошибка и токи обоих моторов одним пакетом;
+        без mc — следующее устройство по кругу.
+        """
+        if mc is None:
+            mc = self.controllers[self._next % len(self.controllers)]
+            self._next += 1
+        checker = self.checkers[mc.id]
+        requests = mc.mux.submit_batch([
+            (checker._build_get_error_cmd(), 1),
+            (mc.build_message(mc.id, QIK_2S12V10_GET_MOTOR_M0_CURRENT), 1),
+            (mc.build_message(mc.id, QIK_2S12V10_GET_MOTOR_M1_CURRENT), 1),
+        ], PRIORITY_TELEMETRY, retries=mc.retries, tag=mc.id)
+        replies = [request.wait(1.0) for request in requests]
+        self.polls += 1
+        if any(not reply for reply in replies):
+            self.failed_polls += 1
+        err = replies[0][0] if replies[0] else None
+        values = {
+            "error_byte": err,
+            "current_m0": replies[1][0] * CURRENT_SCALE if replies[1] else None,
+            "current_m1": replies[2][0] * CURRENT_SCALE if replies[2] else None,
+            "timestamp": time.monotonic(),
+        }
+        with self._lock:
+            self._latest[mc.id] = values
+        if err:
+            self.errors_seen += 1
+            messages = checker.decode_errors(err)
+            for message in messages:
+                self.error_counts[message] = self.error_counts.get(message, 0) + 1
+            logger.error(f"Qik 0x{mc.id:02X} error byte 0x{err:02X}: {', '.join(messages)}")
+            if self.on_error is not None:
+                self.on_error(err, messages)
+        return values
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Ошибка опроса Qik: {e}")
+
+    def latest(self, device_id=None):
+        """Последние значения устройства (по умолчанию основного контроллера)."""
+        with self._lock:
+            return dict(self._latest[self.motor_control.id if device_id is None else device_id])
+
+    def get_stats(self):
+        stats = self.latest()
+        stats.update({
+            "polls": self.polls,
+            "failed_polls": self.failed_polls,
+            "errors_seen": self.errors_seen,
+            "error_counts": dict(self.error_counts),
+            "link": (self.bus.get_stats() if self.bus is not None
+                     else self.motor_control.get_link_stats()),
+        })
+        if len(self.controllers) > 1:
+            with self._lock:
+                stats["devices"] = {f"0x{device_id:02X}": dict(values)
+                                    for device_id, values in self._latest.items()}
+        return stats
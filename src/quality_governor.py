@@ -0,0 +1,153 @@
+import time
+import logging
+import threading
+from collections import deque
+
+import psutil
+
+from motion_gate import read_cpu_temperature
+
+logger = logging.getLogger('rover.quality')
+
+# Уровни качества от лучшего к самому экономному.
+# capture — разрешение захвата (выход в /dev/video2 остается прежним),
+# detect_every — DNN на каждом N-м кадре, input_size — вход сети.
+QUALITY_LEVELS = [
+    {"name": "full", "capture": (640, 480), "detect_every": 1, "input_size": (300, 300)},
+    {"name": "reduced-rate", "capture": (640, 480), "detect_every": 2, "input_size": (300, 300)},
+    {"name": "reduced-input", "capture": (640, 480), "detect_every": 3, "input_size": (256, 256)},
+    {"name": "low", "capture": (320, 240), "detect_every": 4, "input_size": (224, 224)},
+    {"name": "minimal", "capture": (320, 240), "detect_every": 6, "input_size": (192, 192)},
+]
+
+
+class QualityGovernor:
+    """
+    Следит за температурой CPU, загрузкой и джиттером цикла управления
+    и переключает уровень качества детектора с гистерезисом:
+    понижение — если любой показатель выше верхнего порога down_hold
+    замеров подряд, повышение — если все ниже нижних порогов up_hold замеров подряд.
+    """
+
+    def __init__(self, detector=None, loop_monitor=None, interval=2.0, levels=QUALITY_LEVELS,
+                 temp_high=75.0, temp_low=68.0, cpu_high=85.0, cpu_low=60.0,
+                 jitter_high_ms=25.0, jitter_low_ms=10.0, down_hold=2, up_hold=5):
+        self.detector = detector
+        self.loop_monitor = loop_monitor
+        self.interval = interval
+        self.levels = levels
+        self.temp_high, self.temp_low = temp_high, temp_low
+        self.cpu_high, self.cpu_low = cpu_high, cpu_low
+        self.jitter_high_ms, self.jitter_low_ms = jitter_high_ms, jitter_low_ms
+        self.down_hold = down_hold
+        self.up_hold = up_hold
+
+        self.level = 0
+        self.metrics = {}
+        self.transitions = deque(maxlen=20)
+        self._over = 0
+        self._under = 0
+        # Номер тика цикла управления на прошлом замере: джиттер считается только
+        # по новым тикам, а не по окну LoopMonitor в 60 с, где всплеск держался бы минуту
+        self._jitter_cursor = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        psutil.cpu_percent(interval=None)  # первый вызов только задает точку отсчета
+        self._thread = threading.Thread(target=self._run, daemon=True, name="QualityGovernor")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def attach(self, detector):
+        """Подключает детектор, созданный позже, и сразу применяет текущий уровень."""
+        self.detector = detector
+        detector.set_quality(self.levels[self.level])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.update(self._sample())
+            except Exception as e:
+                logger.error(f"Ошибка регулятора качества: {e}")
+
+    def _sample(self):
+        jitter = None
+        if self.loop_monitor is not None:
+            jitter, self._jitter_cursor = self.loop_monitor.jitter_since(self._jitter_cursor)
+        return {
+            "temperature": read_cpu_temperature(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "jitter_ms_p99": jitter,
+        }
+
+    def update(self, metrics):
+        """Принимает замер и при необходимости меняет уровень. Возвращает текущий уровень."""
+        reasons = self._over_limits(metrics)
+        calm = self._under_limits(metrics)
+
+        with self._lock:
+            self.metrics = metrics
+            if reasons:
+                self._over += 1
+                self._under = 0
+            elif calm:
+                self._under += 1
+                self._over = 0
+            else:
+                # Между порогами — держим уровень
+                self._over = 0
+                self._under = 0
+
+            if self._over >= self.down_hold and self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1, ", ".join(reasons))
+            elif self._under >= self.up_hold and self.level > 0:
+                self._set_level(self.level - 1, "recovered")
+            return self.level
+
+    def _over_limits(self, m):
+        reasons = []
+        if m.get("temperature") is not None and m["temperature"] >= self.temp_high:
+            reasons.append(f"temperature {m['temperature']:.1f}C")
+        if m.get("cpu_percent") is not None and m["cpu_percent"] >= self.cpu_high:
+            reasons.append(f"cpu {m['cpu_percent']:.0f}%")
+        if m.get("jitter_ms_p99") is not None and m["jitter_ms_p99"] >= self.jitter_high_ms:
+            reasons.append(f"jitter {m['jitter_ms_p99']:.1f}ms")
+        return reasons
+
+    def _under_limits(self, m):
+        return ((m.get("temperature") is None or m["temperature"] <= self.temp_low) and
+                (m.get("cpu_percent") is None or m["cpu_percent"] <= self.cpu_low) and
+                (m.get("jitter_ms_p99") is None or m["jitter_ms_p99"] <= self.jitter_low_ms))
+
+    def _set_level(self, level, reason):
+        previous = self.level
+        self.level = level
+        self._over = 0
+        self._under = 0
+        self.transitions.append({
+            "time": time.strftime('%H:%M:%S'),
+            "from": self.levels[previous]["name"],
+            "to": self.levels[level]["name"],
+            "reason": reason,
+        })
+        logger.info(f"Качество: {self.levels[previous]['name']} -> "
+                    f"{self.levels[level]['name']} ({reason})")
+        if self.detector is not None:
+            self.detector.set_quality(self.levels[level])
+
+    def get_status(self):
+        with self._lock:
+            level = self.levels[self.level]
+            return {
+                "level": self.level,
+                "name": level["name"],
+                "capture": list(level["capture"]),
+                "detect_every": level["detect_every"],
+                "input_size": list(level["input_size"]),
+                "metrics": dict(self.metrics),
+                "transitions": list(self.transitions),
+            }
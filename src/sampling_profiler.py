@@ -0,0 +1,134 @@
+"""
+Семплирующий профилировщик всех потоков процесса.
+
+Пока запущен, отдельный поток каждые interval секунд снимает стеки всех
+потоков через sys._current_frames() и считает одинаковые стеки. Результат —
+collapsed stacks (формат flamegraph.pl / speedscope: "поток;f1;f2 N") и
+CPU каждого потока за сеанс по native_id (psutil, /proc/self/task) — без
+pthread_getcpuclockid, который на завершившемся потоке может уронить процесс.
+Вне сеанса потока профилировщика нет и никакой работы не выполняется.
+"""
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+
+import psutil
+
+logger = logging.getLogger('rover.profiler')
+
+
+def _thread_cpu_times():
+    """{native_id: секунды CPU (user + system)} живых потоков процесса."""
+    return {t.id: t.user_time + t.system_time for t in psutil.Process().threads()}
+
+
+class SamplingProfiler:
+    """Сеанс ограниченной длительности; повторный старт во время сеанса отклоняется."""
+
+    def __init__(self, max_duration=60.0, min_interval=0.001):
+        self.max_duration = max_duration
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.result = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=10.0, interval=0.005):
+        """Запускает сеанс. Возвращает False, если сеанс уже идет."""
+        duration = max(0.1, min(float(duration), self.max_duration))
+        interval = max(self.min_interval, float(interval))
+        with self._lock:
+            if self.is_running():
+                return False
+            self._stop.clear()
+            self.result = None
+            self._thread = threading.Thread(target=self._run, args=(duration, interval),
+                                            daemon=True, name="SamplingProfiler")
+            self._thread.start()
+        logger.info(f"Профилирование запущено: {duration:.1f} с, шаг {interval * 1000:.1f} мс")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5.0)
+
+    def _run(self, duration, interval):
+        own = threading.get_ident()
+        threads = {t.ident: t.name for t in threading.enumerate()}
+        native_names = {t.native_id: t.name for t in threading.enumerate()}
+        cpu_start = _thread_cpu_times()
+        stacks = Counter()
+        samples = 0
+        sampling_time = 0.0
+        start = time.monotonic()
+        deadline = start + duration
+
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = threads.get(ident)
+                if name is None:
+                    # Поток появился во время сеанса
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    name = thread.name if thread is not None else str(ident)
+                    threads[ident] = name
+                    if thread is not None:
+                        native_names[thread.native_id] = name
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    filename = code.co_filename.rsplit('/', 1)[-1]
+                    stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(name)
+                stacks[tuple(reversed(stack))] += 1
+            del frame
+            samples += 1
+            sampling_time += time.perf_counter() - t0
+            self._stop.wait(interval)
+
+        elapsed = time.monotonic() - start
+        native_names.update({t.native_id: t.name for t in threading.enumerate()})
+        thread_cpu = {}
+        # Завершившиеся за сеанс потоки в /proc уже не видны и не учитываются;
+        # появившиеся за сеанс начинали с нуля
+        for native_id, end in _thread_cpu_times().items():
+            name = native_names.get(native_id, f"native-{native_id}")
+            thread_cpu[name] = thread_cpu.get(name, 0.0) + end - cpu_start.get(native_id, 0.0)
+        self.result = {
+            "duration": round(elapsed, 3),
+            "samples": samples,
+            "interval_ms": round(interval * 1000.0, 2),
+            "overhead_percent": round(sampling_time * 100.0 / elapsed, 2) if elapsed else 0.0,
+            "thread_cpu_percent": {
+                name: round(cpu * 100.0 / elapsed, 1)
+                for name, cpu in sorted(thread_cpu.items(), key=lambda x: -x[1])},
+            "stacks": stacks,
+        }
+        logger.info(f"Профилирование завершено: {samples} срезов за {elapsed:.1f} с")
+
+    def collapsed(self):
+        """Стеки в формате collapsed (одна строка на стек) или None, если результата нет."""
+        result = self.result
+        if result is None:
+            return None
+        lines = [";".join(frame.replace(";", ",") for frame in stack) + f" {count}"
+                 for stack, count in result["stacks"].most_common()]
+        return "\n".join(lines) + "\n"
+
+    def get_status(self):
+        result = self.result
+        status = {"running": self.is_running()}
+        if result is not None:
+            status.update({k: v for k, v in result.items() if k != "stacks"})
+            status["unique_stacks"] = len(result["stacks"])
+        return status
@@ -0,0 +1,370 @@
+"""
+Единственный владелец serial-порта Qik.
+
+Все чтения и записи выполняет поток SerialMuxThread; клиенты (MotorController,
+QikErrorChecker, телеметрия) ставят запросы в очередь с приоритетом.
+Команды моторам не ждут ответа и идут первыми; для каждого мотора в
+очереди хранится только последняя команда. Ответы читаются сразу после
+записи, а следующий запрос пишется только после ответа на предыдущий, поэтому
+каждый ответ однозначно принадлежит своему запросу, даже если Qik отбросил
+команду. Накопленные команды моторам уходят одним write() со следующим
+запросом — опрос ошибок и телеметрии не добавляет отдельных записей в порт.
+send_motors() ставит команды нескольких устройств (цепочка Qik на одной
+линии) под одной блокировкой — все они уходят в порт одной записью.
+Пакет submit_batch выполняется подряд, без вклинивания других запросов.
+
+Ответ читается короткими отрезками (read_slice) до таймаута порта; между
+отрезками новые команды моторам пишутся сразу. Команды скорости не дают
+ответа, поэтому не сдвигают ожидаемый ответ, а Qik, выпавший из цепочки,
+не задерживает команды остальным устройствам на время таймаута и повторов.
+
+emergency() — аварийная запись мимо очереди из потока вызывающего: не ждет
+ни очереди, ни ответа на запрос в полете (порт полнодуплексный, ответ
+дочитывается как обычно). Записи в порт разделены блокировкой, поэтому
+аварийные байты попадают между целыми пакетами. До clear_emergency()
+команды моторам, в том числе уже взятые потоком-владельцем, не пишутся.
+
+Байты, пришедшие без запроса (например, опоздавший ответ после таймаута),
+вычитываются и считаются перед следующим запросом — вместо flushInput()
+перед каждой командой. Запрос с retries > 0 при неполном ответе
+повторяется (в режиме CRC Qik молча отбрасывает искаженную команду).
+"""
+import time
+import queue
+import logging
+import threading
+import itertools
+from collections import deque
+
+logger = logging.getLogger('rover.serial')
+
+PRIORITY_MOTOR = 0
+PRIORITY_QUERY = 1
+PRIORITY_TELEMETRY = 2
+
+# Отрезок ожидания ответа, с: не больше задержки команды моторам во время запроса
+READ_SLICE = 0.005
+
+
+class SerialRequest:
+    """Запрос к порту; wait() возвращает байты ответа или None по таймауту."""
+
+    def __init__(self, data, reply_length=0, priority=PRIORITY_QUERY, retries=0, tag=None):
+        self.data = bytes(data)
+        self.tag = tag  # например, id устройства на шине — для статистики по устройствам
+        self.reply_length = reply_length
+        self.priority = priority
+        self.retries = retries
+        self.reply = None
+        self.submitted = time.monotonic()
+        self.completed = None
+        self._done = threading.Event()
+
+    def complete(self, reply):
+        self.reply = reply
+        self.completed = time.monotonic()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            return None
+        return self.reply
+
+
+class SerialMux:
+    """Очередь запросов к порту с одним потоком-владельцем."""
+
+    def __init__(self, ser, read_slice=READ_SLICE):
+        self.ser = ser
+        # Таймаут ответа — таймаут, с которым открыт порт; сам порт читается отрезками
+        self.reply_timeout = getattr(ser, 'timeout', None) or 0.2
+        self.read_slice = min(read_slice, self.reply_timeout)
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._motor_lock = threading.Lock()
+        self._motor_frames = {}  # канал -> последняя команда (latest wins)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._estop = threading.Event()
+        self._thread = None
+
+        self.writes = 0
+        self.bytes_written = 0
+        self.motor_frames_sent = 0
+        self.motor_frames_coalesced = 0
+        self.requests_done = 0
+        self.timeouts = 0
+        self.retransmits = 0
+        self.stray_bytes = 0
+        self.round_trips = []
+        self.tag_round_trips = {}  # tag -> deque последних времен обмена
+        self.tag_timeouts = {}
+        self.motor_writes = deque(maxlen=500)  # (байт, секунд) записей с командами моторам
+        self.motor_frames_blocked = 0
+        self.motor_writes_while_waiting = 0
+        self.emergency_writes = 0
+        self.cancelled = 0
+
+    def start(self):
+        if self._thread is None:
+            self.ser.timeout = self.read_slice
+            self._thread = threading.Thread(target=self._run, daemon=True, name="SerialMuxThread")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    # --- Клиентский интерфейс ---
+
+    def send_motor(self, channel, data):
+        """
+        Команда без ответа с наивысшим приоритетом; заменяет неотправленную
+        команду того же канала.
+        """
+        if self._estop.is_set():
+            self.motor_frames_blocked += 1
+            return
+        with self._motor_lock:
+            if channel in self._motor_frames:
+                self.motor_frames_coalesced += 1
+            self._motor_frames[channel] = bytes(data)
+        self._wakeup.set()
+
+    def send_motors(self, frames):
+        """Команды нескольким моторам/устройствам {канал: байты}: уходят в порт одной записью."""
+        if self._estop.is_set():
+            self.motor_frames_blocked += len(frames)
+            return
+        with self._motor_lock:
+            for channel, data in frames.items():
+                if channel in self._motor_frames:
+                    self.motor_frames_coalesced += 1
+                self._motor_frames[channel] = bytes(data)
+        self._wakeup.set()
+
+    def send(self, data, priority=PRIORITY_QUERY):
+        """Команда без ответа; порядок среди запросов того же приоритета сохраняется."""
+        return self.submit(data, 0, priority)
+
+    def submit(self, data, reply_length=0, priority=PRIORITY_QUERY, retries=0, tag=None):
+        return self.submit_batch([(data, reply_length)], priority, retries, tag)[0]
+
+    def submit_batch(self, items, priority=PRIORITY_TELEMETRY, retries=0, tag=None):
+        """Несколько запросов [(data, reply_length), ...] подряд, без других запросов между ними."""
+        requests = [SerialRequest(data, reply_length, priority, retries, tag)
+                    for data, reply_length in items]
+        if priority == PRIORITY_MOTOR and self._estop.is_set():
+            for request in requests:
+                request.complete(None)
+            self.motor_frames_blocked += len(requests)
+            return requests
+        self._queue.put((priority, next(self._order), requests))
+        self._wakeup.set()
+        return requests
+
+    def request(self, data, reply_length, priority=PRIORITY_QUERY, timeout=1.0, retries=0,
+                tag=None):
+        """
+        Отправляет запрос и ждет ответ. Возвращает bytes (возможно, короче
+        ожидаемого) или None.
+        """
+        return self.submit(data, reply_length, priority, retries, tag).wait(timeout)
+
+    def emergency(self, data):
+        """
+        Пишет data (команды торможения) сразу из потока вызывающего и
+        фиксирует аварийный режим. Ждет только текущую запись потока-владельца
+        и передачу байтов (flush). Возвращает число отмененных запросов очереди.
+        """
+        self._estop.set()
+        with self._motor_lock:
+            self.motor_frames_blocked += len(self._motor_frames)
+            self._motor_frames.clear()
+        with self._write_lock:
+            self.ser.write(data)
+            flush = getattr(self.ser, 'flush', None)
+            if flush is not None:
+                flush()
+            self.writes += 1
+            self.bytes_written += len(data)
+            self.emergency_writes += 1
+        # Очередь разбирается уже после торможения: это не влияет на задержку
+        cancelled = 0
+        while True:
+            try:
+                requests = self._queue.get_nowait()[2]
+            except queue.Empty:
+                break
+            for request in requests:
+                request.complete(None)
+                cancelled += 1
+        self.cancelled += cancelled
+        return cancelled
+
+    def clear_emergency(self):
+        self._estop.clear()
+
+    @property
+    def emergency_engaged(self):
+        return self._estop.is_set()
+
+    def flush_motors(self, timeout=0.5):
+        """Ждет, пока накопленные команды моторам будут записаны в порт."""
+        deadline = time.monotonic() + timeout
+        while self._motor_frames and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    # --- Поток-владелец ---
+
+    def _take_motor_frames(self):
+        with self._motor_lock:
+            frames, self._motor_frames = self._motor_frames, {}
+        return b''.join(frames.values()), len(frames)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                requests = self._queue.get_nowait()[2]
+            except queue.Empty:
+                requests = []
+
+            motor_data, motor_count = self._take_motor_frames()
+            if not requests and not motor_count:
+                self._wakeup.wait(0.05)
+                continue
+            try:
+                self._execute(requests, motor_data, motor_count)
+            except Exception as e:
+                logger.error(f"Ошибка обмена с Qik: {e}")
+                for request in requests:
+                    if request.completed is None:
+                        request.complete(None)
+
+    def _write(self, data, motor_data=b'', motor_count=0):
+        with self._write_lock:
+            if motor_count and self._estop.is_set():
+                # Команды, взятые до аварийной остановки, не должны отменить торможение
+                self.motor_frames_blocked += motor_count
+                motor_data, motor_count = b'', 0
+            data = motor_data + data
+            if not data:
+                return 0
+            self.ser.write(data)
+            self.writes += 1
+            self.bytes_written += len(data)
+            self.motor_frames_sent += motor_count
+        return motor_count
+
+    def _execute(self, requests, motor_data, motor_count):
+        # Команды моторам уходят вместе с первым запросом пакета
+        pending = b''
+        for request in requests:
+            if not request.reply_length:
+                pending += request.data
+                self.requests_done += 1
+                request.complete(b'')
+                continue
+            self._drain_stray()
+            started = time.monotonic()
+            data = pending + request.data
+            if self._write(data, motor_data, motor_count):
+                self.motor_writes.append((len(motor_data) + len(data), time.monotonic() - started))
+            motor_data, motor_count, pending = b'', 0, b''
+            reply = self._read_reply(request.reply_length)
+            attempts = request.retries
+            while len(reply) < request.reply_length and attempts > 0:
+                # Следующий запрос пишется только после ответа на предыдущий,
+                # поэтому потерянная команда не сдвигает ответы остальных
+                self.timeouts += 1
+                self.retransmits += 1
+                attempts -= 1
+                self._drain_stray()
+                self._write(request.data)
+                reply = self._read_reply(request.reply_length)
+            if len(reply) < request.reply_length:
+                self.timeouts += 1
+                if request.tag is not None:
+                    self.tag_timeouts[request.tag] = self.tag_timeouts.get(request.tag, 0) + 1
+            else:
+                elapsed = time.monotonic() - started
+                self.round_trips.append(elapsed)
+                if len(self.round_trips) > 500:
+                    del self.round_trips[:250]
+                if request.tag is not None:
+                    self.tag_round_trips.setdefault(request.tag, deque(maxlen=200)).append(elapsed)
+            self.requests_done += 1
+            request.complete(reply)
+        if pending or motor_count:
+            started = time.monotonic()
+            if self._write(pending, motor_data, motor_count):
+                written = len(motor_data) + len(pending)
+                self.motor_writes.append((written, time.monotonic() - started))
+
+    def _read_reply(self, length):
+        """Ответ до reply_timeout; между отрезками чтения пишет новые команды моторам."""
+        deadline = time.monotonic() + self.reply_timeout
+        reply = self.ser.read(length)
+        while len(reply) < length and time.monotonic() < deadline:
+            self._write_waiting_motor_frames()
+            reply += self.ser.read(length - len(reply))
+        return reply
+
+    def _write_waiting_motor_frames(self):
+        motor_data, motor_count = self._take_motor_frames()
+        if motor_count:
+            started = time.monotonic()
+            if self._write(b'', motor_data, motor_count):
+                self.motor_writes.append((len(motor_data), time.monotonic() - started))
+                self.motor_writes_while_waiting += 1
+
+    def _drain_stray(self):
+        waiting = getattr(self.ser, 'in_waiting', 0)
+        if waiting:
+            stray = self.ser.read(waiting)
+            self.stray_bytes += len(stray)
+            logger.warning(f"Отброшено {len(stray)} байт без запроса (опоздавший ответ?)")
+
+    def get_tag_stats(self, tag):
+        """Время обмена и таймауты запросов с данным tag (например, одного устройства)."""
+        trips = sorted(self.tag_round_trips.get(tag, ()))
+        return {
+            "requests": len(trips),
+            "timeouts": self.tag_timeouts.get(tag, 0),
+            "round_trip_ms_p50": round(trips[len(trips) // 2] * 1000.0, 2) if trips else None,
+            "round_trip_ms_max": round(trips[-1] * 1000.0, 2) if trips else None,
+        }
+
+    def get_stats(self):
+        trips = sorted(self.round_trips)
+        writes = list(self.motor_writes)
+        write_sizes = [b for b, _ in writes]
+        write_times = sorted(t for _, t in writes)
+        return {
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+            "motor_frames_sent": self.motor_frames_sent,
+            "motor_frames_coalesced": self.motor_frames_coalesced,
+            "requests": self.requests_done,
+            "queued": self._queue.qsize(),
+            "timeouts": self.timeouts,
+            "retransmits": self.retransmits,
+            "stray_bytes": self.stray_bytes,
+            "emergency": self._estop.is_set(),
+            "emergency_writes": self.emergency_writes,
+            "motor_frames_blocked": self.motor_frames_blocked,
+            "motor_writes_while_waiting": self.motor_writes_while_waiting,
+            "cancelled": self.cancelled,
+            "round_trip_ms_p50": round(trips[len(trips) // 2] * 1000.0, 2) if trips else None,
+            "round_trip_ms_max": round(trips[-1] * 1000.0, 2) if trips else None,
+            "motor_write_bytes_mean": (round(sum(write_sizes) / len(writes), 1)
+                                       if writes else None),
+            "motor_write_ms_p50": (round(write_times[len(writes) // 2] * 1000.0, 3)
+                                   if writes else None),
+        }
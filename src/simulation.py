@@ -0,0 +1,255 @@
+"""
+Симуляция ровера без железа для замеров всего процесса.
+
+Запускает настоящие потоки main.py (цикл управления, детектор, регулятор
+качества) и веб-сервер, подменяя устройства: Qik — QikSerialStub, геймпад —
+виртуальный DualShock с синтетическими событиями evdev, камера — видеофайл,
+/dev/video2 — NullFrameSink, звук — SilentAudioPlayer. Сценарий по очереди
+ведет ровер геймпадом, веб-джойстиком и режимом следования, параллельно
+опрашивая HTTP-маршруты. В конце печатается отчет: CPU по потокам, период
+цикла управления, задержки веба, FPS детектора.
+
+    python simulation.py --video ../recordings/room.mp4 --phase-seconds 10
+"""
+import math
+import json
+import time
+import logging
+import argparse
+import threading
+
+import numpy as np
+import psutil
+import requests
+from evdev import ecodes
+
+from audio_player import SilentAudioPlayer
+from dualshock4 import DualShock
+from frame_sinks import NullFrameSink
+from frame_sources import open_recording
+from log_setup import setup_logging
+from qik_stub import QikSerialStub
+
+logger = logging.getLogger('rover.sim')
+
+WEB_ROUTES = ['/status', '/system-status', '/detector-status', '/video/snapshot']
+
+
+class SimulatedDevices:
+    """Заглушки устройств для main.init_components(devices=...)."""
+
+    def __init__(self, video, width=640, height=480, dead_zone=10):
+        self.serial = QikSerialStub()
+        self.pad = DualShock(dead_zone)
+        self.pad.set_virtual(True)
+        self.audio_player = SilentAudioPlayer()
+        self.detector_options = {
+            "source": open_recording(video, width, height, loop=True),
+            "sink": NullFrameSink(width, height),
+            "tts_enabled": False,
+        }
+
+
+class SyntheticPad:
+    """
+    Поток синтетических событий геймпада: стики по синусу с частотой
+    report_hz, как отчеты настоящего DualShock (ABS_X, ABS_Y, SYN_REPORT).
+    """
+
+    def __init__(self, pad, report_hz=125):
+        self.pad = pad
+        self.period = 1.0 / report_hz
+        self.active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="SyntheticPadThread")
+        self.reports = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        start = time.monotonic()
+        while not self._stop.is_set():
+            if self.active.is_set():
+                phase = time.monotonic() - start
+                x = 127 + int(100 * math.sin(phase * 0.7))
+                y = 127 - int(90 * math.cos(phase * 0.4))
+                self.pad.inject(ecodes.EV_ABS, ecodes.ABS_X, x)
+                self.pad.inject(ecodes.EV_ABS, ecodes.ABS_Y, y)
+                self.pad.inject(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+                self.reports += 1
+            time.sleep(self.period)
+
+
+class WebProbe:
+    """Опрашивает HTTP-маршруты по кругу и копит задержки ответов."""
+
+    def __init__(self, base_url, routes=WEB_ROUTES, interval=0.2):
+        self.base_url = base_url
+        self.routes = routes
+        self.interval = interval
+        self.latencies = {route: [] for route in routes}
+        self.errors = {route: 0 for route in routes}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="WebProbeThread")
+        self._session = requests.Session()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for route in self.routes:
+                start = time.perf_counter()
+                try:
+                    response = self._session.get(self.base_url + route, timeout=2.0)
+                    if response.status_code >= 500 and response.status_code != 503:
+                        self.errors[route] += 1
+                    self.latencies[route].append(time.perf_counter() - start)
+                except requests.RequestException:
+                    self.errors[route] += 1
+            self._stop.wait(self.interval)
+
+    def report(self):
+        result = {}
+        for route, values in self.latencies.items():
+            values = np.array(values) * 1000.0
+            result[route] = {
+                "requests": int(values.size),
+                "errors": self.errors[route],
+                "p50_ms": round(float(np.percentile(values, 50)), 2) if values.size else None,
+                "p95_ms": round(float(np.percentile(values, 95)), 2) if values.size else None,
+                "max_ms": round(float(values.max()), 2) if values.size else None,
+            }
+        return result
+
+
+def thread_cpu_times():
+    """{имя потока: секунды CPU (user + system)} текущего процесса."""
+    names = {t.native_id: t.name for t in threading.enumerate()}
+    times = {}
+    for thread in psutil.Process().threads():
+        name = names.get(thread.id, f"native-{thread.id}")
+        times[name] = times.get(name, 0.0) + thread.user_time + thread.system_time
+    return times
+
+
+def web_commands_driver(web_commands, stop_event, rate_hz=20):
+    """Команды веб-джойстика тем же путем, что обработчик SocketIO 'control'."""
+    start = time.monotonic()
+    while not stop_event.is_set():
+        phase = time.monotonic() - start
+        web_commands.set_joystick(0.5 * math.sin(phase), -0.6)
+        stop_event.wait(1.0 / rate_hz)
+
+
+def run(video, phase_seconds=10.0, port=5055, warmup=3.0):
+    import main
+
+    devices = SimulatedDevices(video)
+    main.init_components(devices)
+    main.start_threads()
+    server = threading.Thread(
+        target=main.socketio.run, args=(main.app,),
+        kwargs={"host": "127.0.0.1", "port": port, "allow_unsafe_werkzeug": True,
+                "log_output": False},
+        daemon=True, name="WebServerThread")
+    server.start()
+    time.sleep(warmup)  # загрузка модели и запуск сервера
+
+    synthetic_pad = SyntheticPad(devices.pad)
+    synthetic_pad.start()
+    probe = WebProbe(f"http://127.0.0.1:{port}")
+    probe.start()
+
+    detector = main.object_detector
+    frames_start = detector.frames if detector else 0
+    cpu_start = thread_cpu_times()
+    process = psutil.Process()
+    children_start = sum(c.cpu_times().user + c.cpu_times().system for c in process.children())
+    commands_start = len(devices.serial.motor_commands())
+    main.loop_monitor.reset()
+    wall_start = time.monotonic()
+
+    phases = []
+    # 1. Геймпад
+    devices.pad.set_virtual(True)
+    synthetic_pad.active.set()
+    time.sleep(phase_seconds)
+    synthetic_pad.active.clear()
+    phases.append("pad")
+
+    # 2. Веб-джойстик (геймпад «отключен»)
+    devices.pad.set_virtual(False)
+    web_stop = threading.Event()
+    web_driver = threading.Thread(target=web_commands_driver, args=(main.web_commands, web_stop),
+                                  daemon=True, name="WebDriverThread")
+    web_driver.start()
+    time.sleep(phase_seconds)
+    web_stop.set()
+    web_driver.join()
+    phases.append("web")
+
+    # 3. Режим следования по детекциям
+    main.follow_controller.set_enabled(True)
+    time.sleep(phase_seconds)
+    main.follow_controller.set_enabled(False)
+    phases.append("follow")
+
+    duration = time.monotonic() - wall_start
+    cpu_end = thread_cpu_times()
+    children_end = sum(c.cpu_times().user + c.cpu_times().system for c in process.children())
+    probe.stop()
+    synthetic_pad.stop()
+
+    detector = main.object_detector
+    report = {
+        "phases": phases,
+        "duration_s": round(duration, 1),
+        "thread_cpu_percent": {
+            name: round((cpu_end[name] - cpu_start.get(name, 0.0)) * 100.0 / duration, 1)
+            for name in sorted(cpu_end)
+        },
+        "child_processes_cpu_percent": round((children_end - children_start) * 100.0 / duration, 1),
+        "control_loop": main.loop_monitor.get_stats(),
+        "web": probe.report(),
+        "detector": {
+            "fps": round((detector.frames - frames_start) / duration, 1) if detector else None,
+            "stats": detector.get_stats() if detector else None,
+        },
+        "follow": main.follow_controller.get_status(),
+        "motor_commands": len(devices.serial.motor_commands()) - commands_start,
+        "pad_reports": synthetic_pad.reports,
+    }
+    main.cleanup()
+    if detector:
+        detector.running = False
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Симуляция ровера без железа")
+    parser.add_argument('--video', required=True,
+                        help="видеофайл или каталог изображений вместо камеры")
+    parser.add_argument('--phase-seconds', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', help="файл для JSON-отчета")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    setup_logging(logging.WARNING)
+    report = run(args.video, args.phase_seconds, args.port)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
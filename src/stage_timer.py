@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+
+class NullStageTimer:
+    """Заглушка по умолчанию: замеры выключены, накладные расходы минимальны."""
+
+    def begin(self):
+        pass
+
+    def mark(self, stage):
+        pass
+
+
+class StageTimer:
+    """
+    Замер длительности стадий обработки кадра.
+    begin() в начале кадра, mark(stage) после каждой стадии:
+    время с предыдущей отметки записывается в эту стадию.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self._last = None
+
+    def begin(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.samples.setdefault(stage, []).append(now - self._last)
+        self._last = now
+
+    def summary(self):
+        """Статистика по стадиям в миллисекундах."""
+        result = {}
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1000.0
+            result[stage] = {
+                "count": int(ms.size),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "total_ms": round(float(ms.sum()), 1),
+            }
+        return result
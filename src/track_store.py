@@ -0,0 +1,247 @@
+"""
+События «трек объекта» из детекций и их хранилище с индексами.
+
+DetectionTracker вызывается детектором на каждом кадре и только обновляет
+несколько полей: трек класса закрывается, если класс не виден gap_seconds,
+и сохраняется, только если набрал min_hits попаданий (одиночные ложные
+срабатывания отбрасываются). Трек — эпизод присутствия класса в кадре: время первого
+и последнего появления, пиковая уверенность и вырезка лучшего кадра (копия
+делается только при росте пика). Закрытые треки уходят в очередь TrackStore.
+
+TrackStore в фоновом потоке кодирует миниатюру, дописывает строку JSON в
+tracks.jsonl (файл только растет) и обновляет индексы в памяти: по классу
+и по времени начала. При старте индексы строятся из tracks.jsonl, поэтому
+запрос «все собаки за сегодня» не читает ни кадры, ни логи.
+"""
+import os
+import json
+import time
+import queue
+import bisect
+import logging
+import threading
+
+import cv2
+
+from detections import CLASSES
+
+logger = logging.getLogger('rover.tracks')
+
+TRACKS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          '..', 'recordings', 'tracks'))
+
+
+class _OpenTrack:
+    __slots__ = ("class_id", "first_seen", "last_seen", "hits", "peak_confidence", "box", "crop")
+
+    def __init__(self, class_id, now):
+        self.class_id = class_id
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 0
+        self.peak_confidence = 0.0
+        self.box = None
+        self.crop = None
+
+
+class DetectionTracker:
+    """Склейка детекций в треки; observe() вызывается из потока детектора."""
+
+    def __init__(self, store, min_hits=3, gap_seconds=2.0, crop_margin=0.1):
+        self.store = store
+        self.min_hits = min_hits
+        self.gap_seconds = gap_seconds
+        self.crop_margin = crop_margin
+        self._open = {}  # class_id -> _OpenTrack
+        self.discarded = 0
+
+    def observe(self, detections, frame=None, now=None):
+        """
+        detections — массив DETECTION_DTYPE текущего кадра, frame — кадр без
+        разметки (для миниатюры). Время — time.time().
+        """
+        now = time.time() if now is None else now
+        for det in detections:
+            class_id = int(det['class_id'])
+            track = self._open.get(class_id)
+            if track is None:
+                track = self._open[class_id] = _OpenTrack(class_id, now)
+            confidence = float(det['confidence'])
+            track.last_seen = now
+            track.hits += 1
+            if confidence > track.peak_confidence:
+                track.peak_confidence = confidence
+                track.box = (int(det['x1']), int(det['y1']), int(det['x2']), int(det['y2']))
+                if frame is not None:
+                    track.crop = self._crop(frame, track.box)
+
+        for class_id in [c for c, t in self._open.items() if now - t.last_seen > self.gap_seconds]:
+            self._close(self._open.pop(class_id))
+
+    def _crop(self, frame, box):
+        x1, y1, x2, y2 = box
+        mx, my = int((x2 - x1) * self.crop_margin), int((y2 - y1) * self.crop_margin)
+        h, w = frame.shape[:2]
+        crop = frame[max(0, y1 - my):min(h, y2 + my), max(0, x1 - mx):min(w, x2 + mx)]
+        # Буфер кадра переиспользуется детектором — нужна своя копия
+        return crop.copy() if crop.size else None
+
+    def _close(self, track):
+        if track.hits < self.min_hits:
+            self.discarded += 1
+            return
+        self.store.submit({
+            "class_id": track.class_id,
+            "class": (CLASSES[track.class_id] if track.class_id < len(CLASSES)
+                      else str(track.class_id)),
+            "first_seen": track.first_seen,
+            "last_seen": track.last_seen,
+            "duration": round(track.last_seen - track.first_seen, 2),
+            "hits": track.hits,
+            "peak_confidence": round(track.peak_confidence, 3),
+            "box": track.box,
+        }, track.crop)
+
+    def close_all(self):
+        """Закрывает открытые треки (остановка детектора)."""
+        for track in list(self._open.values()):
+            self._close(track)
+        self._open.clear()
+
+    def get_stats(self):
+        return {
+            "open": [CLASSES[c] if c < len(CLASSES) else str(c) for c in self._open],
+            "discarded": self.discarded,
+        }
+
+
+class TrackStore:
+    """Хранилище треков: tracks.jsonl + thumbs/, индексы по классу и времени."""
+
+    def __init__(self, directory=TRACKS_DIR, thumbnail_size=160, quality=80, queue_size=64):
+        self.directory = directory
+        self.path = os.path.join(directory, 'tracks.jsonl')
+        self.thumbs_dir = os.path.join(directory, 'thumbs')
+        self.thumbnail_size = thumbnail_size
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+        self._lock = threading.Lock()
+        self._records = []      # записи в порядке добавления; индекс = позиция
+        self._by_time = []      # (first_seen, позиция), по возрастанию
+        self._by_class = {}     # класс -> [(first_seen, позиция)], по возрастанию
+        self._by_id = {}        # id трека -> позиция
+        self._next_id = 1
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self.dropped = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        skipped = 0
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self._index(json.loads(line))
+                except (ValueError, KeyError):
+                    # Недописанная строка после аварийного выключения
+                    skipped += 1
+        logger.info(f"Загружено треков: {len(self._records)}"
+                    + (f", пропущено строк: {skipped}" if skipped else ""))
+
+    def _index(self, record):
+        position = len(self._records)
+        self._records.append(record)
+        key = (record["first_seen"], position)
+        bisect.insort(self._by_time, key)
+        bisect.insort(self._by_class.setdefault(record["class"], []), key)
+        self._by_id[record["id"]] = position
+        self._next_id = max(self._next_id, record["id"] + 1)
+
+    def submit(self, track, crop=None):
+        """Ставит закрытый трек в очередь записи, не блокируя вызывающего."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                            name="TrackWriter")
+            self._writer.start()
+        try:
+            self._queue.put_nowait((track, crop))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Трек '{track['class']}' не записан: очередь заполнена")
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._append(*item)
+            except Exception as e:
+                logger.error(f"Ошибка записи трека: {e}")
+
+    def _append(self, track, crop):
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+        record = dict(track)
+        record["id"] = self._next_id
+        record["thumbnail"] = None
+        if crop is not None:
+            scale = self.thumbnail_size / max(crop.shape[:2])
+            if scale < 1.0:
+                crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode('.jpg', crop, self._params)
+            if ok:
+                name = f"{record['id']}.jpg"
+                with open(os.path.join(self.thumbs_dir, name), 'wb') as f:
+                    f.write(encoded.tobytes())
+                record["thumbnail"] = name
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        with self._lock:
+            self._index(record)
+        logger.info(f"Трек #{record['id']}: {record['class']} {record['duration']:.1f} с, "
+                    f"пик {record['peak_confidence']:.2f}")
+
+    def query(self, class_name=None, start=None, end=None, min_confidence=None, limit=100):
+        """Треки, начавшиеся в [start, end] (unix-время), новые первыми."""
+        lo = (start if start is not None else float('-inf'), -1)
+        hi = (end if end is not None else float('inf'), float('inf'))
+        with self._lock:
+            keys = self._by_time if class_name is None else self._by_class.get(class_name, [])
+            selected = keys[bisect.bisect_left(keys, lo):bisect.bisect_right(keys, hi)]
+            result = []
+            for _, position in reversed(selected):
+                record = self._records[position]
+                if min_confidence is not None and record["peak_confidence"] < min_confidence:
+                    continue
+                result.append(record)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def get(self, track_id):
+        with self._lock:
+            position = self._by_id.get(track_id)
+            return self._records[position] if position is not None else None
+
+    def thumbnail_path(self, record):
+        if not record.get("thumbnail"):
+            return None
+        return os.path.join(self.thumbs_dir, record["thumbnail"])
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "tracks": len(self._records),
+                "classes": {name: len(keys) for name, keys in self._by_class.items()},
+                "queued": self._queue.qsize(),
+                "dropped": self.dropped,
+            }
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=10.0)
+            self._writer = None
@@ -0,0 +1,126 @@
+import time
+import logging
+import threading
+
+import cv2
+
+logger = logging.getLogger('object_detector')
+
+
+class StreamSubscriber:
+    """
+    Очередь одного зрителя глубиной в один кадр. Новый кадр заменяет
+    непрочитанный, поэтому медленный клиент пропускает кадры, а не копит их.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._data = None
+        self._last_read = 0
+        self.delivered = 0
+        self.skipped = 0
+        self.closed = False
+
+    def put(self, seq, data):
+        with self._cond:
+            if self._data is not None and self._seq > self._last_read:
+                self.skipped += 1
+            self._seq = seq
+            self._data = data
+            self._cond.notify()
+
+    def get(self, timeout=1.0):
+        """Ждет кадр новее последнего прочитанного. None — по таймауту или после close()."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.closed or self._seq > self._last_read, timeout):
+                return None
+            if self.closed:
+                return None
+            self._last_read = self._seq
+            self.delivered += 1
+            return self._data
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FrameBroadcaster:
+    """
+    Кодирует каждый размеченный кадр в JPEG один раз и раздает одни и те же
+    байты всем подключенным зрителям. Пока зрителей нет, кадры не кодируются.
+    """
+
+    def __init__(self, quality=70, max_fps=15):
+        self.quality = quality
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._seq = 0
+        self._last_publish = 0.0
+        self.latest = None
+        self.encoded_frames = 0
+        self.encode_time_total = 0.0
+
+    def has_viewers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        subscriber = StreamSubscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            # Новый зритель сразу получает последний кадр
+            if self.latest is not None:
+                subscriber.put(self._seq, self.latest)
+        logger.info(f"Video viewer connected ({len(self._subscribers)} total)")
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        logger.info(f"Video viewer disconnected ({len(self._subscribers)} left)")
+
+    def publish(self, frame, force=False):
+        """
+        Кодирует кадр, если есть зрители (или force), и раздает его.
+        Возвращает JPEG-байты или None, если кадр не кодировался.
+        """
+        if not force and not self._subscribers:
+            return None
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.min_interval:
+            return None
+
+        start = time.perf_counter()
+        ok, encoded = cv2.imencode('.jpg', frame, self._params)
+        if not ok:
+            return None
+        data = encoded.tobytes()
+        self.encode_time_total += time.perf_counter() - start
+        self.encoded_frames += 1
+        self._last_publish = now
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self.latest = data
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(seq, data)
+        return data
+
+    def get_stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "viewers": len(subscribers),
+            "encoded_frames": self.encoded_frames,
+            "avg_encode_ms": (round(self.encode_time_total * 1000.0 / self.encoded_frames, 2)
+                              if self.encoded_frames else 0.0),
+            "delivered": [s.delivered for s in subscribers],
+            "skipped": [s.skipped for s in subscribers],
+        }
@@ -0,0 +1,140 @@
+"""
+Офлайн-бенчмарк конвейера детектора на записанных кадрах.
+
+Кадры из видеофайла или каталога изображений проходят тот же путь, что и
+в VirtualCameraObjectDetector (гейт, blob, forward, пост-обработка,
+разметка, I420, запись), с подменяемым выходом: null, file или loopback.
+Результат — JSON со временем стадий, FPS, загрузкой CPU и пиковым RSS,
+который удобно сравнивать между коммитами:
+
+    python vision_bench.py --input ../recordings/room.mp4 --output before.json
+    python vision_bench.py --input ../recordings/room.mp4 --compare before.json
+"""
+import os
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from frame_sinks import NullFrameSink, FileFrameSink, LoopbackFrameSink
+from frame_sources import open_recording
+from object_detector import VirtualCameraObjectDetector
+from stage_timer import StageTimer
+
+
+def make_sink(kind, width, height, path=None):
+    if kind == 'null':
+        return NullFrameSink(width, height)
+    if kind == 'file':
+        return FileFrameSink(path or os.devnull, width, height)
+    if kind == 'loopback':
+        return LoopbackFrameSink(path or '/dev/video2', width, height)
+    raise ValueError(f"Unknown sink: {kind}")
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(input_path, sink_kind='null', sink_path=None, width=640, height=480, max_frames=None,
+        loop=False, backend=None, use_motion_gate=True, roi_inference=False):
+    source = open_recording(input_path, width, height, loop=loop)
+    sink = make_sink(sink_kind, width, height, sink_path)
+    detector = VirtualCameraObjectDetector(width, height, backend=backend, source=source, sink=sink,
+                                           tts_enabled=False, use_motion_gate=use_motion_gate,
+                                           roi_inference=roi_inference)
+    timer = StageTimer()
+    detector.timer = timer
+
+    frames = 0
+    cpu_start = os.times()
+    wall_start = time.perf_counter()
+    try:
+        while max_frames is None or frames < max_frames:
+            if not detector._process_and_write_frame():
+                break
+            frames += 1
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu_end = os.times()
+        detector.stop()
+
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    return {
+        "revision": _git_revision(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {
+            "input": input_path,
+            "sink": sink_kind,
+            "width": width,
+            "height": height,
+            "backend": detector.backend.name,
+            "input_size": list(detector.backend.input_size),
+            "motion_gate": use_motion_gate,
+            "roi_inference": roi_inference,
+        },
+        "frames": frames,
+        "wall_seconds": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall > 0 else 0.0,
+        # Процент одного ядра (может превышать 100 при многопоточном инференсе)
+        "cpu_percent": round(100.0 * cpu_seconds / wall, 1) if wall > 0 else 0.0,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "stages": timer.summary(),
+        "detector": detector.get_stats(),
+    }
+
+
+def compare(current, baseline):
+    """Печатает разницу средних времен стадий и FPS относительно baseline."""
+    print(f"{'stage':<12} {'base ms':>10} {'now ms':>10} {'delta':>8}")
+    for stage, now in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            print(f"{stage:<12} {'-':>10} {now['mean_ms']:>10.3f} {'new':>8}")
+            continue
+        delta = ((now['mean_ms'] - base['mean_ms']) / base['mean_ms'] * 100
+                 if base['mean_ms'] else 0.0)
+        print(f"{stage:<12} {base['mean_ms']:>10.3f} {now['mean_ms']:>10.3f} {delta:>+7.1f}%")
+    print(f"{'fps':<12} {baseline.get('fps', 0):>10} {current['fps']:>10}")
+    print(f"{'peak_rss_kb':<12} {baseline.get('peak_rss_kb', 0):>10} {current['peak_rss_kb']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк конвейера детектора")
+    parser.add_argument('--input', required=True, help="видеофайл или каталог изображений")
+    parser.add_argument('--sink', choices=['null', 'file', 'loopback'], default='null')
+    parser.add_argument('--sink-path', help="файл или устройство для sink=file/loopback")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--frames', type=int, help="ограничить число кадров")
+    parser.add_argument('--loop', action='store_true', help="зациклить запись (вместе с --frames)")
+    parser.add_argument('--backend', help="JSON-описание бэкенда для create_backend")
+    parser.add_argument('--no-motion-gate', action='store_true')
+    parser.add_argument('--roi-inference', action='store_true')
+    parser.add_argument('--output', help="сохранить результат в JSON")
+    parser.add_argument('--compare', help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    result = run(args.input, args.sink, args.sink_path, args.width, args.height, args.frames,
+                 args.loop, json.loads(args.backend) if args.backend else None,
+                 not args.no_motion_gate, args.roi_inference)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Сколько байт и времени стоит загрузка веб-интерфейса до и после сжатой
+статики с хэшами в адресах.
+
+Запускается на ноутбуке, подключенном к Wi-Fi ровера, против работающего
+сервера. Сценарии:
+  legacy-first   — /static/... без сжатия, как раньше;
+  legacy-revisit — повторный визит: условные запросы каждого файла;
+  assets-first   — /assets/<хэш>/... со сжатием gzip/br;
+  assets-revisit — повторный визит: index.html -> 304, файлы с immutable не запрашиваются.
+Для каждого сценария: запросы, байты по проводу (без распаковки), время
+загрузки (страница, затем скрипты параллельно) и оценка времени до
+интерактивности для заданной полосы и RTT.
+
+    python web_assets_bench.py --url https://192.168.0.38:5000 --bandwidth-kbps 2000 --rtt-ms 40
+"""
+import re
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+
+SCRIPT_RE = re.compile(r'<script src="(/(?:assets|static)/[^"]+)"')
+
+
+def fetch(session, url, encoding, etag=None):
+    headers = {'Accept-Encoding': encoding}
+    if etag:
+        headers['If-None-Match'] = etag
+    start = time.perf_counter()
+    response = session.get(url, headers=headers, stream=True, verify=False, timeout=30)
+    body = response.raw.read(decode_content=False)
+    elapsed = time.perf_counter() - start
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return {
+        "url": url,
+        "status": response.status_code,
+        "bytes": len(body) + header_bytes,
+        "seconds": elapsed,
+        "etag": response.headers.get('ETag'),
+        "text": (body if response.status_code == 200
+                 and not response.headers.get('Content-Encoding') else None),
+    }
+
+
+def load_page(base_url, encoding, scripts, cache=None, immutable=False):
+    """
+    Страница, затем все скрипты параллельно (как браузер).
+    cache — {url: etag} прошлого визита.
+    """
+    cache = cache or {}
+    session = requests.Session()
+    start = time.perf_counter()
+    page = fetch(session, base_url + '/', encoding, cache.get('/'))
+    # Файлы с immutable браузер берет из кэша без запроса
+    wanted = [] if immutable and cache else scripts
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(
+            lambda path: fetch(requests.Session(), base_url + path, encoding, cache.get(path)),
+            wanted))
+    elapsed = time.perf_counter() - start
+    etags = {'/': page["etag"]}
+    etags.update({path: r["etag"] for path, r in zip(wanted, results)})
+    responses = [page] + results
+    return {
+        "requests": len(responses),
+        "not_modified": sum(r["status"] == 304 for r in responses),
+        "bytes": sum(r["bytes"] for r in responses),
+        "seconds": round(elapsed, 3),
+        "rounds": 1 + (1 if wanted else 0),
+    }, etags
+
+
+def estimate_tti(result, bandwidth_kbps, rtt_ms):
+    """Оценка: по RTT на соединение и раунд запросов плюс передача байтов по полосе."""
+    transfer = result["bytes"] * 8 / (bandwidth_kbps * 1000.0)
+    return round((result["rounds"] + 1) * rtt_ms / 1000.0 + transfer, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Байты и время загрузки веб-интерфейса до и после")
+    parser.add_argument('--url', default='https://127.0.0.1:5000')
+    parser.add_argument('--bandwidth-kbps', type=float, default=2000.0,
+                        help="полоса Wi-Fi для оценки")
+    parser.add_argument('--rtt-ms', type=float, default=40.0, help="RTT для оценки")
+    args = parser.parse_args()
+    urllib3.disable_warnings()
+    base_url = args.url.rstrip('/')
+
+    html = fetch(requests.Session(), base_url + '/', 'identity')["text"].decode('utf-8')
+    assets = SCRIPT_RE.findall(html)
+    # Прежние адреса тех же файлов: /static/<путь> без хэша
+    legacy = [re.sub(r'^/assets/[0-9a-f]+/', '/static/', path) for path in assets]
+
+    report = {}
+    report["legacy-first"], legacy_cache = load_page(base_url, 'identity', legacy)
+    # Прежний index.html рендерился на каждый запрос без ETag
+    legacy_cache.pop('/', None)
+    report["legacy-revisit"], _ = load_page(base_url, 'identity', legacy, legacy_cache)
+    report["assets-first"], assets_cache = load_page(base_url, 'gzip, deflate, br', assets)
+    report["assets-revisit"], _ = load_page(base_url, 'gzip, deflate, br', assets, assets_cache,
+                                            immutable=True)
+    for result in report.values():
+        result["estimated_tti_s"] = estimate_tti(result, args.bandwidth_kbps, args.rtt_ms)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,53 @@
 import threading
 import time
 
+import utils
+
 class WebCommands:
     def __init__(self):
         self.lock = threading.Lock()
-        self.last_command_time = time.time()  # Инициализируем текущим временем
+        # Часы подменяются при воспроизведении сессий в виртуальном времени
+        self.clock = time.time
+        self.last_command_time = self.clock()  # Инициализируем текущим временем
         self.ls = 0  # Инициализируем нулями
         self.rs = 0  # Инициализируем нулями
         self.command_timeout = 0.5  # Команды устаревают через 500ms
+        self.recorder = None  # запись сессии (InputRecorder)
     
     def set_speed(self, ls, rs):
         with self.lock:
             self.ls = ls
             self.rs = rs
-            self.last_command_time = time.time()
+            self.last_command_time = self.clock()
     
+    def set_joystick(self, lx, ly):
+        """
+        Команда виртуального джойстика веб-интерфейса (lx, ly в -1..1).
+        Общий путь для SocketIO 'control' и воспроизведения сессий.
+        """
+        if self.recorder is not None:
+            self.recorder.record_web(lx, ly)
+        ls, rs = utils.joystick_to_diff_control(int(lx * 127), int(ly * 127), 10)
+        self.set_speed(ls, rs)
+        return ls, rs
+
     def get_speed(self):
         with self.lock:
             # Если команда устарела, мы не меняем сохраненные значения,
             # а просто возвращаем нули.
-            if time.time() - self.last_command_time > self.command_timeout:
+            if self.clock() - self.last_command_time > self.command_timeout:
                 return 0, 0
             
             # Если команда свежая, возвращаем ее.
             return self.ls, self.rs
     
+    def is_active(self):
+        """Есть ли свежая (не устаревшая) команда с веба."""
+        with self.lock:
+            return self.clock() - self.last_command_time <= self.command_timeout
+
     def clear(self):
         with self.lock:
             self.ls = 0
             self.rs = 0
-            self.last_command_time = time.time() # Сбрасываем и время
+            self.last_command_time = self.clock() # Сбрасываем и время
@@ -1,6 +1,9 @@
 from flask import Flask
 from flask_socketio import SocketIO
 
+from sampling_profiler import SamplingProfiler
+from .static_assets import StaticAssets
+
 def create_app(web_commands, audio_player, config=None):
     """
     Фабрика для создания Flask приложения с необходимыми компонентами.
@@ -8,6 +11,8 @@ def create_app(web_commands, audio_player, config=None):
     app = Flask(__name__)
     
     app.config['SECRET_KEY'] = config.get('secret_key', 'a_very_secret_key_for_rover') if config else 'a_very_secret_key_for_rover'
+    # Без токена маршруты /profiler отключены
+    app.config['PROFILER_TOKEN'] = config.get('profiler_token') if config else None
     
     # Создаем SocketIO экземпляр
     socketio = SocketIO(
@@ -21,20 +26,53 @@ def create_app(web_commands, audio_player, config=None):
     app.web_commands = web_commands
     app.audio_player = audio_player
     app.socketio = socketio
+    # Детектор создается позже в своем потоке (см. main.start_object_detection)
+    app.object_detector = None
+    # Статистика цикла управления (LoopMonitor), задается в main.py
+    app.loop_monitor = None
+    # Раздача MJPEG (FrameBroadcaster), задается в main.py
+    app.video_broadcaster = None
+    # Регулятор качества детектора (QualityGovernor), задается в main.py
+    app.quality_governor = None
+    # Режим следования за целью (FollowController), задается в main.py
+    app.follow_controller = None
+    # Запись видео до/после события (EventRecorder), задается в main.py
+    app.event_recorder = None
+    # Треки объектов с индексами по классу и времени (TrackStore), задается в main.py
+    app.track_store = None
+    # Геймпад (DualShock), задается в main.py
+    app.pad = None
+    # Бортовой самописец (FlightRecorder), задается в main.py
+    app.flight_recorder = None
+    # Профиль движения и очередь маневров (MotionProfile, ManeuverQueue), задаются в main.py
+    app.motion_profile = None
+    app.maneuvers = None
+    # Опрос ошибок и токов Qik через мультиплексор порта (QikTelemetry), задается в main.py
+    app.qik_telemetry = None
+    # Аварийная остановка с фиксацией (EmergencyStop), задается в main.py
+    app.emergency_stop = None
+    # Семплирующий профилировщик; поток создается только на время сеанса
+    app.profiler = SamplingProfiler()
+    # Сжатая статика с хэшами в адресах и закэшированный index.html
+    app.static_assets = StaticAssets(app)
     
     # Регистрируем blueprints
     from .routes.main_routes import main_bp
     from .routes.audio_routes import audio_bp
+    from .routes.video_routes import video_bp
+    from .routes.profiler_routes import profiler_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(audio_bp, url_prefix='/audio')
+    app.register_blueprint(video_bp, url_prefix='/video')
+    app.register_blueprint(profiler_bp, url_prefix='/profiler')
     
-    # Регистрируем SocketIO обработчики (только для управления моторами)
-    register_socketio_handlers(socketio, web_commands)
+    # Регистрируем SocketIO обработчики (управление моторами и режим следования)
+    register_socketio_handlers(socketio, web_commands, app)
     
     return app, socketio
 
-def register_socketio_handlers(socketio, web_commands):
+def register_socketio_handlers(socketio, web_commands, app):
     """
     Регистрирует обработчики SocketIO событий для управления моторами.
     """
@@ -58,12 +96,7 @@ def register_socketio_handlers(socketio, web_commands):
             lx = float(data.get('lx', 0.0))
             ly = float(data.get('ly', 0.0))
 
-            scaled_x = int(lx * 127)
-            scaled_y = int(ly * 127)
-
-            import utils
-            ls, rs = utils.joystick_to_diff_control(scaled_x, scaled_y, 10)
-            web_commands.set_speed(ls, rs)
+            ls, rs = web_commands.set_joystick(lx, ly)
             logger.debug(f"Команда с веба: L={ls}, R={rs}")
 
         except (ValueError, TypeError) as e:
@@ -72,6 +105,33 @@ def register_socketio_handlers(socketio, web_commands):
             with thread_count_lock:
                 active_threads -= 1
 
+    @socketio.on('follow')
+    def handle_follow(data):
+        follow_controller = app.follow_controller
+        if follow_controller is None:
+            return
+        enabled = bool(data.get('enabled', False)) if isinstance(data, dict) else bool(data)
+        follow_controller.set_enabled(enabled)
+        socketio.emit('follow_status', follow_controller.get_status())
+
+    @socketio.on('estop')
+    def handle_estop(data=None):
+        # В отличие от 'control', без лимита обработчиков: торможение не отбрасывается
+        emergency_stop = app.emergency_stop
+        if emergency_stop is None:
+            return
+        reason = data.get('reason') if isinstance(data, dict) else None
+        emergency_stop.trigger("socketio", reason)
+        socketio.emit('estop_status', emergency_stop.get_status())
+
+    @socketio.on('estop_clear')
+    def handle_estop_clear(data=None):
+        emergency_stop = app.emergency_stop
+        if emergency_stop is None:
+            return
+        emergency_stop.clear("socketio")
+        socketio.emit('estop_status', emergency_stop.get_status())
+
     @socketio.on('connect')
     def handle_connect():
         logger.info("Клиент подключился к веб-интерфейсу управления.")
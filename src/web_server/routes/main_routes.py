@@ -1,20 +1,153 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, jsonify, current_app, request, send_file
+import time
 import psutil
 import logging
 
+from log_setup import get_logging_stats
+from flight_recorder import COLUMNS as FLIGHT_COLUMNS
+from motion_profile import make_maneuver
+
 logger = logging.getLogger('rover')
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    """Отдает главную HTML-страницу."""
-    return render_template('index.html')
+    """Отдает главную HTML-страницу (рендерится один раз, повторно — 304 по ETag)."""
+    return current_app.static_assets.index()
+
+@main_bp.route('/assets/<digest>/<path:path>')
+def asset(digest, path):
+    """Файл из static/ по адресу с хэшем содержимого: сжатый и кэшируемый навсегда."""
+    return current_app.static_assets.serve(digest, path)
 
 @main_bp.route('/status')
 def status():
     """Простой статус для проверки работоспособности."""
     return {'status': 'ok', 'message': 'RoverPi Web Server is running'}
 
+@main_bp.route('/detector-status')
+def detector_status():
+    """Статистика детектора объектов (гейт движения, экономия CPU)."""
+    detector = current_app.object_detector
+    if detector is None:
+        return jsonify({"status": "error", "message": "Object detector is not running"}), 503
+    return jsonify({"status": "success", "detector": detector.get_stats()})
+
+@main_bp.route('/follow', methods=['GET', 'POST'])
+def follow():
+    """
+    Статус режима следования (GET) или его включение/выключение
+    (POST {"enabled": true|false}). Включает задержку детекция -> команда.
+    """
+    follow_controller = current_app.follow_controller
+    if follow_controller is None:
+        return jsonify({"status": "error", "message": "Follow mode is not available"}), 503
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        follow_controller.set_enabled(bool(data.get('enabled', False)))
+    return jsonify({"status": "success", "follow": follow_controller.get_status()})
+
+@main_bp.route('/flight')
+def flight():
+    """
+    Данные бортового самописца за интервал, сжатые до points корзин (min/max/mean).
+    Параметры: columns=left,right,... start, end (unix-время), points.
+    """
+    recorder = current_app.flight_recorder
+    if recorder is None:
+        return jsonify({"status": "error", "message": "Flight recorder is not available"}), 503
+    known = {name for name, _ in FLIGHT_COLUMNS}
+    columns = [c for c in request.args.get('columns', 'left,right').split(',') if c]
+    unknown = [c for c in columns if c not in known]
+    if unknown:
+        return jsonify({"status": "error",
+                        "message": f"Unknown columns: {', '.join(unknown)}"}), 400
+    try:
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        points = min(request.args.get('points', 500, type=int), 5000)
+        return jsonify({"status": "success", "flight": recorder.query(columns, start, end, points)})
+    except Exception as e:
+        logger.error(f"Ошибка запроса самописца: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@main_bp.route('/flight/segments')
+def flight_segments():
+    """Сегменты самописца с диапазонами времени."""
+    recorder = current_app.flight_recorder
+    if recorder is None:
+        return jsonify({"status": "error", "message": "Flight recorder is not available"}), 503
+    return jsonify({"status": "success", "segments": recorder.segments()})
+
+@main_bp.route('/tracks')
+def tracks():
+    """
+    Треки объектов из индекса: class=dog, start/end (unix-время) или
+    since=today, min_confidence, limit. Новые первыми.
+    """
+    store = current_app.track_store
+    if store is None:
+        return jsonify({"status": "error", "message": "Track store is not available"}), 503
+    start = request.args.get('start', type=float)
+    if request.args.get('since') == 'today':
+        start = time.mktime(time.localtime()[:3] + (0, 0, 0, 0, 0, -1))
+    result = store.query(class_name=request.args.get('class'),
+                         start=start,
+                         end=request.args.get('end', type=float),
+                         min_confidence=request.args.get('min_confidence', type=float),
+                         limit=min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify({"status": "success", "count": len(result), "tracks": result})
+
+@main_bp.route('/tracks/<int:track_id>/thumbnail')
+def track_thumbnail(track_id):
+    """Миниатюра лучшего кадра трека."""
+    store = current_app.track_store
+    record = store.get(track_id) if store else None
+    path = store.thumbnail_path(record) if record else None
+    if path is None:
+        return jsonify({"status": "error", "message": "Thumbnail not found"}), 404
+    return send_file(path, mimetype='image/jpeg', max_age=86400)
+
+@main_bp.route('/maneuver', methods=['GET', 'POST', 'DELETE'])
+def maneuver():
+    """
+    Очередь маневров: GET — состояние, POST — добавить
+    ({"type": "arc"|"spin"|"drive", ...} или список), DELETE — сбросить очередь.
+    """
+    queue = current_app.maneuvers
+    if queue is None:
+        return jsonify({"status": "error", "message": "Maneuvers are not available"}), 503
+    if request.method == 'DELETE':
+        queue.clear()
+    elif request.method == 'POST':
+        data = request.get_json(silent=True)
+        specs = data if isinstance(data, list) else [data or {}]
+        try:
+            items = [make_maneuver(spec) for spec in specs]
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        for item in items:
+            queue.push(item)
+    profile = current_app.motion_profile
+    return jsonify({"status": "success", "maneuvers": queue.get_status(),
+                    "profile": profile.get_status() if profile else None})
+
+@main_bp.route('/estop', methods=['GET', 'POST', 'DELETE'])
+def estop():
+    """
+    Аварийная остановка: POST — затормозить и зафиксировать ({"reason": ...}),
+    DELETE — снять фиксацию, GET — состояние и задержки до линии.
+    """
+    emergency_stop = current_app.emergency_stop
+    if emergency_stop is None:
+        return jsonify({"status": "error", "message": "Emergency stop is not available"}), 503
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        emergency_stop.trigger("web", data.get("reason"))
+    elif request.method == 'DELETE':
+        emergency_stop.clear("web")
+    return jsonify({"status": "success", "estop": emergency_stop.get_status()})
+
 @main_bp.route('/system-status')
 def system_status():
     """Возвращает статус системных ресурсов."""
@@ -32,8 +165,20 @@ def system_status():
         except:
             temp = None
         
+        loop_monitor = current_app.loop_monitor
+        quality_governor = current_app.quality_governor
+        pad = current_app.pad
+        qik_telemetry = current_app.qik_telemetry
+        emergency_stop = current_app.emergency_stop
+
         return jsonify({
             "status": "success",
+            "control_loop": loop_monitor.get_stats() if loop_monitor else None,
+            "quality": quality_governor.get_status() if quality_governor else None,
+            "gamepad": pad.get_stats() if pad else None,
+            "qik": qik_telemetry.get_stats() if qik_telemetry else None,
+            "estop": emergency_stop.get_status() if emergency_stop else None,
+            "logging": get_logging_stats(),
             "cpu": {
                 "percent": round(cpu_percent, 1),
                 "temperature": temp
@@ -0,0 +1,80 @@
+# web_server/routes/profiler_routes.py
+
+from flask import Blueprint, Response, jsonify, current_app, request
+import hmac
+import logging
+from functools import wraps
+
+profiler_bp = Blueprint('profiler', __name__)
+logger = logging.getLogger('rover')
+
+
+def require_token(view):
+    """
+    Доступ по токену из app.config['PROFILER_TOKEN'] (заголовок X-Profiler-Token
+    или параметр token). Без настроенного токена маршруты отключены.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get('PROFILER_TOKEN')
+        if not expected:
+            return jsonify({"status": "error", "message": "Profiler is disabled"}), 403
+        token = request.headers.get('X-Profiler-Token') or request.args.get('token', '')
+        if not hmac.compare_digest(token.encode(), expected.encode()):
+            logger.warning(f"Отказ в доступе к профилировщику с {request.remote_addr}")
+            return jsonify({"status": "error", "message": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _profiler():
+    return current_app.profiler
+
+
+@profiler_bp.route('/start', methods=['POST'])
+@require_token
+def start():
+    """Запускает сеанс профилирования: {"duration": с, "interval": с}."""
+    profiler = _profiler()
+    if profiler is None:
+        return jsonify({"status": "error", "message": "Profiler is not available"}), 503
+    data = request.get_json(silent=True) or {}
+    try:
+        started = profiler.start(data.get('duration', 10.0), data.get('interval', 0.005))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if not started:
+        return jsonify({"status": "error", "message": "Profiling is already running"}), 409
+    return jsonify({"status": "success", "profiler": profiler.get_status()})
+
+
+@profiler_bp.route('/stop', methods=['POST'])
+@require_token
+def stop():
+    profiler = _profiler()
+    if profiler is None:
+        return jsonify({"status": "error", "message": "Profiler is not available"}), 503
+    profiler.stop()
+    return jsonify({"status": "success", "profiler": profiler.get_status()})
+
+
+@profiler_bp.route('/status')
+@require_token
+def status():
+    """Состояние сеанса и CPU по потокам последнего результата."""
+    profiler = _profiler()
+    if profiler is None:
+        return jsonify({"status": "error", "message": "Profiler is not available"}), 503
+    return jsonify({"status": "success", "profiler": profiler.get_status()})
+
+
+@profiler_bp.route('/collapsed')
+@require_token
+def collapsed():
+    """Стеки последнего сеанса в формате collapsed для flamegraph.pl/speedscope."""
+    profiler = _profiler()
+    text = profiler.collapsed() if profiler else None
+    if text is None:
+        return jsonify({"status": "error", "message": "No profile available"}), 404
+    return Response(text, mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=rover.collapsed'})
@@ -0,0 +1,78 @@
+# web_server/routes/video_routes.py
+
+from flask import Blueprint, Response, jsonify, current_app, request
+import logging
+
+video_bp = Blueprint('video', __name__)
+logger = logging.getLogger('rover')
+
+MJPEG_BOUNDARY = 'frame'
+
+
+def _mjpeg_stream(broadcaster, subscriber):
+    """Отдает кадры подписчика как multipart/x-mixed-replace."""
+    try:
+        while True:
+            data = subscriber.get(timeout=5.0)
+            if data is None:
+                if subscriber.closed:
+                    break
+                continue
+            yield (b'--' + MJPEG_BOUNDARY.encode() + b'\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'Content-Length: ' + str(len(data)).encode() + b'\r\n\r\n' + data + b'\r\n')
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+@video_bp.route('/mjpeg')
+def mjpeg():
+    """
+    MJPEG-поток размеченных кадров детектора. Кадр кодируется один раз
+    для всех зрителей; медленный клиент пропускает кадры.
+    """
+    broadcaster = current_app.video_broadcaster
+    if broadcaster is None:
+        return jsonify({"status": "error", "message": "Video stream is not available"}), 503
+
+    subscriber = broadcaster.subscribe()
+    return Response(
+        _mjpeg_stream(broadcaster, subscriber),
+        mimetype=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}',
+        headers={'Cache-Control': 'no-cache, no-store', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@video_bp.route('/snapshot')
+def snapshot():
+    """Последний закодированный кадр (JPEG)."""
+    broadcaster = current_app.video_broadcaster
+    if broadcaster is None or broadcaster.latest is None:
+        return jsonify({"status": "error", "message": "No frame available"}), 503
+    return Response(broadcaster.latest, mimetype='image/jpeg',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@video_bp.route('/stats')
+def stats():
+    """Статистика раздачи видео: зрители, кодирование, пропуски."""
+    broadcaster = current_app.video_broadcaster
+    if broadcaster is None:
+        return jsonify({"status": "error", "message": "Video stream is not available"}), 503
+    return jsonify({"status": "success", "video": broadcaster.get_stats()})
+
+
+@video_bp.route('/event', methods=['GET', 'POST'])
+def event():
+    """
+    Состояние буфера событий (GET) или ручной запуск записи
+    (POST {"reason": "..."}): последние секунды до запроса и несколько после.
+    """
+    recorder = current_app.event_recorder
+    if recorder is None:
+        return jsonify({"status": "error", "message": "Event recorder is not available"}), 503
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        started = recorder.trigger(str(data.get('reason', 'manual')))
+        return jsonify({"status": "success", "started": started, "events": recorder.get_stats()})
+    return jsonify({"status": "success", "events": recorder.get_stats()})
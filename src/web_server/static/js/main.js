@@ -146,6 +146,26 @@ document.addEventListener('DOMContentLoaded', () => {
     socket.on('connect', () => console.log('Connected to control server.'));
     socket.on('disconnect', () => console.log('Disconnected from control server.'));
 
+    // --- Аварийная остановка: первое нажатие тормозит, повторное снимает фиксацию ---
+    const estopButton = document.getElementById('estop-button');
+    let estopEngaged = false;
+
+    function updateEstop(status) {
+        estopEngaged = status.engaged;
+        estopButton.classList.toggle('engaged', estopEngaged);
+        estopButton.textContent = estopEngaged ? 'СБРОС' : 'СТОП';
+    }
+
+    estopButton.addEventListener('click', () => {
+        if (estopEngaged) {
+            if (confirm('Снять аварийную остановку?')) socket.emit('estop_clear');
+        } else {
+            stopSendingJoystickData();
+            socket.emit('estop', { reason: 'кнопка в веб-интерфейсе' });
+        }
+    });
+    socket.on('estop_status', updateEstop);
+
     // --- Глобальные функции и автозапуск ---
     window.startWebRTC = startWebRTC;
     window.stopWebRTC = stopWebRTC;
@@ -0,0 +1,148 @@
+# web_server/static_assets.py
+"""
+Статика веб-интерфейса для медленного Wi-Fi ровера.
+
+При старте каждый файл из static/ читается один раз: считается хэш
+содержимого и готовятся сжатые варианты (gzip, brotli — если установлен
+пакет brotli). Шаблон ссылается на файлы через asset_url('js/main.js') ->
+/assets/<хэш>/js/main.js; такой адрес меняется вместе с содержимым, поэтому
+отдается с Cache-Control immutable на год, и при переподключении браузер
+не запрашивает его вовсе.
+
+index.html рендерится один раз и хранится вместе со сжатыми вариантами;
+он отдается с no-cache и ETag, так что повторная загрузка — ответ 304.
+"""
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+
+from flask import Response, request, render_template, redirect
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('rover.web')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Мелкие файлы сжимать бессмысленно: заголовки gzip съедят выигрыш
+MIN_COMPRESS_SIZE = 512
+
+
+class _Asset:
+    """Содержимое файла и его сжатые варианты: {encoding: bytes}."""
+
+    def __init__(self, data, mimetype, gzip_level=9, brotli_quality=11):
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.mimetype = mimetype
+        self.variants = {'identity': data}
+        if len(data) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=brotli_quality)
+                if len(compressed) < len(data):
+                    self.variants['br'] = compressed
+
+    def choose(self, accept_encoding):
+        """Лучший вариант из принимаемых клиентом (q=0 — запрет)."""
+        accepted = set()
+        for part in accept_encoding.split(','):
+            name, _, params = part.partition(';')
+            params = params.strip().replace(' ', '')
+            try:
+                q = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                q = 0.0
+            if q > 0:
+                accepted.add(name.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+    def response(self, cache_control):
+        encoding = self.choose(request.headers.get('Accept-Encoding', ''))
+        # ETag свой у каждого варианта: это разные последовательности байтов
+        etag = f"{self.digest}-{encoding}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.variants[encoding], mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class StaticAssets:
+    """Сжатые и хэшированные файлы static/ и закэшированный index.html."""
+
+    def __init__(self, app, gzip_level=9, brotli_quality=11):
+        self.app = app
+        self.root = app.static_folder
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.assets = {}
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._build()
+        app.jinja_env.globals['asset_url'] = self.url
+
+    def _build(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                self.assets[relative] = _Asset(data, mimetype, self.gzip_level, self.brotli_quality)
+        original = sum(len(a.variants['identity']) for a in self.assets.values())
+        best = sum(min(len(v) for v in a.variants.values()) for a in self.assets.values())
+        logger.info(f"Статика: {len(self.assets)} файлов, "
+                    f"{original // 1024} КБ -> {best // 1024} КБ"
+                    f"{'' if brotli else ' (brotli не установлен, только gzip)'}")
+
+    def url(self, path):
+        """Адрес файла с хэшем содержимого; неизвестный файл — обычный /static/."""
+        asset = self.assets.get(path)
+        if asset is None:
+            return f"/static/{path}"
+        return f"/assets/{asset.digest}/{path}"
+
+    def serve(self, digest, path):
+        asset = self.assets.get(path)
+        if asset is None:
+            return Response("Not found", status=404)
+        if digest != asset.digest:
+            # Старая ссылка из закэшированной страницы — на актуальную версию
+            return redirect(self.url(path), code=302)
+        return asset.response(IMMUTABLE)
+
+    def index(self, template='index.html'):
+        """Отрендеренный один раз шаблон (в режиме отладки — каждый раз заново)."""
+        if self.app.debug:
+            return render_template(template)
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    html = render_template(template).encode('utf-8')
+                    self._index = _Asset(html, 'text/html', self.gzip_level, self.brotli_quality)
+        return self._index.response(REVALIDATE)
+
+    def get_stats(self):
+        return {
+            "files": len(self.assets),
+            "brotli": brotli is not None,
+            "bytes": {path: {encoding: len(data) for encoding, data in asset.variants.items()}
+                      for path, asset in self.assets.items()},
+        }